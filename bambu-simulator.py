@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Bambu Lab Drucker-Simulator für das Home Assistant 3D Printer Widget
+
+Minimaler MQTT-Broker (MQTT 3.1.1, QoS 0) über TLS auf Port 8883, der sich
+wie ein P1-Drucker im LAN-Modus verhält: Login als "bblp" mit Access Code,
+Reports auf device/{serial}/report, pushall über device/{serial}/request,
+Delta-Reports mit einstellbarer Rate (bis einige hundert pro Sekunde),
+Statuswechsel IDLE -> PREPARE -> RUNNING -> PAUSE/FINISH/FAILED sowie
+geplante Verbindungsabbrüche und Aus-/Einschalten.
+
+Nur Standardbibliothek; das selbstsignierte Zertifikat erzeugt openssl.
+
+    python bambu-simulator.py --serial 01P00A000000000 --access-code 12345678
+    python bambu-simulator.py --rate 200 --pause-at 10 --fail-at 30 --drop-every 60
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+# MQTT-Pakettypen
+CONNECT, CONNACK, PUBLISH, SUBSCRIBE, SUBACK = 1, 2, 3, 8, 9
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def encode_length(length):
+    """Restlänge als MQTT-Varint"""
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(text):
+    data = text.encode()
+    return len(data).to_bytes(2, "big") + data
+
+
+def packet(packet_type, body, flags=0):
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+def read_exact(sock, count):
+    data = b""
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise ConnectionError("Verbindung geschlossen")
+        data += chunk
+    return data
+
+
+def read_packet(sock):
+    """Ein MQTT-Paket lesen -> (Typ, Flags, Body)"""
+    header = read_exact(sock, 1)[0]
+    length, shift = 0, 0
+    while True:
+        byte = read_exact(sock, 1)[0]
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return header >> 4, header & 0x0F, read_exact(sock, length)
+
+
+def read_string(body, offset):
+    length = int.from_bytes(body[offset:offset + 2], "big")
+    return body[offset + 2:offset + 2 + length].decode(), offset + 2 + length
+
+
+def create_certificate(directory):
+    """Selbstsigniertes Zertifikat wie auf dem Drucker erzeugen"""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=bambu-simulator", "-keyout", key, "-out", cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+class PrinterModel:
+    """Druckerzustand und Erzeugung von pushall- und Delta-Reports
+
+    Ablauf: IDLE -> PREPARE (Aufheizen) -> RUNNING -> FINISH -> IDLE ...
+    Optional pausiert der Druck bei pause_at (PAUSE, danach weiter) oder
+    bricht bei fail_at mit HMS-Fehler ab (FAILED).
+    """
+
+    def __init__(self, layers=50, seconds_per_layer=1.0, idle_seconds=5.0,
+                 pause_at=None, pause_seconds=5.0, fail_at=None):
+        self.layers = layers
+        self.seconds_per_layer = seconds_per_layer
+        self.idle_seconds = idle_seconds
+        self.pause_at = pause_at
+        self.pause_seconds = pause_seconds
+        self.fail_at = fail_at
+        self.random = random.Random(42)
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.gcode_state = "IDLE"
+        self.printed_seconds = 0.0
+        self.paused_once = False
+        self.print_error = 0
+        self.hms = []
+        self.nozzle = 25.0
+        self.bed = 22.0
+        self.state_since = time.monotonic()
+        self.last_step = self.state_since
+
+    @property
+    def layer(self):
+        return min(self.layers, int(self.printed_seconds / self.seconds_per_layer))
+
+    def next_sequence(self):
+        self.sequence += 1
+        return str(self.sequence)
+
+    def full_report(self):
+        """Antwort auf pushall: vollständiger Status"""
+        with self.lock:
+            info = self.print_fields()
+            heating = self.gcode_state in ("PREPARE", "RUNNING", "PAUSE")
+            info.update({
+                "command": "push_status", "msg": 0, "sequence_id": self.next_sequence(),
+                "subtask_name": "Simulator_Benchy" if self.gcode_state != "IDLE" else "",
+                "nozzle_target_temper": 220 if heating else 0,
+                "bed_target_temper": 55 if heating else 0,
+                "chamber_temper": 28,
+                "lights_report": [{"node": "chamber_light", "mode": "on"}],
+                "ams": {"ams": [{"id": "0", "humidity": "4", "temp": "0.0", "tray": [
+                    {"id": str(i), "tray_type": "PLA", "tray_color": "FFFFFFFF", "remain": 90 - i * 10}
+                    for i in range(4)]}], "tray_now": "0", "tray_tar": "0"}
+            })
+            return {"print": info}
+
+    def print_fields(self):
+        remaining = int((self.layers - self.layer) * self.seconds_per_layer / 60)
+        return {
+            "gcode_state": self.gcode_state,
+            "mc_percent": int(self.layer * 100 / self.layers),
+            "layer_num": self.layer,
+            "total_layer_num": self.layers,
+            "mc_remaining_time": remaining if self.gcode_state in ("RUNNING", "PAUSE") else 0,
+            "nozzle_temper": round(self.nozzle, 1),
+            "bed_temper": round(self.bed, 1),
+            "cooling_fan_speed": "15" if self.gcode_state == "RUNNING" else "0",
+            "print_error": self.print_error,
+            "hms": list(self.hms)
+        }
+
+    def set_state(self, gcode_state, now):
+        self.gcode_state = gcode_state
+        self.state_since = now
+
+    def step(self):
+        """Zustand fortschreiben und Delta-Report mit den geänderten Feldern liefern"""
+        with self.lock:
+            before = self.print_fields()
+            now = time.monotonic()
+            elapsed = now - self.state_since
+            dt, self.last_step = now - self.last_step, now
+
+            if self.gcode_state in ("IDLE", "FINISH", "FAILED"):
+                self.nozzle = max(25.0, self.nozzle - 20 * dt)
+                self.bed = max(22.0, self.bed - 5 * dt)
+                if elapsed >= self.idle_seconds:
+                    self.printed_seconds, self.paused_once = 0.0, False
+                    self.print_error, self.hms = 0, []
+                    self.set_state("PREPARE", now)
+            elif self.gcode_state == "PREPARE":
+                self.nozzle = min(220.0, self.nozzle + 80 * dt)
+                self.bed = min(55.0, self.bed + 20 * dt)
+                if self.nozzle >= 220 and self.bed >= 55:
+                    self.set_state("RUNNING", now)
+            elif self.gcode_state == "PAUSE":
+                if elapsed >= self.pause_seconds:
+                    self.set_state("RUNNING", now)
+            else:
+                self.printed_seconds += dt
+                if self.fail_at is not None and self.layer >= self.fail_at:
+                    self.print_error = 0x0300400C  # wie ein echter Druckfehler-Code
+                    self.hms = [{"attr": 0x03000200, "code": 0x00010001}]
+                    self.set_state("FAILED", now)
+                elif self.pause_at is not None and self.layer >= self.pause_at and not self.paused_once:
+                    self.paused_once = True
+                    self.set_state("PAUSE", now)
+                elif self.layer >= self.layers:
+                    self.set_state("FINISH", now)
+
+            # Messrauschen wie beim echten Sensor - jeder Takt liefert ein Delta
+            if self.gcode_state in ("RUNNING", "PAUSE"):
+                self.nozzle = 220.0 + self.random.uniform(-0.6, 0.6)
+                self.bed = 55.0 + self.random.uniform(-0.2, 0.2)
+
+            after = self.print_fields()
+            delta = {key: value for key, value in after.items() if before[key] != value}
+            if not delta:
+                return None
+            delta.update({"command": "push_status", "msg": 1, "sequence_id": self.next_sequence()})
+            return {"print": delta}
+
+
+class BambuSimulator:
+    """TLS-MQTT-Broker mit einem simulierten Drucker"""
+
+    def __init__(self, host="0.0.0.0", port=8883, serial="01P00A000000000", access_code="12345678",
+                 rate=2.0, drop_every=0.0, power_cycle_every=0.0, power_off_seconds=10.0,
+                 model=None, certificate=None):
+        self.host = host
+        self.port = port
+        self.serial = serial
+        self.access_code = access_code
+        self.report_interval = 1.0 / rate
+        self.drop_every = drop_every
+        self.power_cycle_every = power_cycle_every
+        self.power_off_seconds = power_off_seconds
+        self.model = model or PrinterModel()
+        self.certificate = certificate
+
+        self.clients = {}               # Socket -> Sende-Lock (pushall-Antwort und Report-Takt)
+        self.clients_lock = threading.Lock()
+        self.listener = None
+        self.powered = False
+        self.running = False
+        self.stats = {"connects": 0, "rejected": 0, "pushall": 0, "reports": 0}
+
+    @property
+    def report_topic(self):
+        return f"device/{self.serial}/report"
+
+    def start(self):
+        if self.certificate is None:
+            self.certificate = create_certificate(tempfile.mkdtemp(prefix="bambu-sim-"))
+        self.tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.tls.load_cert_chain(*self.certificate)
+        self.running = True
+        self.power_on()
+        threading.Thread(target=self.report_loop, daemon=True).start()
+        threading.Thread(target=self.stats_loop, daemon=True).start()
+        if self.drop_every or self.power_cycle_every:
+            threading.Thread(target=self.fault_loop, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.power_off()
+
+    def power_on(self):
+        """Drucker einschalten: Port öffnen"""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(5)
+        self.powered = True
+        threading.Thread(target=self.accept_loop, args=(self.listener,), daemon=True).start()
+        print(f"🟢 Drucker an - {self.host}:{self.port}")
+
+    def power_off(self):
+        """Drucker ausschalten: Port schließen, alle Verbindungen trennen"""
+        self.powered = False
+        if self.listener:
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)  # weckt accept() auf
+            except OSError:
+                pass
+            self.listener.close()
+            self.listener = None
+        self.drop_clients()
+        print("🔴 Drucker aus")
+
+    def drop_clients(self):
+        with self.clients_lock:
+            clients, self.clients = list(self.clients), {}
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+
+    def accept_loop(self, listener):
+        while self.powered and listener is self.listener:
+            try:
+                raw, address = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle_client, args=(raw, address), daemon=True).start()
+
+    def handle_client(self, raw, address):
+        try:
+            sock = self.tls.wrap_socket(raw, server_side=True)
+        except (ssl.SSLError, OSError):
+            raw.close()
+            return
+        try:
+            packet_type, flags, body = read_packet(sock)
+            if packet_type != CONNECT or not self.check_login(body):
+                self.stats["rejected"] += 1
+                sock.sendall(packet(CONNACK, b"\x00\x04"))  # Benutzername/Passwort falsch
+                sock.close()
+                return
+            sock.sendall(packet(CONNACK, b"\x00\x00"))
+            self.stats["connects"] += 1
+            print(f"🔗 Client verbunden: {address[0]}")
+
+            with self.clients_lock:
+                self.clients[sock] = threading.Lock()
+            while self.running:
+                packet_type, flags, body = read_packet(sock)
+                if packet_type == SUBSCRIBE:
+                    packet_id = body[:2]
+                    topics, offset = [], 2
+                    while offset < len(body):
+                        topic, offset = read_string(body, offset)
+                        offset += 1
+                        topics.append(topic)
+                    sock.sendall(packet(SUBACK, packet_id + b"\x00" * len(topics)))
+                elif packet_type == PUBLISH:
+                    topic, offset = read_string(body, 0)
+                    if flags & 0x06:
+                        offset += 2  # Packet-ID bei QoS > 0
+                    self.handle_request(sock, topic, body[offset:])
+                elif packet_type == PINGREQ:
+                    sock.sendall(packet(PINGRESP, b""))
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError, ssl.SSLError):
+            pass
+        finally:
+            with self.clients_lock:
+                self.clients.pop(sock, None)
+            sock.close()
+
+    def check_login(self, body):
+        """CONNECT prüfen: Benutzer bblp, Passwort = Access Code"""
+        offset = read_string(body, 0)[1] + 1      # Protokollname, Level
+        connect_flags = body[offset]
+        offset += 3                               # Flags, Keep-Alive
+        client_id, offset = read_string(body, offset)
+        if connect_flags & 0x04:                  # Will
+            offset = read_string(body, offset)[1]
+            offset = read_string(body, offset)[1]
+        username = password = None
+        if connect_flags & 0x80:
+            username, offset = read_string(body, offset)
+        if connect_flags & 0x40:
+            password, offset = read_string(body, offset)
+        return username == "bblp" and password == self.access_code
+
+    def handle_request(self, sock, topic, payload):
+        if topic != f"device/{self.serial}/request":
+            return
+        try:
+            command = json.loads(payload).get("pushing", {}).get("command")
+        except (ValueError, AttributeError):
+            return
+        if command == "pushall":
+            self.stats["pushall"] += 1
+            self.send(sock, self.model.full_report())
+
+    def send(self, sock, report):
+        data = packet(PUBLISH, encode_string(self.report_topic) + json.dumps(report).encode())
+        with self.clients_lock:
+            lock = self.clients.get(sock)
+        if lock is None:
+            return
+        try:
+            with lock:
+                sock.sendall(data)
+            self.stats["reports"] += 1
+        except OSError:
+            pass
+
+    def report_loop(self):
+        next_step = time.monotonic()
+        while self.running:
+            # Fester Takt statt sleep(interval) - auch bei hunderten Reports/s
+            next_step += self.report_interval
+            delay = next_step - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_step = time.monotonic()
+            if not self.powered:
+                continue
+            report = self.model.step()
+            if report:
+                with self.clients_lock:
+                    clients = list(self.clients)
+                for client in clients:
+                    self.send(client, report)
+
+    def stats_loop(self, interval=10.0):
+        """Alle interval Sekunden Reports/s und Verbindungen ausgeben"""
+        last_reports = 0
+        while self.running:
+            time.sleep(interval)
+            reports = self.stats["reports"]
+            print(f"📊 {(reports - last_reports) / interval:.0f} Reports/s, {len(self.clients)} Clients, "
+                  f"{self.stats['connects']} Verbindungen, {self.stats['pushall']} pushall, "
+                  f"Status {self.model.gcode_state} (Schicht {self.model.layer}/{self.model.layers})")
+            last_reports = reports
+
+    def fault_loop(self):
+        """Geplante Abbrüche und Aus-/Einschalten"""
+        last_drop = last_cycle = time.monotonic()
+        while self.running:
+            time.sleep(0.2)
+            now = time.monotonic()
+            if self.power_cycle_every and now - last_cycle >= self.power_cycle_every:
+                self.power_off()
+                time.sleep(self.power_off_seconds)
+                self.power_on()
+                last_cycle = last_drop = time.monotonic()
+            elif self.drop_every and now - last_drop >= self.drop_every:
+                print("✂️ Verbindungsabbruch")
+                self.drop_clients()
+                last_drop = now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bambu Lab Drucker-Simulator (TLS-MQTT auf Port 8883)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8883)
+    parser.add_argument("--serial", default="01P00A000000000")
+    parser.add_argument("--access-code", default="12345678")
+    parser.add_argument("--rate", type=float, default=2.0, help="Delta-Reports pro Sekunde (bis einige hundert)")
+    parser.add_argument("--layers", type=int, default=50)
+    parser.add_argument("--seconds-per-layer", type=float, default=1.0)
+    parser.add_argument("--pause-at", type=int, help="Druck bei dieser Schicht pausieren (PAUSE)")
+    parser.add_argument("--pause-seconds", type=float, default=5.0)
+    parser.add_argument("--fail-at", type=int, help="Druck bei dieser Schicht abbrechen (FAILED + HMS)")
+    parser.add_argument("--drop-every", type=float, default=0.0, help="Verbindungen alle N Sekunden trennen")
+    parser.add_argument("--power-cycle-every", type=float, default=0.0, help="Drucker alle N Sekunden aus/an")
+    parser.add_argument("--power-off-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    simulator = BambuSimulator(
+        host=args.host, port=args.port, serial=args.serial, access_code=args.access_code,
+        rate=args.rate, drop_every=args.drop_every,
+        power_cycle_every=args.power_cycle_every, power_off_seconds=args.power_off_seconds,
+        model=PrinterModel(layers=args.layers, seconds_per_layer=args.seconds_per_layer,
+                           pause_at=args.pause_at, pause_seconds=args.pause_seconds, fail_at=args.fail_at)
+    )
+    simulator.start()
+    print(f"Simulator läuft - Seriennummer {args.serial}, Access Code {args.access_code} (Strg+C beendet)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,9 @@ a = Analysis(
         'PIL',
         'PIL.Image', 
         'PIL.ImageTk',
-        'cv2',
         'paho.mqtt.client',
+        'websocket',
+        'orjson',
         'tkinter',
         'tkinter.ttk',
         'tkinter.font',
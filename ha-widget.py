@@ -22,16 +22,51 @@ from tkinter import ttk, messagebox
 import requests
 import threading
 import time
-from PIL import Image, ImageTk
+from PIL import Image, ImageTk, ImageChops
 import io
 from tkinter import font
 import paho.mqtt.client as mqtt
 import ssl
 import json
+import gzip
+import hashlib
+import zlib
+import argparse
 import os
+import re
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from collections import deque, OrderedDict
 from tkinter import filedialog
 from plyer import notification
 
+try:
+    import websocket  # optional: websocket-client für HA Push-Updates
+except ImportError:
+    websocket = None
+
+try:
+    import orjson  # optional: schnellerer JSON-Decoder für MQTT-Reports
+except ImportError:
+    orjson = None
+
+# Kamera-Größen (S, M, L, XL)
+CAMERA_SIZES = [
+    (480, 270),   # Klein
+    (640, 360),   # Medium
+    (720, 405),   # Groß
+    (960, 540)    # Sehr groß
+]
+
+# gcode_state -> (Anzeigetext, Farbe)
+PRINT_STATUS_TEXT = {
+    "RUNNING": ("Drucken", "#27ae60"),
+    "PAUSE": ("Pausiert", "#f39c12"),
+    "FINISH": ("Fertig", "#3498db"),
+    "FAILED": ("Fehler", "#e74c3c")
+}
+
 class HomeAssistantWidget:
     def __init__(self):
         # ===== KONFIGURATION - Wird aus Datei geladen =====
@@ -43,6 +78,7 @@ class HomeAssistantWidget:
                 "entity_id": "switch.your_switch_entity",
                 "camera_entity": "camera.your_camera_entity",
                 "light_entity": "light.your_printer_chamber_light",
+                "use_websocket": True,             # Push-Updates über /api/websocket
                 "entity_names": {
                     # Automatische Namen werden zur Laufzeit generiert
                 },
@@ -72,10 +108,14 @@ class HomeAssistantWidget:
                 "bambu_serial": "DEINE_SERIENNUMMER",     # Statt 01P05C2G1711725
                 "bambu_access_code": "DEIN_ACCESS_CODE",   # Statt 12345678
                 "printer_name": "3D Drucker",            # Benutzerdefinierten Drucker Namen
+                "decoder": "auto"                        # auto, json oder orjson
             },
             "ui": {
                 "default_camera_size": 2  # 0=S, 1=M, 2=L, 3=XL
             },
+            # Fleet-Modus: weitere Drucker mit name, bambu_ip, bambu_serial,
+            # bambu_access_code und optional entity_id / camera_entity
+            "printers": [],
             "automation": {
                 "auto_light_on_mqtt": True,        # Licht bei MQTT-Verbindung einschalten
                 "auto_light_only_dark": True,      # Nur bei Dunkelheit
@@ -108,8 +148,17 @@ class HomeAssistantWidget:
 
         # MQTT Status-Variablen hinzufügen
         self.mqtt_connected = False
-        self.mqtt_client = None
-        self.printer_status = {}
+        self.mqtt_interactive = False       # Verbindung vom Benutzer gestartet (mit Popups)
+        self.mqtt_auto_light = False        # Licht nach dem Verbinden einschalten
+        self.mqtt_notify_on_connect = False # Benachrichtigung nach Drucker-Einschalten
+        self.mqtt_recorder = None           # --record: rohe Reports aufzeichnen
+        self.mqtt_replayer = None           # --replay: Aufzeichnung statt Drucker
+        # Druckermodell, aus den MQTT-Reports fortgeschrieben
+        self.printer_state = PrinterState()
+        # Letzter Sammelabruf aller HA-Entities (entity_id -> State)
+        self.ha_states = {}
+        # Optionale WebSocket-Verbindung (Push statt Polling)
+        self.ha_ws = None
         # Druckername aus Konfiguration
         self.printer_name = self.config["mqtt"]["printer_name"]
         # µStreamer basierend auf Konfiguration aktivieren
@@ -117,14 +166,8 @@ class HomeAssistantWidget:
         self.stream_reader = None
         self.pip_window = None
         self.pip_active = False
-        self.main_camera_paused = False
         # Kamera-Größen-Einstellungen
-        self.camera_sizes = [
-            (480, 270),   # Klein
-            (640, 360),   # Medium
-            (720, 405),   # Groß
-            (960, 540)    # Sehr groß
-        ]
+        self.camera_sizes = list(CAMERA_SIZES)
         self.current_size_index = self.config["ui"]["default_camera_size"]
 
         # App-Größen entsprechend der Kamera-Größe
@@ -135,16 +178,6 @@ class HomeAssistantWidget:
             (1600, 1030)  # Sehr groß - App sehr groß
         ]
 
-        # Cache für letzte bekannte Druckdaten
-        self.last_print_data = {
-            'progress': 0,
-            'layer_num': 0,
-            'total_layers': 0,
-            'remaining_time': 0,
-            'print_time': 0,
-            'filename': 'Kein Druck aktiv',
-            'gcode_state': 'IDLE'
-        }
         # ===== ENDE KONFIGURATION =====
 
         # Status-Tracking für Benachrichtigungen
@@ -154,9 +187,72 @@ class HomeAssistantWidget:
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
+        # Gemeinsamer HTTP-Client (Connection-Pool, Keep-Alive) für alle HA-Aufrufe
+        self.ha_client = HAClient(self.ha_url, self.headers)
+
+        # Alle Widget-Änderungen aus Hintergrund-Threads laufen über diese Queue
+        self.ui_queue = queue.Queue()
+        # Hintergrund-Poller für HA-Status
+        self.status_poller_running = False
+        self.status_wakeup = threading.Event()
+        self.poll_scheduler = PollScheduler()
+        # MQTT: paho-Thread nur einreihen, Parsen/Zusammenfassen im Ingest-Thread
+        self.report_sync = ReportSync()
+        self.report_sync_active = False
+        self.mqtt_ingest = MqttIngest(
+            on_report=self.queue_printer_report,
+            sync=self.report_sync,
+            decoder=self.config["mqtt"]["decoder"]
+        )
+        self.mqtt_ingest.start()
+        # Genau ein MQTT-Client; Reconnect mit Backoff übernimmt paho
+        self.mqtt_session = MqttSession(
+            on_state=self.ui_callback(self.on_mqtt_state),
+            on_message=self.on_mqtt_message
+        )
+        # Fleet-Modus: weitere Drucker teilen sich Ingest, HA-Client und Threads
+        self.fleet = None
+        self.fleet_window = None
+        self.fleet_tiles = {}
+        if self.config.get("printers"):
+            self.fleet = FleetBackend(
+                self.config["printers"],
+                self.mqtt_ingest,
+                self.ha_client,
+                on_state=self.ui_callback(self.on_fleet_state),
+                on_camera=self.ui_callback(self.show_fleet_camera)
+            )
+
+        # Kamera: fester Capture- und Decode-Thread statt Thread pro Frame
+        # Ein Abruf + ein Decode pro Bild, verteilt auf Hauptfenster und PiP
+        self.camera_pipeline = CameraPipeline(source=self.capture_camera_frame)
+        self.camera_pipeline.add_view(
+            "main",
+            size_getter=lambda: self.camera_sizes[self.current_size_index],
+            on_frame=self.ui_callback(self.show_camera_image)
+        )
+        self.pip_box = None  # PiP-Rahmengröße, im Tk-Thread aktualisiert
+        self.camera_pipeline.add_view(
+            "pip",
+            size_getter=lambda: self.pip_box,
+            on_frame=self.ui_callback(self.show_pip_image),
+            fit=True,
+            active=False
+        )
+
+        # Titelbild: nur bei neuem Bild laden, Cache nach Inhalts-Hash (auch auf Platte)
+        self.titelbild_cache = ImageCache("titelbild_cache")
+        self.titelbild_signature = None
+        # UI-Zustand: Widgets zeichnen nur bei geänderten Werten neu
+        self.store = StateStore(schedule=lambda flush: self.root.after_idle(flush))
 
         self.setup_gui()
+        # Ein PhotoImage pro Ansicht, neue Pixel werden hineinkopiert
+        self.camera_surface = FrameSurface(self.camera_label)
+        self.pip_surface = None
+        self.bind_status_widgets()
         self.set_camera_size(self.current_size_index)
+        self.process_ui_queue()
 
         # Setup-Wizard anzeigen wenn nicht konfiguriert
         if not self.is_configured():
@@ -168,20 +264,62 @@ class HomeAssistantWidget:
         # MQTT nur starten wenn Drucker eingeschaltet ist
         self.root.after(2000, self.check_printer_and_start_mqtt)
 
+        if self.fleet:
+            self.root.after(1500, self.start_fleet)
+
         # Cleanup beim Schließen
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    def run_on_ui(self, func, *args):
+        """Funktion im Tk-Thread ausführen lassen (thread-sicher)"""
+        self.ui_queue.put((func, args))
+
+    def ui_callback(self, func):
+        """Callback-Wrapper, der func immer im Tk-Thread ausführt (z.B. für paho)"""
+        return lambda *args: self.run_on_ui(func, *args)
+
+    def process_ui_queue(self):
+        """UI-Queue im Tk-Thread abarbeiten - einzige Stelle für Widget-Updates aus Threads"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"UI-Update Fehler ({getattr(func, '__name__', func)}): {e}")
+        except queue.Empty:
+            pass
+        self.root.after(30, self.process_ui_queue)
+
+    def run_in_background(self, func, *args):
+        """Blockierende Arbeit (HTTP etc.) in einem Daemon-Thread ausführen"""
+        threading.Thread(target=func, args=args, daemon=True).start()
+
     def on_closing(self):
         """App wird geschlossen"""
+        self.status_poller_running = False
+        self.status_wakeup.set()
+        self.camera_pipeline.stop()
+        self.mqtt_ingest.stop()
+        self.mqtt_session.stop()
+        if self.fleet:
+            self.fleet.stop()
+        if self.mqtt_replayer:
+            self.mqtt_replayer.stop()
+        if self.mqtt_recorder:
+            self.mqtt_recorder.close()
+        if self.ha_ws:
+            self.ha_ws.stop()
         if self.stream_reader:
             self.stream_reader.stop_stream()
+        self.ha_client.close()
         self.root.destroy()
 
     def check_and_start_updates(self):
         """Startet Updates immer"""
+        self.start_websocket()
         self.update_status()
         self.update_camera()
-        self.update_titelbild()
 
     def check_printer_and_start_mqtt(self):
         """Prüft Drucker-Status und startet MQTT nur wenn Drucker eingeschaltet ist"""
@@ -190,9 +328,15 @@ class HomeAssistantWidget:
             print("HA nicht konfiguriert - MQTT-Check übersprungen")
             return
 
-        # Drucker-Status von Home Assistant abrufen
-        state_data = self.get_state()
+        # Drucker-Status von Home Assistant im Hintergrund abrufen
+        def check():
+            state_data = self.get_state()
+            self.run_on_ui(self.start_mqtt_if_printer_on, state_data)
+
+        self.run_in_background(check)
 
+    def start_mqtt_if_printer_on(self, state_data):
+        """MQTT starten wenn der abgerufene Drucker-Status 'on' ist"""
         if state_data and state_data["state"] == "on":
             print("✅ Drucker ist an - starte MQTT-Verbindung...")
             self.auto_connect_mqtt()
@@ -227,47 +371,22 @@ class HomeAssistantWidget:
             # Fenster positionieren
             window.geometry(f"{width}x{height}+{x}+{y}")
 
-    def update_pip_camera(self):
-        """PiP-Kamera aktualisieren - separate von Hauptkamera"""
-        if not self.pip_active or not self.pip_window:
+    def on_pip_configure(self, event):
+        """PiP-Fenstergröße merken, damit der Decode-Thread sie ohne Tk lesen kann"""
+        if event.widget is not self.pip_window:
             return
+        if event.width > 100 and event.height > 50:
+            self.pip_box = (event.width - 10, event.height - 10)
+        else:
+            self.pip_box = None
 
-        def update():
-            image_data = self.get_camera_image()
-            if image_data and self.pip_window:
-                try:
-                    image = Image.open(io.BytesIO(image_data))
-
-                    # An PiP-Fenstergröße anpassen
-                    pip_width = self.pip_window.winfo_width()
-                    pip_height = self.pip_window.winfo_height()
-
-                    if pip_width > 100 and pip_height > 50:
-                        img_ratio = image.width / image.height
-                        win_ratio = pip_width / pip_height
-
-                        if img_ratio > win_ratio:
-                            new_width = pip_width - 10
-                            new_height = int(new_width / img_ratio)
-                        else:
-                            new_height = pip_height - 10
-                            new_width = int(new_height * img_ratio)
-
-                        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        photo = ImageTk.PhotoImage(image)
-
-                        if self.pip_camera_label and self.pip_window:
-                            self.pip_camera_label.config(image=photo, text="")
-                            self.pip_camera_label.image = photo
-
-                except Exception as e:
-                    if self.pip_camera_label and self.pip_window:
-                        self.pip_camera_label.config(text="PiP Fehler")
-
-        # PiP nur aktualisieren nicht Threading für bessere Performance
-        if self.pip_active:
-            update()  # Direkt aufrufen, kein Thread
-            self.root.after(66, self.update_pip_camera)  # Auch nur 5 FPS
+    def show_pip_image(self, image):
+        """Fertig skaliertes PiP-Bild anzeigen (Tk-Thread)"""
+        try:
+            if self.pip_surface and self.pip_window:
+                self.pip_surface.show(image)
+        finally:
+            self.camera_pipeline.frame_displayed("pip")
 
     def update_runtime_variables(self):
         """Runtime-Variablen aus Konfiguration aktualisieren"""
@@ -288,79 +407,103 @@ class HomeAssistantWidget:
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
+        if hasattr(self, 'ha_client'):
+            self.ha_client.configure(self.ha_url, self.headers)
         # Light Entity aktualisieren
         self.light_entity = self.config["homeassistant"]["light_entity"]
 
 
+    def mqtt_ready(self):
+        """MQTT-Zugangsdaten konfiguriert?"""
+        return bool(self.bambu_ip != "DEINE_DRUCKER_IP" and
+                    self.bambu_serial != "DEINE_SERIENNUMMER" and
+                    self.bambu_access_code != "DEIN_ACCESS_CODE" and
+                    self.bambu_ip and self.bambu_serial and self.bambu_access_code)
+
+    def start_mqtt_session(self, interactive=False):
+        """MQTT-Sitzung starten - wirkungslos wenn schon eine läuft"""
+        if not self.mqtt_ready() or self.mqtt_replayer:
+            return False
+        self.mqtt_interactive = interactive
+        return self.mqtt_session.start(self.bambu_ip, self.bambu_serial, self.bambu_access_code)
+
     def auto_connect_mqtt(self):
         """MQTT automatisch und still verbinden - NICHT-BLOCKIEREND"""
         # Nur MQTT-Daten prüfen, KEINE Home Assistant Abhängigkeit
-        mqtt_ready = (self.bambu_ip != "DEINE_DRUCKER_IP" and
-                     self.bambu_serial != "DEINE_SERIENNUMMER" and
-                     self.bambu_access_code != "DEIN_ACCESS_CODE" and
-                     self.bambu_ip and self.bambu_serial and self.bambu_access_code)
-
-        if not self.mqtt_connected and mqtt_ready:
-            # MQTT-Verbindung in separatem Thread starten
-            def connect_in_thread():
+        if self.mqtt_session.is_active():
+            return
+        self.mqtt_auto_light = True
+        if not self.start_mqtt_session():
+            self.mqtt_auto_light = False
+
+    def on_mqtt_state(self, state, reason_code):
+        """Zustandswechsel der MQTT-Sitzung darstellen (Tk-Thread)"""
+        self.mqtt_connected = (state == MqttSession.CONNECTED)
+        self.show_mqtt_state(state)
+
+        if state == MqttSession.CONNECTED:
+            reconnect_seconds = self.mqtt_session.stats["reconnect_seconds"]
+            print(f"✅ MQTT verbunden (nach {reconnect_seconds:.1f}s)")
+            self.mqtt_interactive = False
+
+            # Einmal vollständigen Status holen, danach nur noch Deltas
+            self.report_sync.reset()
+            self.send_pushall_command("connect")
+            self.start_report_sync()
+
+            if self.mqtt_auto_light:
+                # Licht in 2 Sekunden automatisch einschalten
+                self.mqtt_auto_light = False
+                print("⏰ MQTT verbunden - Licht wird in 2 Sekunden eingeschaltet...")
+                self.root.after(2000, self.simple_auto_light_with_time)
+
+            if self.mqtt_notify_on_connect:
+                self.mqtt_notify_on_connect = False
                 try:
-                    # MQTT Client erstellen
-                    self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-                    self.mqtt_client.username_pw_set("bblp", self.bambu_access_code)
-                    self.mqtt_client.on_connect = self.on_mqtt_connect_silent
-                    self.mqtt_client.on_message = self.on_mqtt_message
-                    self.mqtt_client.on_disconnect = self.on_mqtt_disconnect_silent
-
-                    # SSL Context
-                    context = ssl.create_default_context()
-                    context.check_hostname = False
-                    context.verify_mode = ssl.CERT_NONE
-                    self.mqtt_client.tls_set_context(context)
-
-                    # Verbindung herstellen (NICHT-BLOCKIEREND im Thread)
-                    self.mqtt_client.connect(self.bambu_ip, 8883, 60)
-                    self.mqtt_client.loop_start()
-
-                except Exception as e:
-                    # Stille Fehlerbehandlung - nur Status aktualisieren
-                    print(f"Auto-MQTT Thread Fehler: {e}")
-                    # GUI-Update im Hauptthread
-                    self.root.after(0, lambda: self.update_mqtt_status_after_error())
-
-            # Thread starten
-            threading.Thread(target=connect_in_thread, daemon=True).start()
+                    notification.notify(
+                        title="🔗 MQTT verbunden",
+                        message="Drucker-Überwachung ist jetzt aktiv",
+                        app_name="3D Drucker Widget",
+                        timeout=5
+                    )
+                except Exception:
+                    pass
 
-    def update_mqtt_status_after_error(self):
-        """GUI-Update nach MQTT-Fehler im Hauptthread"""
+        elif state == MqttSession.BACKOFF and reason_code is not None:
+            # KEIN messagebox bei unerwarteter Trennung - paho verbindet neu
+            print(f"🔄 MQTT getrennt ({reason_code}) - neuer Versuch läuft...")
+
+        elif state == MqttSession.IDLE:
+            self.mqtt_auto_light = False
+            error = self.mqtt_session.last_error
+            if error is not None:
+                print(f"❌ MQTT abgelehnt: {error}")
+                if self.mqtt_interactive:
+                    messagebox.showerror("MQTT Fehler", f"Verbindung fehlgeschlagen: {error}\n\nPrüfe den Access Code!")
+            self.mqtt_interactive = False
+
+            # Druckermodell zurücksetzen
+            self.printer_state.reset()
+
+            # UI zurücksetzen
+            self.publish_printer_state()
+            self.update_poll_context()
+
+    def show_mqtt_state(self, state):
+        """Status-Label und Verbinden-Button passend zum Sitzungszustand setzen"""
+        label_text, color, button_text = {
+            MqttSession.CONNECTED: ("📡 MQTT: Verbunden", "#27ae60", "📡 MQTT Trennen"),
+            MqttSession.CONNECTING: ("📡 MQTT: Verbinde...", "#f39c12", "🔄 Verbinde..."),
+            MqttSession.BACKOFF: ("📡 MQTT: Neuer Versuch...", "#f39c12", "🔄 Verbinde..."),
+            MqttSession.DRAINING: ("📡 MQTT: Trenne...", "#95a5a6", "📡 MQTT Trennen"),
+            MqttSession.IDLE: ("📡 MQTT: Getrennt", "#e74c3c", "📡 MQTT Verbinden")
+        }[state]
         if hasattr(self, 'mqtt_status_label'):
-            self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-
-    def on_mqtt_connect_silent(self, client, userdata, flags, reason_code, properties):
-        """MQTT Verbindung hergestellt - OHNE Popup"""
-        if reason_code == 0:
-            self.mqtt_connected = True
-            if hasattr(self, 'mqtt_status_label'):
-                self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-            self.mqtt_connect_btn.config(text="📡 MQTT Trennen", state="normal")
-
-            # Status Topic abonnieren
-            topic = f"device/{self.bambu_serial}/report"
-            client.subscribe(topic)
-
-            # Pushall Command senden
-            self.send_pushall_command()
-
-            # Periodisches Pushall alle 10 Sekunden
-            self.schedule_periodic_pushall()
-
-            # Licht in 2 Sekunden automatisch einschalten
-            print("⏰ MQTT verbunden - Licht wird in 2 Sekunden eingeschaltet...")
-            self.root.after(2000, self.simple_auto_light_with_time)
-        else:
-            self.mqtt_connected = False
-            if hasattr(self, 'mqtt_status_label'):
-                self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-            self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
+            self.mqtt_status_label.config(text=label_text, fg=color)
+        self.mqtt_connect_btn.config(
+            text=button_text,
+            state="disabled" if state == MqttSession.DRAINING else "normal"
+        )
 
     def get_ustreamer_image(self):
         """Bild von µStreamer MJPEG-Stream holen"""
@@ -376,7 +519,7 @@ class HomeAssistantWidget:
 
             stream_url = f"http://{pi5_ip}:{port}/stream"
 
-            # Auth falls nötig
+            # Auth falls nötig (Basic Auth direkt über requests)
             auth = None
             if username and password:
                 from requests.auth import HTTPBasicAuth
@@ -392,23 +535,16 @@ class HomeAssistantWidget:
         # Neuestes Frame holen
         return self.stream_reader.get_latest_frame()
 
-    def on_mqtt_disconnect_silent(self, client, userdata, disconnect_flags, reason_code, properties):
-        """MQTT Verbindung getrennt - OHNE Popup"""
-        self.mqtt_connected = False
-        if hasattr(self, 'mqtt_status_label'):
-            self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-        self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
-
-        # KEIN messagebox bei unerwarteter Trennung
-
     def toggle_light(self):
-        """Druckraumlicht ein/ausschalten"""
-        light_entity = self.light_entity
+        """Druckraumlicht ein/ausschalten - HTTP im Hintergrund"""
+        self.run_in_background(self.toggle_light_worker, self.light_entity)
 
+    def toggle_light_worker(self, light_entity):
+        """Licht umschalten (Hintergrund-Thread), Rückmeldungen über die UI-Queue"""
         # Aktuellen Status abrufen
         light_data = self.get_state(light_entity)
         if not light_data:
-            messagebox.showwarning("Warnung", "Lichtstatus konnte nicht abgerufen werden!")
+            self.run_on_ui(messagebox.showwarning, "Warnung", "Lichtstatus konnte nicht abgerufen werden!")
             return
 
         current_state = light_data["state"]
@@ -423,34 +559,30 @@ class HomeAssistantWidget:
 
         # Befehl senden
         try:
-            response = requests.post(
-                f"{self.ha_url}/api/services/{service_domain}/{service}",
-                json={"entity_id": light_entity},
-                headers=self.headers,
-                timeout=5
-            )
+            response = self.ha_client.call_service(service_domain, service,
+                                                   {"entity_id": light_entity})
 
             if response.status_code == 200:
                 # Button sofort aktualisieren für besseres UX
                 new_state = "off" if current_state == "on" else "on"
-                self.update_light_button_state(new_state)
+                self.run_on_ui(self.update_light_button_state, new_state)
 
                 # Nach kurzer Verzögerung echten Status abrufen
-                self.root.after(1000, self.update_light_from_server)
+                self.run_on_ui(self.root.after, 1000, self.update_light_from_server)
             else:
-                messagebox.showerror("Fehler", f"Licht-Befehl fehlgeschlagen: {response.status_code}")
+                self.run_on_ui(messagebox.showerror, "Fehler", f"Licht-Befehl fehlgeschlagen: {response.status_code}")
 
         except Exception as e:
-            messagebox.showerror("Fehler", f"Verbindungsfehler beim Lichtschalten: {str(e)}")
+            self.run_on_ui(messagebox.showerror, "Fehler", f"Verbindungsfehler beim Lichtschalten: {str(e)}")
 
     def update_light_from_server(self):
         """Lichtstatus vom Server abrufen und Button aktualisieren"""
-        light_entity = self.light_entity
-        light_data = self.get_state(light_entity)
+        def fetch():
+            light_data = self.get_state(self.light_entity)
+            if light_data:
+                self.run_on_ui(self.update_light_button_state, light_data["state"])
 
-        if light_data:
-            state = light_data["state"]
-            self.update_light_button_state(state)
+        self.run_in_background(fetch)
 
     def update_light_button_state(self, state):
         """Licht-Button basierend auf Status aktualisieren"""
@@ -855,49 +987,7 @@ class HomeAssistantWidget:
         canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
 
         # Labels für Sensoren erstellen - Moderne Rows
-        self.sensor_labels = {}
-        for i, entity in enumerate(self.entities):
-            # Benutzerdefinierten Namen verwenden falls vorhanden
-            entity_names = self.config["homeassistant"].get("entity_names", {})
-            if entity in entity_names:
-                name = entity_names[entity]
-            else:
-                full_name = entity.split('.')[-1].replace('_', ' ').title()
-                # Generisches Prefix-Cleaning für Bambu Drucker
-                import re
-                name = re.sub(r'^P1S [A-Z0-9]+ ', '', full_name).strip()
-                if not name:  # Falls alles entfernt wurde
-                    name = full_name
-
-            # Alternating row colors
-            row_color = '#34495e' if i % 2 == 0 else '#2c3e50'
-
-            row_frame = tk.Frame(self.scrollable_frame, bg=row_color, relief='flat')
-            row_frame.pack(fill=tk.X, padx=5, pady=2, ipady=8)
-
-            name_label = tk.Label(
-                row_frame,
-                text=f"{name}:",
-                width=22,
-                anchor="w",
-                font=self.font_normal,
-                bg=row_color,
-                fg='#bdc3c7'
-            )
-            name_label.pack(side="left", padx=(10, 5))
-
-            value_label = tk.Label(
-                row_frame,
-                text="Lade...",
-                anchor="w",
-                width=25,
-                font=self.font_normal,
-                bg=row_color,
-                fg='#3498db'
-            )
-            value_label.pack(side="left", padx=(5, 10))
-
-            self.sensor_labels[entity] = value_label
+        self.build_sensor_rows()
 
         # Mouse wheel scrolling
         def on_mousewheel(event):
@@ -931,7 +1021,9 @@ class HomeAssistantWidget:
         connection_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Verbindung", menu=connection_menu)
         connection_menu.add_command(label="MQTT neu verbinden", command=self.reconnect_mqtt)
+        connection_menu.add_command(label="Druckerstatus neu laden", command=self.request_full_status)
         connection_menu.add_command(label="Status anzeigen", command=self.show_connection_status)
+        connection_menu.add_command(label="Drucker-Übersicht", command=self.open_fleet_view)
 
         # Hilfe-Menü
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -1177,14 +1269,20 @@ class HomeAssistantWidget:
             self.token = self.config["homeassistant"]["token"]
             self.entity_id = self.config["homeassistant"]["entity_id"]
             self.camera_entity = self.config["homeassistant"]["camera_entity"]
+            self.light_entity = self.config["homeassistant"]["light_entity"]
+            self.bind_status_widgets()
 
             # Headers neu setzen
             self.headers = {
                 "Authorization": f"Bearer {self.token}",
                 "Content-Type": "application/json"
             }
+            self.ha_client.configure(self.ha_url, self.headers)
 
             self.save_config()
+            # WebSocket mit neuer URL/Token neu aufbauen
+            if self.ha_ws:
+                self.start_websocket()
             messagebox.showinfo("Gespeichert", "Home Assistant Einstellungen gespeichert!")
             settings_window.destroy()
 
@@ -1268,6 +1366,11 @@ class HomeAssistantWidget:
             # Druckername sofort aktualisieren
             self.printer_name = self.config["mqtt"]["printer_name"]
             self.update_printer_title()
+            # Titelbild-Entity hängt an der Seriennummer
+            self.bind_status_widgets()
+            # WebSocket mit der neuen Entity-Liste neu abonnieren
+            if self.ha_ws and self.ha_ws.entity_ids != set(self.collect_cycle_entities()):
+                self.start_websocket()
 
             messagebox.showinfo("Gespeichert", "MQTT Einstellungen gespeichert!")
             settings_window.destroy()
@@ -1411,23 +1514,90 @@ class HomeAssistantWidget:
 
     def reconnect_mqtt(self):
         """MQTT neu verbinden"""
-        if self.mqtt_connected:
-            self.disconnect_mqtt()
-        self.root.after(1000, self.connect_mqtt)
+        if not self.mqtt_ready():
+            messagebox.showwarning("MQTT", "MQTT ist nicht konfiguriert!")
+            return
+        self.mqtt_interactive = True
+        self.mqtt_session.configure(self.bambu_ip, self.bambu_serial, self.bambu_access_code)
+        self.mqtt_session.stop(restart=True)
+        self.root.after(15000, self.check_mqtt_connection)
 
     def show_connection_status(self):
         """Verbindungsstatus anzeigen"""
         ha_status = "✅ Verbunden" if self.ha_url and self.token else "❌ Nicht konfiguriert"
         mqtt_status = "✅ Verbunden" if self.mqtt_connected else "❌ Getrennt"
 
+        if self.ha_client.breaker.is_open():
+            ha_status = f"⚠️ Nicht erreichbar (nächster Versuch in {self.ha_client.breaker.retry_in():.0f}s)"
+
+        http_lines = ""
+        for endpoint, entry in sorted(self.ha_client.get_stats().items()):
+            http_lines += (f"\n    {endpoint}: {entry['requests']} Anfragen, {entry['errors']} Fehler, "
+                           f"Ø {entry['avg_ms']:.0f} ms, {entry['bytes'] / 1024:.0f} KB")
+
+        store_stats = self.store.stats
+        titelbild_stats = self.titelbild_cache.stats
+        poll_stats = self.poll_scheduler.get_stats()
+        poll_classes = ", ".join(f"{name} {count}" for name, count in sorted(poll_stats["classes"].items()))
+        camera_stats = self.camera_pipeline.stats
+        surface_stats = self.camera_surface.stats
+        mqtt_stats = self.mqtt_ingest.get_stats()
+        sync_stats = self.report_sync.stats
+        session = self.mqtt_session
+        latency_lines = "".join(f"\n      {line}" for line in self.mqtt_ingest.latency.lines())
+        reconnect_line = ""
+        if session.stats["reconnect_seconds"] is not None:
+            reconnect_line = f", letzte Verbindung nach {session.stats['reconnect_seconds']:.1f}s"
+        pushall_counts = ", ".join(f"{reason} {count}" for reason, count in
+                                   sorted(sync_stats["pushall"].items())) or "keine"
+        fleet_line = ""
+        if self.fleet:
+            connected = sum(1 for printer in self.fleet.printers.values()
+                            if printer.session.state == MqttSession.CONNECTED)
+            fleet_stats = self.fleet.stats
+            fleet_line = (f"\n\n    Fleet: {connected}/{len(self.fleet.printers)} Drucker verbunden, "
+                          f"{fleet_stats['pushall']} pushall,\n    Kacheln: {fleet_stats['camera_frames']} Bilder, "
+                          f"{fleet_stats['camera_errors']} Fehler")
+        stream_line = ""
+        if self.stream_reader:
+            stream_line = (f"\n    µStreamer: {self.stream_reader.fps:.1f} FPS, "
+                           f"{self.stream_reader.frames_received} Frames "
+                           f"({self.stream_reader.frames_skipped} übersprungen), "
+                           f"{self.stream_reader.bytes_received / 1048576:.1f} MB")
+            # Bildalter zählt erst ab Empfang - die Zeit in der Kamera kommt hinzu
+            latency = self.stream_reader.source_latency()
+            if latency is not None:
+                stream_line += f",\n    dazu Kamera->Empfang {latency * 1000:.0f} ms (X-Timestamp)"
+
         status_text = f"""Verbindungsstatus:
 
     Home Assistant: {ha_status}
     URL: {self.ha_url}
+    HTTP:{http_lines or " noch keine Anfragen"}
+    Sofort abgewiesen (HA offline): {self.ha_client.short_circuited}
+    Titelbild: {titelbild_stats['downloads']} geladen ({titelbild_stats['bytes'] / 1024:.0f} KB), {titelbild_stats['resized']} skaliert,
+    {titelbild_stats['hits']} Cache-Treffer, {titelbild_stats['disk_hits']} von Platte
+    UI-Store: {store_stats['changes']} Änderungen von {store_stats['sets']} Werten,
+    {store_stats['renders']} Widget-Updates in {store_stats['flushes']} Durchläufen
+    Abrufplan: {poll_classes or "keine Entities"}
+    {poll_stats['requests']} Abrufe, {poll_stats['entities']} Entity-Abfragen (fest alle 5s: {poll_stats['baseline']})
+
+    Kamera: {camera_stats['captured']} geholt, {camera_stats['displayed']} angezeigt,
+    {camera_stats['dropped_capture']} verworfen, {camera_stats['errors']} Fehler,
+    unverändert übersprungen: {camera_stats['skipped_identical']} identisch, {camera_stats['skipped_similar']} ähnlich,
+    Bildpuffer: {surface_stats['frames']} Frames, {surface_stats['allocations']} neu angelegt,
+    Bildalter Ø {camera_stats['frame_age_ms']:.0f} ms{stream_line}
 
     MQTT Drucker: {mqtt_status}
     IP: {self.bambu_ip}
     Serial: {self.bambu_serial}
+    Reports: {mqtt_stats['received']} empfangen, {mqtt_stats['dropped']} verworfen,
+    {mqtt_stats['coalesced']} zusammengefasst, {mqtt_stats['refreshes']} UI-Updates,
+    Queue {mqtt_stats['depth']} (max {mqtt_stats['max_depth']}), Ø {mqtt_stats['avg_ms']:.2f} ms/Nachricht
+    Pushall: {pushall_counts}, {sync_stats['gaps']} Sequenzlücken
+    Decoder: {self.mqtt_ingest.decoder_name}
+    Sitzung: {session.state}, {session.stats['connects']} Verbindungen, {session.stats['disconnects']} Abbrüche{reconnect_line}
+    Latenz:{latency_lines or " noch keine Reports"}{fleet_line}
     """
 
         messagebox.showinfo("Verbindungsstatus", status_text)
@@ -1710,19 +1880,24 @@ class HomeAssistantWidget:
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
 
-        # Erstelle neue Labels für alle Entities
+        self.build_sensor_rows()
+        self.bind_status_widgets()
+
+    def build_sensor_rows(self):
+        """Eine Zeile pro Entity anlegen und die Formatierer-Registry kompilieren"""
+        self.store.unsubscribe("sensors")
         self.sensor_labels = {}
+        self.sensor_registry = {}
+        entity_names = self.config["homeassistant"].get("entity_names", {})
         for i, entity in enumerate(self.entities):
             # Benutzerdefinierten Namen verwenden falls vorhanden
-            entity_names = self.config["homeassistant"].get("entity_names", {})
             if entity in entity_names:
                 name = entity_names[entity]
             else:
                 full_name = entity.split('.')[-1].replace('_', ' ').title()
                 # Generisches Prefix-Cleaning für Bambu Drucker
-                import re
                 name = re.sub(r'^P1S [A-Z0-9]+ ', '', full_name).strip()
-                if not name:
+                if not name:  # Falls alles entfernt wurde
                     name = full_name
 
             # Alternating row colors
@@ -1754,60 +1929,33 @@ class HomeAssistantWidget:
             value_label.pack(side="left", padx=(5, 10))
 
             self.sensor_labels[entity] = value_label
+            sensor = SensorFormatter(entity, value_label)
+            self.sensor_registry[entity] = sensor
+            self.store.subscribe((entity, "ha_stale"), lambda sensor=sensor: self.render_sensor(sensor),
+                                 owner="sensors")
+
+        # Düsentemperatur als Druck-Fallback (ohne MQTT) - einmal statt pro Zyklus suchen
+        self.nozzle_temp_entity = next(
+            (entity for entity in self.entities
+             if "temperatur_der_duse" in entity or "nozzle_temp" in entity), None)
 
     def connect_mqtt(self):
-        """MQTT Verbindung zum Bambu Drucker herstellen - MIT Popups - NICHT-BLOCKIEREND"""
-        if self.mqtt_connected:
+        """MQTT Verbindung zum Bambu Drucker herstellen/trennen - MIT Popups - NICHT-BLOCKIEREND"""
+        if self.mqtt_session.is_active():
             self.disconnect_mqtt()
             return
 
-        # Status anzeigen
-        if hasattr(self, 'mqtt_status_label'):
-            self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-        self.mqtt_connect_btn.config(text="🔄 Verbinde...", state="disabled")
-
-        def connect_in_thread():
-            try:
-                # MQTT Client erstellen
-                self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-                self.mqtt_client.username_pw_set("bblp", self.bambu_access_code)
-                self.mqtt_client.on_connect = self.on_mqtt_connect  # MIT Popup
-                self.mqtt_client.on_message = self.on_mqtt_message
-                self.mqtt_client.on_disconnect = self.on_mqtt_disconnect  # MIT Popup
-
-                # SSL Context
-                context = ssl.create_default_context()
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
-                self.mqtt_client.tls_set_context(context)
-
-                # Verbindung herstellen (mit Timeout)
-                self.mqtt_client.connect(self.bambu_ip, 8883, 60)
-                self.mqtt_client.loop_start()
-
-                # Nach 15 Sekunden prüfen ob Verbindung erfolgreich
-                self.root.after(15000, self.check_mqtt_connection)
-
-            except Exception as e:
-                # GUI-Update im Hauptthread
-                self.root.after(0, lambda: self.handle_mqtt_connect_error(str(e)))
-
-        # Thread starten
-        threading.Thread(target=connect_in_thread, daemon=True).start()
+        if not self.start_mqtt_session(interactive=True):
+            messagebox.showwarning("MQTT", "MQTT ist nicht konfiguriert!")
+            return
 
-    def handle_mqtt_connect_error(self, error_msg):
-        """MQTT-Verbindungsfehler im Hauptthread behandeln"""
-        if hasattr(self, 'mqtt_status_label'):
-            self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-        self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
-        messagebox.showerror("MQTT Fehler", f"Verbindung fehlgeschlagen:\n{error_msg}\n\nPrüfe IP-Adresse und Netzwerkverbindung!")
+        # Nach 15 Sekunden prüfen ob Verbindung erfolgreich
+        self.root.after(15000, self.check_mqtt_connection)
 
     def check_mqtt_connection(self):
         """Prüft ob MQTT-Verbindung erfolgreich war"""
-        if not self.mqtt_connected:
-            if hasattr(self, 'mqtt_status_label'):
-                self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-            self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
+        if self.mqtt_interactive and not self.mqtt_connected:
+            self.mqtt_session.stop()
             messagebox.showwarning("Verbindung fehlgeschlagen",
                                  "MQTT-Verbindung konnte nicht hergestellt werden.\n\n" +
                                  "Mögliche Ursachen:\n" +
@@ -1817,162 +1965,153 @@ class HomeAssistantWidget:
                                  "• Falscher Access Code")
 
     def disconnect_mqtt(self):
-        """MQTT Verbindung trennen"""
-        try:
-            if self.mqtt_client:
-                self.mqtt_client.loop_stop()
-                self.mqtt_client.disconnect()
-        except Exception as e:
-            print(f"MQTT Disconnect Fehler: {e}")
-
-        self.mqtt_connected = False
-        if hasattr(self, 'mqtt_status_label'):
-            self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-        self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
-
-        # Cache zurücksetzen
-        self.last_print_data = {
-            'progress': 0,
-            'layer_num': 0,
-            'total_layers': 0,
-            'remaining_time': 0,
-            'print_time': 0,
-            'filename': 'Kein Druck aktiv',
-            'gcode_state': 'IDLE'
-        }
-
-        # UI zurücksetzen
-        self.update_progress_ui()
-
-    def on_mqtt_connect(self, client, userdata, flags, reason_code, properties):
-        """MQTT Verbindung hergestellt"""
-        if reason_code == 0:
-            self.mqtt_connected = True
-            if hasattr(self, 'mqtt_status_label'):
-                self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-            self.mqtt_connect_btn.config(text="📡 MQTT Trennen", state="normal")
-
-            # Status Topic abonnieren
-            topic = f"device/{self.bambu_serial}/report"
-            client.subscribe(topic)
-
-            # Pushall Command senden
-            self.send_pushall_command()
-
-            # Periodisches Pushall alle 10 Sekunden
-            self.schedule_periodic_pushall()
+        """MQTT Verbindung trennen (Modell und UI werden im Zustand idle zurückgesetzt)"""
+        self.mqtt_interactive = False
+        self.mqtt_session.stop()
 
-        else:
-            self.mqtt_connected = False
-            if hasattr(self, 'mqtt_status_label'):
-                self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-            self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
-            messagebox.showerror("MQTT Fehler", f"Verbindung fehlgeschlagen: Code {reason_code}")
-
-    def on_mqtt_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
-        """MQTT Verbindung getrennt"""
-        self.mqtt_connected = False
-        if hasattr(self, 'mqtt_status_label'):
-            self.mqtt_status_label.config(text="📡 MQTT: Verbunden", fg="#27ae60")
-        self.mqtt_connect_btn.config(text="📡 MQTT Verbinden", state="normal")
-
-        if reason_code != 0:
-            messagebox.showwarning("Verbindung verloren", "MQTT-Verbindung wurde unerwartet getrennt!")
+    def start_report_sync(self):
+        """Überwachung der Report-Sequenz starten (läuft solange MQTT verbunden)"""
+        if self.report_sync_active:
+            return
+        self.report_sync_active = True
+        self.check_report_sync()
 
-    def schedule_periodic_pushall(self):
-        """Periodisches Pushall alle 10 Sekunden"""
-        if self.mqtt_connected:
-            self.send_pushall_command()
-            self.root.after(10000, self.schedule_periodic_pushall)  # 10 Sekunden
+    def check_report_sync(self):
+        """pushall nur bei Lücke oder veralteten Daten - statt alle 10 Sekunden"""
+        if not self.mqtt_connected:
+            self.report_sync_active = False
+            return
+        reason = self.report_sync.due()
+        if reason:
+            print(f"🔄 Drucker-Status unvollständig ({reason}) - fordere pushall an")
+            self.send_pushall_command(reason)
+        self.root.after(2000, self.check_report_sync)
+
+    def request_full_status(self):
+        """Vollständigen Druckerstatus auf Benutzerwunsch anfordern"""
+        if not self.mqtt_connected:
+            messagebox.showwarning("MQTT", "MQTT ist nicht verbunden!")
+            return
+        self.send_pushall_command("user")
 
     def on_mqtt_message(self, client, userdata, msg):
-        """MQTT Nachricht empfangen"""
-        try:
-            data = json.loads(msg.payload.decode())
-            self.printer_status = data
-            self.update_print_progress()
-        except Exception as e:
-            print(f"MQTT Nachricht Fehler: {e}")
-
-    def send_pushall_command(self):
-        """Pushall Command senden"""
-        if not self.mqtt_connected or not self.mqtt_client:
+        """MQTT Nachricht empfangen (paho-Thread) - nur in die Inbox legen"""
+        if self.mqtt_recorder:
+            self.mqtt_recorder.write(msg.payload)
+        self.mqtt_ingest.put(msg.payload)
+
+    def queue_printer_report(self, key, data):
+        """Zusammengefassten Report an den Tk-Thread übergeben (Ingest-Thread)"""
+        if key is None:
+            self.run_on_ui(self.handle_printer_report, data, time.monotonic())
+        elif self.fleet:
+            self.run_on_ui(self.handle_fleet_report, key, data, time.monotonic())
+
+    def handle_printer_report(self, data, queued_at=None):
+        """Drucker-Report ins Modell übernehmen und UI aktualisieren (Tk-Thread)"""
+        started = time.monotonic()
+        if queued_at is not None:
+            self.mqtt_ingest.latency.add("Tk-Queue", started - queued_at)
+        changed = self.printer_state.apply(data)
+        if changed:
+            self.update_print_progress(changed)
+        self.mqtt_ingest.latency.add("UI-Update", time.monotonic() - started)
+
+    def start_recording(self, path):
+        """Alle Drucker-Reports in eine rotierende gzip-Datei schreiben"""
+        self.mqtt_recorder = MqttRecorder(path)
+        print(f"⏺️ MQTT-Aufzeichnung nach {path}")
+
+    def start_replay(self, path, speed=1.0):
+        """Aufzeichnung statt Drucker in den MQTT-Eingangspfad einspeisen"""
+        records = read_capture(path)
+        sink = self.mqtt_ingest.put if speed else lambda payload: self.mqtt_ingest.put(payload, block=True)
+        self.mqtt_replayer = MqttReplayer(
+            records, sink, speed,
+            on_done=lambda: self.run_on_ui(self.root.after, 1000, self.report_replay),
+            ingest=self.mqtt_ingest
+        )
+        print(f"▶️ Replay: {len(records)} Reports aus {path}, "
+              f"Geschwindigkeit {f'{speed:g}x' if speed else 'max'}")
+        self.mqtt_replayer.start()
+
+    def report_replay(self):
+        """Replay-Ergebnis auf der Konsole ausgeben"""
+        stats = self.mqtt_ingest.get_stats()
+        print(f"⏹️ Replay fertig: {self.mqtt_replayer.sent} Reports, "
+              f"{self.mqtt_replayer.processed_rate():.0f} Nachrichten/s verarbeitet "
+              f"({self.mqtt_replayer.rate():.0f}/s eingespeist), {stats['refreshes']} UI-Updates, "
+              f"{stats['dropped']} verworfen")
+        for line in self.mqtt_ingest.latency.lines():
+            print(f"    {line}")
+
+    def send_pushall_command(self, reason="user"):
+        """Pushall Command senden (reason: connect, gap, stale, user)"""
+        if not self.mqtt_connected:
             return
 
-        command = {
-            "pushing": {
-                "sequence_id": "1",
-                "command": "pushall"
-            },
-            "user_id": "1234567890"
-        }
-
         topic = f"device/{self.bambu_serial}/request"
-        self.mqtt_client.publish(topic, json.dumps(command))
-
-    def update_print_progress(self):
-        """Druckfortschritt aktualisieren"""
-        if not self.printer_status:
-            return
-
-        print_info = self.printer_status.get("print", {})
-
-        # Nur aktualisieren wenn neue Daten vorhanden sind
-        progress = print_info.get("mc_percent")
-        layer_num = print_info.get("layer_num")
-        total_layers = print_info.get("total_layer_num")
-        remaining_time = print_info.get("mc_remaining_time")  # Nur dieser Key ist verfügbar
-        filename = print_info.get("subtask_name")
-        gcode_state = print_info.get("gcode_state")
-
-        # Cache aktualisieren nur wenn neue Werte vorhanden
-        if progress is not None:
-            self.last_print_data['progress'] = progress
-        if layer_num is not None:
-            self.last_print_data['layer_num'] = layer_num
-        if total_layers is not None:
-            self.last_print_data['total_layers'] = total_layers
-        if remaining_time is not None and remaining_time > 0:
-            self.last_print_data['remaining_time'] = remaining_time
-        if filename is not None:
-            self.last_print_data['filename'] = filename
-        if gcode_state is not None:
-            self.last_print_data['gcode_state'] = gcode_state
-        if gcode_state is not None and gcode_state != self.previous_gcode_state:
-            self.check_and_send_notification(gcode_state, filename)
+        self.mqtt_session.publish(topic, pushall_command())
+        self.report_sync.sent(reason)
+
+    def update_print_progress(self, changed):
+        """Druckfortschritt aktualisieren - nur für geänderte Felder"""
+        gcode_state = self.printer_state.gcode_state
+        if "gcode_state" in changed and gcode_state != self.previous_gcode_state:
+            self.check_and_send_notification(gcode_state, self.printer_state.filename)
             self.previous_gcode_state = gcode_state
 
-        # UI mit gecachten Daten aktualisieren
-        self.update_progress_ui()
-        self.update_button_status()
+        self.publish_printer_state()
+        if "gcode_state" in changed:
+            self.update_poll_context()
+
+    def publish_printer_state(self):
+        """Anzeigefelder des Druckermodells in den Store übernehmen (nur Änderungen zeichnen neu)"""
+        state = self.printer_state
+        self.store.update({f"print.{attr}": getattr(state, attr) for attr in
+                           ("gcode_state", "progress", "layer_num", "total_layers",
+                            "remaining_time", "filename")})
+
+    def bind_status_widgets(self):
+        """Status-, Fortschritts- und Licht-Widgets an ihre Store-Schlüssel binden"""
+        store = self.store
+        store.unsubscribe("status")
+        power_keys = [self.entity_id, "print.gcode_state", "ha_stale"]
+        if self.nozzle_temp_entity:
+            power_keys.append(self.nozzle_temp_entity)
+        store.subscribe(power_keys, self.render_power_status, "status")
+        store.subscribe([self.light_entity], self.render_light_status, "status")
+        store.subscribe(["print.progress"], self.render_progress, "status")
+        store.subscribe(["print.layer_num", "print.total_layers"], self.render_layers, "status")
+        store.subscribe(["print.gcode_state"], self.render_print_status, "status")
+        store.subscribe(["print.remaining_time"], self.render_remaining_time, "status")
+        store.subscribe(["print.filename"], self.render_filename, "status")
+
+        # Titelbild: neu laden nur wenn HA ein neues Bild meldet, neuer Druck fragt früher nach
+        self.titelbild_signature = None
+        titelbild_entity = self.get_titelbild_entity()
+        if titelbild_entity:
+            store.subscribe([titelbild_entity], self.on_titelbild_state, "status")
+            store.subscribe(["print.filename"], self.expedite_titelbild, "status")
+        else:
+            print("Keine Seriennummer konfiguriert - kann Titelbild nicht laden")
+            self.show_titelbild_text("Seriennummer nicht konfiguriert")
 
-    def update_progress_ui(self):
-        """Progress UI mit gecachten Daten aktualisieren"""
-        # Fortschritt
-        progress = self.last_print_data['progress']
+    def render_progress(self):
+        progress = self.store.get("print.progress", 0)
         self.progress_var.set(progress)
         self.big_progress_label.config(text=f"{progress:.0f}%")
 
-        # Schichten
-        layer_num = self.last_print_data['layer_num']
-        total_layers = self.last_print_data['total_layers']
-        self.layer_info_label.config(text=f"Schicht: {layer_num}/{total_layers}")
-
-        # Status
-        gcode_state = self.last_print_data['gcode_state']
-        if gcode_state == "RUNNING":
-            self.print_status_label.config(text="Drucken", fg="#27ae60")
-        elif gcode_state == "PAUSE":
-            self.print_status_label.config(text="Pausiert", fg="#f39c12")
-        elif gcode_state == "FINISH":
-            self.print_status_label.config(text="Fertig", fg="#3498db")
-        elif gcode_state == "FAILED":
-            self.print_status_label.config(text="Fehler", fg="#e74c3c")
-        else:
-            self.print_status_label.config(text="Bereit", fg="#95a5a6")
+    def render_layers(self):
+        self.layer_info_label.config(text=f"Schicht: {self.store.get('print.layer_num', 0)}/"
+                                          f"{self.store.get('print.total_layers', 0)}")
+
+    def render_print_status(self):
+        text, color = PRINT_STATUS_TEXT.get(self.store.get("print.gcode_state"), ("Bereit", "#95a5a6"))
+        self.print_status_label.config(text=text, fg=color)
 
-        # Verbleibende Zeit
-        remaining_time = self.last_print_data['remaining_time']
+    def render_remaining_time(self):
+        remaining_time = self.store.get("print.remaining_time", 0)
         if remaining_time > 0:
             hours = remaining_time // 60
             minutes = remaining_time % 60
@@ -1980,137 +2119,88 @@ class HomeAssistantWidget:
         else:
             self.remaining_time_label.config(text="")
 
-        # Dateiname
-        filename = self.last_print_data['filename']
+    def render_filename(self):
+        filename = self.store.get("print.filename")
         if filename and filename != 'Kein Druck aktiv':
             self.file_info.config(text=filename)
         else:
             self.file_info.config(text="Kein Druck aktiv")
 
-    def update_titelbild(self):
-        """Drucker Titelbild von HA laden - großes Bild links"""
-        def load_image():
-            try:
-                # Dynamische Entity basierend auf Seriennummer
-                if self.bambu_serial and self.bambu_serial != "DEINE_SERIENNUMMER":
-                    serial_lower = self.bambu_serial.lower()
-                    titelbild_entity = f"image.p1s_{serial_lower}_titelbild"
-                else:
-                    # Fallback wenn keine Seriennummer konfiguriert
-                    print("Keine Seriennummer konfiguriert - kann Titelbild nicht laden")
-                    if hasattr(self, 'titelbild_label'):
-                        self.titelbild_label.config(text="Seriennummer nicht konfiguriert")
-                    return
-
-
-                # Bild von HA API laden
-                response = requests.get(
-                    f"{self.ha_url}/api/states/{titelbild_entity}",
-                    headers=self.headers,
-                    timeout=5
-                )
-
-
-                if response.status_code == 200:
-                    entity_data = response.json()
-
-                    # Prüfe ob Entity verfügbar ist
-                    if entity_data['state'] == 'unavailable':
-                        if hasattr(self, 'titelbild_label'):
-                            self.titelbild_label.config(text="Titelbild nicht verfügbar")
-                        return
-
-                    # Bild-URL aus Attributen holen
-                    attributes = entity_data.get('attributes', {})
-                    entity_picture = attributes.get('entity_picture')
-
-
-                    if entity_picture:
-                        # Vollständige URL erstellen
-                        image_url = f"{self.ha_url}{entity_picture}"
-
-                        # Bild herunterladen
-                        img_response = requests.get(image_url, headers=self.headers, timeout=10)
-
-
-                        if img_response.status_code == 200:
-                            # Bild verarbeiten
-                            image_data = img_response.content
-                            image = Image.open(io.BytesIO(image_data))
+    def get_titelbild_entity(self):
+        """Titelbild-Entity aus der Seriennummer ableiten (None wenn nicht konfiguriert)"""
+        if self.bambu_serial and self.bambu_serial != "DEINE_SERIENNUMMER":
+            return f"image.p1s_{self.bambu_serial.lower()}_titelbild"
+        return None
 
-                            # Großes Bild für linke Seite
-                            max_width, max_height = 300, 250
+    def on_titelbild_state(self):
+        """Titelbild-Entity hat sich geändert - Bild nur bei neuer Signatur laden (Tk-Thread)"""
+        entity_data = self.store.get(self.get_titelbild_entity())
+        if not entity_data:
+            return
 
-                            # Seitenverhältnis beibehalten
-                            img_ratio = image.width / image.height
-                            if img_ratio > max_width / max_height:
-                                # Breiter - an Breite anpassen
-                                new_width = max_width
-                                new_height = int(max_width / img_ratio)
-                            else:
-                                # Höher - an Höhe anpassen
-                                new_height = max_height
-                                new_width = int(max_height * img_ratio)
+        # Prüfe ob Entity verfügbar ist
+        if entity_data['state'] == 'unavailable':
+            self.titelbild_signature = None
+            self.show_titelbild_text("Titelbild nicht verfügbar")
+            return
 
-                            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                            photo = ImageTk.PhotoImage(image)
+        entity_picture = entity_data.get('attributes', {}).get('entity_picture')
+        if not entity_picture:
+            print("Keine Bild-URL gefunden")
+            self.show_titelbild_text("Keine Bild-URL gefunden")
+            return
 
-                            # Großes Titelbild aktualisieren
-                            if hasattr(self, 'titelbild_label'):
-                                self.titelbild_label.config(image=photo, text="")
-                                self.titelbild_label.image = photo
+        # Das Token in der Bild-URL wechselt regelmäßig - nur Pfad und Bildzeitpunkt zählen
+        signature = f"{entity_picture.split('?')[0]}|{entity_data['state']}|{entity_data.get('last_changed')}"
+        if signature == self.titelbild_signature:
+            return
+        self.titelbild_signature = signature
+        self.run_in_background(self.load_titelbild, signature, entity_picture)
 
+    def expedite_titelbild(self):
+        """Neuer Druckauftrag per MQTT - Titelbild-Entity in Kürze abfragen"""
+        titelbild_entity = self.get_titelbild_entity()
+        if titelbild_entity:
+            self.poll_scheduler.expedite([titelbild_entity], delay=5.0)
 
-                        else:
-                            error_msg = f"Bild laden fehlgeschlagen: {img_response.status_code}"
-                            print(error_msg)
-                            if hasattr(self, 'titelbild_label'):
-                                self.titelbild_label.config(text=error_msg)
-                    else:
-                        error_msg = "Keine Bild-URL gefunden"
-                        print(error_msg)
-                        if hasattr(self, 'titelbild_label'):
-                            self.titelbild_label.config(text=error_msg)
-                else:
-                    error_msg = f"Entity nicht gefunden: {response.status_code}"
+    def load_titelbild(self, signature, entity_picture):
+        """Titelbild aus dem Cache oder von HA laden (Hintergrund-Thread)"""
+        try:
+            image = self.titelbild_cache.lookup(signature)
+            if image is None:
+                # Bild herunterladen (entity_picture ist relativ zur HA-URL)
+                response = self.ha_client.get_image(entity_picture)
+                if response.status_code != 200:
+                    error_msg = f"Bild laden fehlgeschlagen: {response.status_code}"
                     print(error_msg)
-                    if hasattr(self, 'titelbild_label'):
-                        self.titelbild_label.config(text=error_msg)
-
-            except Exception as e:
-                error_msg = f"Titelbild Fehler: {e}"
-                print(error_msg)
-                if hasattr(self, 'titelbild_label'):
-                    self.titelbild_label.config(text="Fehler beim Laden")
-
-        threading.Thread(target=load_image, daemon=True).start()
-
-        # Alle 10 Sekunden aktualisieren
-        self.root.after(10000, self.update_titelbild)
-
-    def update_button_status(self):
-        """Button-Status basierend auf Druckstatus aktualisieren"""
-        state_data = self.get_state()
-        if state_data:
-            state = state_data["state"]
-            is_printing = (self.last_print_data.get('gcode_state') == 'RUNNING')
-
-            if state == "on":
-                if is_printing:
-                    self.status_label.config(text="Status: beschäftigt", fg="#e74c3c")
-                    self.toggle_button.config(
-                        text="druckt",
-                        bg="#e74c3c",
-                        activebackground="#c0392b"
-                    )
-                else:
-                    self.status_label.config(text="Status: Ein", fg="#27ae60")
-                    self.toggle_button.config(
-                        text="ausschalten",
-                        bg="#e74c3c",
-                        activebackground="#2ecc71"
-                    )
-
+                    self.run_on_ui(self.show_titelbild_text, error_msg)
+                    self.run_on_ui(self.retry_titelbild, signature)
+                    return
+                # Skalieren nur bei unbekanntem Inhalt
+                image = self.titelbild_cache.store(signature, response.content)
+            self.run_on_ui(self.show_titelbild_image, image)
+        except Exception as e:
+            print(f"Titelbild Fehler: {e}")
+            self.run_on_ui(self.show_titelbild_text, "Fehler beim Laden")
+            self.run_on_ui(self.retry_titelbild, signature)
+
+    def retry_titelbild(self, signature):
+        """Nach Ladefehler in 30 Sekunden erneut versuchen (Tk-Thread)"""
+        if self.titelbild_signature == signature:
+            self.titelbild_signature = None
+            self.root.after(30000, self.on_titelbild_state)
+
+    def show_titelbild_text(self, text):
+        """Titelbild-Label mit Hinweistext füllen (Tk-Thread)"""
+        if hasattr(self, 'titelbild_label'):
+            self.titelbild_label.config(text=text)
+
+    def show_titelbild_image(self, image):
+        """Fertig skaliertes Titelbild anzeigen (Tk-Thread)"""
+        if hasattr(self, 'titelbild_label'):
+            photo = ImageTk.PhotoImage(image)
+            self.titelbild_label.config(image=photo, text="")
+            self.titelbild_label.image = photo
 
     def update_printer_title(self):
         """Drucker-Titel mit echtem Namen aktualisieren"""
@@ -2121,16 +2211,7 @@ class HomeAssistantWidget:
         if entity_id is None:
             entity_id = self.entity_id
 
-        try:
-            response = requests.get(
-                f"{self.ha_url}/api/states/{entity_id}",
-                headers=self.headers,
-                timeout=2  # Reduziert von 5 auf 2 Sekunden
-            )
-            if response.status_code == 200:
-                return response.json()
-        except:
-            return None
+        return self.ha_client.get_state(entity_id)
 
     def set_camera_size(self, size_index):
         """Kamera-Größe setzen mit sofortiger App-Anpassung"""
@@ -2152,22 +2233,22 @@ class HomeAssistantWidget:
 
     def force_camera_update(self):
         """Kamera sofort neu laden mit neuer Größe"""
-        def update():
-            image_data = self.get_camera_image()
-            if image_data:
-                try:
-                    image = Image.open(io.BytesIO(image_data))
-                    width, height = self.camera_sizes[self.current_size_index]
-                    image = image.resize((width, height), Image.Resampling.LANCZOS)
-                    photo = ImageTk.PhotoImage(image)
-                    self.camera_label.config(image=photo, text="")
-                    self.camera_label.image = photo
-                except Exception as e:
-                    self.camera_label.config(text=f"Kamera Fehler: {str(e)}")
-            else:
-                self.camera_label.config(text="Kamera offline")
+        self.camera_pipeline.request_frame()
 
-        threading.Thread(target=update, daemon=True).start()
+    def show_camera_image(self, image):
+        """Fertig skaliertes Kamerabild anzeigen (Tk-Thread)"""
+        try:
+            self.camera_surface.show(image)
+        finally:
+            # Pipeline darf das nächste Bild liefern
+            self.camera_pipeline.frame_displayed("main")
+
+    def show_camera_fallback(self):
+        """Kamera-Button nach µStreamer-Ausfall auf HA-Fallback setzen (Tk-Thread)"""
+        self.camera_switch_btn.configure(
+            text="📹 Home Assistant (Fallback)",
+            bg="#e67e22"
+        )
 
     def get_camera_image(self):
         """Kamerabild holen - je nach gewählter Quelle"""
@@ -2176,62 +2257,51 @@ class HomeAssistantWidget:
             return self.get_ustreamer_image()
 
         # Fallback zu Home Assistant Kamera
-        try:
-            response = requests.get(
-                f"{self.ha_url}/api/camera_proxy/{self.camera_entity}",
-                headers=self.headers,
-                timeout=10
-            )
-            if response.status_code == 200:
-                return response.content
-        except:
-            return None
+        return self.ha_client.get_camera_image(self.camera_entity)
 
     def update_camera(self):
-        # Pausieren wenn PiP aktiv ist
-        if self.main_camera_paused:
-            self.root.after(100, self.update_camera)
-            return
-
-        def update():
-            image_data = self.get_camera_image()
-            # µStreamer Status prüfen
-            if (self.use_ustreamer_camera and
-                self.config["ustreamer"]["enabled"] and
-                self.stream_reader and
-                not self.stream_reader.running and
-                self.stream_reader.retry_count >= self.stream_reader.max_retries):
-
-                # Fallback zu Home Assistant Kamera
-                print("µStreamer ausgefallen - Fallback zu HA Kamera")
-                self.use_ustreamer_camera = False
-                self.camera_switch_btn.configure(
-                    text="📹 Home Assistant (Fallback)",
-                    bg="#e67e22"
-                )
-            if image_data:
-                try:
-                    image = Image.open(io.BytesIO(image_data))
-                    # Dynamische Größe verwenden
-                    width, height = self.camera_sizes[self.current_size_index]
-                    image = image.resize((width, height), Image.Resampling.LANCZOS)
-                    photo = ImageTk.PhotoImage(image)
-
-                    self.camera_label.config(image=photo, text="")
-                    self.camera_label.image = photo
-                except Exception as e:
-                    pass  # Fehler ignorieren für flüssigere Darstellung
-            # Kein "Kamera offline" Text mehr - stört nur
+        """Kamera-Pipeline starten (Capture- und Decode-Thread, ~10 FPS)"""
+        self.camera_pipeline.start()
+
+    def capture_camera_frame(self):
+        """Ein Rohbild holen (Capture-Thread der Kamera-Pipeline)"""
+        # HA nicht erreichbar und keine µStreamer-Quelle - keinen Abruf starten
+        if (self.ha_client.breaker.retry_in() > 0 and
+                not (self.use_ustreamer_camera and self.config["ustreamer"]["enabled"])):
+            return None
 
-        threading.Thread(target=update, daemon=True).start()
-        self.root.after(100, self.update_camera)
+        image_data = self.get_camera_image()
+        if image_data is not None and self.use_ustreamer_camera and self.stream_reader:
+            # Empfangszeitpunkt des Frames mitgeben - für echtes Bildalter
+            image_data = (image_data, self.stream_reader.delivered_frame_monotonic)
+        # µStreamer Status prüfen
+        if (self.use_ustreamer_camera and
+            self.config["ustreamer"]["enabled"] and
+            self.stream_reader and
+            not self.stream_reader.running and
+            self.stream_reader.retry_count >= self.stream_reader.max_retries):
+
+            # Fallback zu Home Assistant Kamera
+            print("µStreamer ausgefallen - Fallback zu HA Kamera")
+            self.use_ustreamer_camera = False
+            self.run_on_ui(self.show_camera_fallback)
+        # Kein "Kamera offline" Text mehr - stört nur
+        return image_data
 
     def toggle_switch(self):
+        """Schalter umschalten - aktueller Status wird im Hintergrund geholt"""
+        def fetch():
+            self.run_on_ui(self.confirm_and_toggle_switch, self.get_state())
+
+        self.run_in_background(fetch)
+
+    def confirm_and_toggle_switch(self, state_data):
+        """Rückfrage (Tk-Thread) und Service-Aufruf im Hintergrund"""
         try:
-            current_state = self.get_state()["state"]
+            current_state = state_data["state"]
 
             # Prüfe ob gerade gedruckt wird
-            is_printing = (self.last_print_data.get('gcode_state') == 'RUNNING')
+            is_printing = (self.printer_state.gcode_state == 'RUNNING')
 
             # Wenn Drucker an ist, gedruckt wird und ausgeschaltet werden soll
             if current_state == "on" and is_printing:
@@ -2249,153 +2319,274 @@ class HomeAssistantWidget:
             else:
                 service = "turn_on"
 
-            requests.post(
-                f"{self.ha_url}/api/services/switch/{service}",
-                json={"entity_id": self.entity_id},
-                headers=self.headers,
-                timeout=5
-            )
+            def send():
+                try:
+                    self.ha_client.call_service("switch", service, {"entity_id": self.entity_id})
+                except Exception as e:
+                    self.run_on_ui(messagebox.showerror, "Fehler", f"Verbindungsfehler: {str(e)}")
+                    return
+                self.run_on_ui(self.root.after, 500, self.update_status)
 
-            self.root.after(500, self.update_status)
+            self.run_in_background(send)
 
-            # MQTT nach Einschalten des Druckers automatisch verbinden (mit Retry)
-            if service == "turn_on":
-                print("Drucker wird eingeschaltet - MQTT-Verbindung startet in 20 Sekunden...")
-                self.mqtt_retry_count = 0
-                self.root.after(20000, self.retry_mqtt_after_power_on)
+            # MQTT nach Einschalten des Druckers automatisch verbinden - paho
+            # versucht es mit Backoff weiter, bis der Drucker hochgefahren ist
+            if service == "turn_on" and not self.mqtt_session.is_active():
+                print("Drucker wird eingeschaltet - MQTT verbindet sobald er erreichbar ist...")
+                self.mqtt_notify_on_connect = True
+                self.auto_connect_mqtt()
 
         except Exception as e:
             messagebox.showerror("Fehler", f"Verbindungsfehler: {str(e)}")
 
-    def update_status(self):
-        state_data = self.get_state()
-        if state_data:
-            state = state_data["state"]
-            is_printing = (self.last_print_data.get('gcode_state') == 'RUNNING')
-
-            # Wenn noch keine MQTT-Daten da sind, Temperatur als Fallback nutzen
-            if not is_printing and self.last_print_data.get('gcode_state') == 'IDLE':
-                # Suche Düsentemperatur-Sensor
-                for entity in self.entities:
-                    if "temperatur_der_duse" in entity or "nozzle_temp" in entity:
-                        nozzle_data = self.get_state(entity)
-                        if nozzle_data:
-                            try:
-                                temp = float(nozzle_data["state"])
-                                if temp > 180:
-                                    is_printing = True  # Setze auf True basierend auf Temperatur
-                                    break
-                            except (ValueError, TypeError):
-                                pass
-
-            if state == "on":
-                if is_printing:
-                    # Drucker an und druckt - roter Button mit "Druckt"
-                    self.status_label.config(text="Status: beschäftigt", fg="#e74c3c")
-                    self.toggle_button.config(
-                        text="druckt",
-                        bg="#e74c3c",
-                        activebackground="#c0392b"
-                    )
-                else:
-                    # Drucker an aber druckt nicht - grüner Button mit "Ein"
-                    self.status_label.config(text="Status: Ein", fg="#27ae60")
-                    self.toggle_button.config(
-                        text="ausschalten",
-                        bg="#e74c3c",
-                        activebackground="#e74c3c"
-                    )
-            else:
-                # Drucker aus - grauer Button
-                self.status_label.config(text="Status: Aus", fg="#e74c3c")
-                self.toggle_button.config(
-                    text="einschalten",
-                    bg="#2ecc71",
-                    activebackground="#2ecc71"
-                )
+    def collect_cycle_entities(self):
+        """Alle Entities sammeln, die ein Update-Zyklus benötigt (ohne Duplikate)"""
+        wanted = [self.entity_id] + list(self.entities) + [self.light_entity, self.get_titelbild_entity()]
+        if self.fleet:
+            wanted += self.fleet.entity_ids()
+        return list(dict.fromkeys(entity for entity in wanted if entity))
 
-        # Sensor Status aktualisieren
-        for entity in self.entities:
-            data = self.get_state(entity)
-            if data:
-                state = data["state"]
-                unit = data.get("attributes", {}).get("unit_of_measurement", "")
-
-                # Spezielle Formatierung für verschiedene Sensortypen
-                if entity.startswith("binary_sensor"):
-                    display_text = "Ja" if state == "on" else "Nein"
-                    color = "#e74c3c" if state == "on" and "fehler" in entity else "#27ae60"
-                elif "zeit" in entity and "-" in str(state) and ":" in str(state):
-                    # Datum/Zeit Formatierung (2025-07-17 17:04:00 -> 17.07.2025 17:04:00)
-                    try:
-                        from datetime import datetime
-                        dt = datetime.strptime(str(state), "%Y-%m-%d %H:%M:%S")
-                        display_text = dt.strftime("%d.%m.%Y %H:%M:%S")
-                        color = "#3498db"
-                    except:
-                        display_text = str(state)
-                        color = "#3498db"
-                elif "verbleibende_zeit" in entity and unit == "h":
-                    # Verbleibende Zeit formatierung (3.0666 h -> 3 Stunden und 4 Minuten)
-                    try:
-                        hours_float = float(state)
-                        hours = int(hours_float)
-                        minutes = int((hours_float - hours) * 60)
-                        if minutes == 0:
-                            display_text = f"{hours} Stunden"
-                        else:
-                            display_text = f"{hours} Stunden und {minutes} Minuten"
-                        color = "#3498db"
-                    except:
-                        display_text = f"{state} {unit}"
-                        color = "#3498db"
-                elif entity.startswith("sensor") and unit:
-                    display_text = f"{state} {unit}"
-                    color = "#3498db"
-                else:
-                    display_text = str(state)
-                    color = "#3498db"
+    def fetch_states(self, entity_ids):
+        """Zustände mehrerer Entities mit einem einzigen /api/states Aufruf holen
 
-                self.sensor_labels[entity].config(text=display_text, fg=color)
-            else:
-                self.sensor_labels[entity].config(text="Offline", fg="gray")
+        Gibt ein Dict entity_id -> State zurück. Entities, die HA nicht kennt,
+        fehlen im Dict. Ist HA nicht erreichbar, wird None geliefert.
+        """
+        # Wenige fällige Entities: Einzelabrufe sind kleiner als die komplette State-Liste
+        if len(entity_ids) <= 3:
+            return self.fetch_states_individually(entity_ids)
 
-        light_entity = self.light_entity
-        light_data = self.get_state(light_entity)
-        if light_data:
-            light_state = light_data["state"]
-            self.update_light_button_state(light_state)
+        wanted = set(entity_ids)
+        try:
+            response = self.ha_client.get_states()
+            if response.status_code == 200:
+                return {state["entity_id"]: state for state in response.json()
+                        if state.get("entity_id") in wanted}
+            print(f"Sammelabruf /api/states fehlgeschlagen: {response.status_code} - Einzelabruf")
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            print(f"Sammelabruf /api/states Fehler: {e}")
+            return None
 
-        # Alle 5 Sekunden Status aktualisieren
-        self.root.after(5000, self.update_status)
-        # Prüfe ob MQTT verbunden werden sollte (falls Drucker gerade eingeschaltet wurde)
-        self.check_mqtt_auto_connect(state_data)
+        # Fallback: begrenzter paralleler Einzelabruf
+        return self.fetch_states_individually(entity_ids)
 
-    def check_mqtt_auto_connect(self, state_data):
-        """Prüft ob MQTT automatisch verbunden werden sollte"""
-        # Nur wenn MQTT nicht verbunden ist und Drucker an ist
-        if (not self.mqtt_connected and
-            state_data and state_data["state"] == "on" and
-            self.bambu_ip != "DEINE_DRUCKER_IP" and
-            self.bambu_serial != "DEINE_SERIENNUMMER" and
-            self.bambu_access_code != "DEIN_ACCESS_CODE"):
+    def fetch_states_individually(self, entity_ids):
+        """Entities einzeln, aber parallel über den Pool des HA-Clients abrufen
 
-            print("🔄 Drucker ist an aber MQTT getrennt - starte Verbindung...")
-            self.auto_connect_mqtt()
+        Schlägt auch nur ein Abruf fehl, wird wie beim Sammelabruf None
+        geliefert - die bisherigen Werte bleiben dann stehen. Nur Entities,
+        die HA nicht kennt (404), fehlen im Dict.
+        """
+        states = {}
+        try:
+            results = self.ha_client.executor.map(self.ha_client.fetch_state, entity_ids)
+            for entity_id, data in zip(entity_ids, results):
+                if data:
+                    states[entity_id] = data
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            print(f"Einzelabruf Fehler: {e}")
+            return None
+        return states
 
-    def toggle_pip(self):
-        """Picture-in-Picture Modus ein/ausschalten"""
-        if not self.pip_active:
-            self.start_pip()
-        else:
-            self.stop_pip()
+    def update_status(self):
+        """Status-Abruf sofort anstoßen - läuft im Hintergrund-Poller"""
+        if not self.status_poller_running:
+            self.status_poller_running = True
+            self.run_in_background(self.status_poller_loop)
+        self.status_wakeup.set()
+
+    def status_poller_loop(self):
+        """Hintergrund-Poller: fällige Entities nach dem Abrufplan holen (oder auf Anstoß alle)"""
+        scheduler = self.poll_scheduler
+        while self.status_poller_running:
+            wait = min(5.0, max(1.0, scheduler.next_due_in()))
+            forced = self.status_wakeup.wait(wait)
+            self.status_wakeup.clear()
+            if not self.status_poller_running:
+                break
+
+            if self.ha_ws and self.ha_ws.connected:
+                # WebSocket liefert Änderungen per Push - kein Polling nötig
+                self.run_on_ui(self.apply_status, None, False)
+                continue
+
+            pinned = [self.entity_id] + (self.fleet.entity_ids() if self.fleet else [])
+            scheduler.configure(self.collect_cycle_entities(), pinned)
+            if forced:
+                scheduler.force()
+            due = scheduler.due()
+            if not due:
+                continue
+
+            # Nur die fälligen Zustände holen
+            states = self.fetch_states(due)
+            # HA nicht erreichbar - letzte bekannte Werte als veraltet anzeigen
+            stale = states is None
+            if stale:
+                scheduler.retry_later(due)
+            else:
+                scheduler.observe(due, states)
+            self.run_on_ui(self.apply_status, states, stale, due)
+
+    def apply_status(self, states, stale=False, requested=()):
+        """Ergebnis eines Status-Abrufs darstellen (Tk-Thread)
+
+        states enthält nur die abgefragten Entities (requested); sie werden in
+        den Index übernommen, unbekannte Entities fallen heraus.
+        """
+        if states is not None:
+            for entity_id in requested:
+                if entity_id not in states:
+                    self.ha_states.pop(entity_id, None)
+                    self.store.set(entity_id, None)
+            self.ha_states.update(states)
+            # Nur geänderte Werte lösen ein Neuzeichnen aus
+            self.store.update(states)
+        self.store.set("ha_stale", stale)
+        self.update_poll_context()
 
-    def start_pip(self):
-        """PiP-Fenster starten"""
-        if self.pip_window:
+        # Prüfe ob MQTT verbunden werden sollte (falls Drucker gerade eingeschaltet wurde)
+        if not stale:
+            self.check_mqtt_auto_connect(self.ha_states.get(self.entity_id))
+        if self.fleet:
+            self.apply_fleet_states(self.ha_states, stale)
+
+    def render_power_status(self):
+        """Status-Label und Schalter-Button aus Schalter, gcode_state und Düsentemperatur"""
+        state_data = self.store.get(self.entity_id)
+        if not state_data:
             return
+        offline_suffix = " (HA offline)" if self.store.get("ha_stale") else ""
+        state = state_data["state"]
+        gcode_state = self.store.get("print.gcode_state", 'IDLE')
+        is_printing = (gcode_state == 'RUNNING')
+
+        # Wenn noch keine MQTT-Daten da sind, Temperatur als Fallback nutzen
+        if not is_printing and gcode_state == 'IDLE' and self.nozzle_temp_entity:
+            nozzle_data = self.store.get(self.nozzle_temp_entity)
+            if nozzle_data:
+                try:
+                    is_printing = float(nozzle_data["state"]) > 180
+                except (ValueError, TypeError):
+                    pass
 
-        # PiP-Fenster erstellen
+        if state == "on":
+            if is_printing:
+                # Drucker an und druckt - roter Button mit "Druckt"
+                self.status_label.config(text=f"Status: beschäftigt{offline_suffix}", fg="#e74c3c")
+                self.toggle_button.config(
+                    text="druckt",
+                    bg="#e74c3c",
+                    activebackground="#c0392b"
+                )
+            else:
+                # Drucker an aber druckt nicht - grüner Button mit "Ein"
+                self.status_label.config(text=f"Status: Ein{offline_suffix}", fg="#27ae60")
+                self.toggle_button.config(
+                    text="ausschalten",
+                    bg="#e74c3c",
+                    activebackground="#e74c3c"
+                )
+        else:
+            # Drucker aus - grauer Button
+            self.status_label.config(text=f"Status: Aus{offline_suffix}", fg="#e74c3c")
+            self.toggle_button.config(
+                text="einschalten",
+                bg="#2ecc71",
+                activebackground="#2ecc71"
+            )
+
+    def render_light_status(self):
+        light_data = self.store.get(self.light_entity)
+        if light_data:
+            self.update_light_button_state(light_data["state"])
+
+    def render_sensor(self, sensor):
+        """Eine Sensor-Zeile darstellen - Formatierung aus der Registry (memoisiert)"""
+        data = self.store.get(sensor.entity_id)
+        if not data:
+            sensor.label.config(text="Offline", fg="gray")
+            return
+        display_text, color = sensor.render(data)
+        if self.store.get("ha_stale"):
+            # Letzter bekannter Wert, grau markiert
+            display_text = f"⚠ {display_text}"
+            color = "#7f8c8d"
+        sensor.label.config(text=display_text, fg=color)
+
+    def update_poll_context(self):
+        """Druckerzustand an den Abrufplan weitergeben (Schalter, gcode_state)"""
+        state_data = self.ha_states.get(self.entity_id)
+        power_on = state_data["state"] == "on" if state_data else None
+        printing = None
+        if self.mqtt_connected:
+            printing = self.printer_state.gcode_state in ("RUNNING", "PAUSE", "PREPARE", "SLICING")
+        self.poll_scheduler.set_context(power_on, printing)
+
+    def start_websocket(self):
+        """Optionale HA WebSocket-Verbindung für Push-Updates starten"""
+        if self.ha_ws:
+            self.ha_ws.stop()
+            self.ha_ws = None
+
+        if not self.config["homeassistant"].get("use_websocket", True):
+            return
+        if websocket is None:
+            print("websocket-client nicht installiert - nutze REST-Polling")
+            return
+
+        entity_ids = self.collect_cycle_entities()
+        self.ha_ws = HAWebSocketClient(self.ha_url, self.token, entity_ids,
+                                       on_states=self.on_ws_states)
+        self.ha_ws.start()
+
+    def on_ws_states(self, changed):
+        """WebSocket-Änderungen (aus dem WS-Thread) an den Tk-Thread übergeben"""
+        self.run_on_ui(self.apply_ws_states, changed)
+
+    def apply_ws_states(self, changed):
+        """Geänderte Entities übernehmen und sofort darstellen"""
+        for entity_id, state in changed.items():
+            if state is None:
+                # Von HA entfernt - wie beim Polling als Offline darstellen
+                self.ha_states.pop(entity_id, None)
+            else:
+                self.ha_states[entity_id] = state
+        self.store.update(changed)
+        if self.fleet:
+            self.apply_fleet_states(self.ha_states)
+
+    def check_mqtt_auto_connect(self, state_data):
+        """Prüft ob MQTT automatisch verbunden werden sollte"""
+        if not state_data or not self.mqtt_ready():
+            return
+        # Nur wenn keine Sitzung läuft und Drucker an ist
+        if state_data["state"] == "on" and not self.mqtt_session.is_active():
+            print("🔄 Drucker ist an aber MQTT getrennt - starte Verbindung...")
+            self.auto_connect_mqtt()
+        # Drucker aus - keine endlosen Verbindungsversuche
+        elif (state_data["state"] == "off" and not self.mqtt_interactive and
+              self.mqtt_session.state == MqttSession.BACKOFF):
+            print("⏸️ Drucker ist aus - MQTT-Verbindungsversuche gestoppt")
+            self.mqtt_session.stop()
+
+    def toggle_pip(self):
+        """Picture-in-Picture Modus ein/ausschalten"""
+        if not self.pip_active:
+            self.start_pip()
+        else:
+            self.stop_pip()
+
+    def start_pip(self):
+        """PiP-Fenster starten"""
+        if self.pip_window:
+            return
+
+        # PiP-Fenster erstellen
         self.pip_window = tk.Toplevel(self.root)
         self.pip_window.title("📹 Kamera PiP")
         self.pip_window.geometry("480x270+100+100")  # Startgröße und Position
@@ -2414,6 +2605,7 @@ class HomeAssistantWidget:
             font=self.font_normal
         )
         self.pip_camera_label.pack(fill='both', expand=True, padx=5, pady=5)
+        self.pip_surface = FrameSurface(self.pip_camera_label)
 
         # Overlay-Button für Kamera-Wechsel im PiP
         pip_overlay_frame = tk.Frame(self.pip_window, bg='#2c3e50', relief='solid', bd=1)
@@ -2438,23 +2630,27 @@ class HomeAssistantWidget:
 
         # Beim Schließen des PiP-Fensters
         self.pip_window.protocol("WM_DELETE_WINDOW", self.stop_pip)
+        self.pip_window.bind("<Configure>", self.on_pip_configure)
 
-        # PiP-Update starten
+        # PiP-Update starten - gleiche Pipeline, kein zusätzlicher Abruf
         self.pip_active = True
-        # Hauptkamera-Updates pausieren wenn PiP aktiv
-        self.main_camera_paused = True
+        # Hauptkamera-Ansicht pausieren wenn PiP aktiv
+        self.camera_pipeline.set_view_active("main", False)
+        self.camera_pipeline.set_view_active("pip", True)
         self.pip_btn.config(bg='#27ae60', text="PiP")  # Grün wenn aktiv
-        self.update_pip_camera()
 
     def stop_pip(self):
         """PiP-Fenster beenden"""
         if self.pip_window:
             self.pip_window.destroy()
             self.pip_window = None
+        self.pip_surface = None
 
         self.pip_active = False
-        # Hauptkamera-Updates wieder aktivieren
-        self.main_camera_paused = False
+        self.pip_box = None
+        # Hauptkamera-Ansicht wieder aktivieren
+        self.camera_pipeline.set_view_active("pip", False)
+        self.camera_pipeline.set_view_active("main", True)
         self.pip_btn.config(bg='#e67e22', text="PiP")  # Orange wenn inaktiv
 
     def pip_toggle_camera(self):
@@ -2475,6 +2671,162 @@ class HomeAssistantWidget:
                     bg="#e67e22"
                 )
 
+    def start_fleet(self):
+        """Fleet-Backend starten und Übersicht öffnen"""
+        self.fleet.start()
+        self.open_fleet_view()
+
+    def open_fleet_view(self):
+        """Kompakte Kachel-Übersicht aller Fleet-Drucker"""
+        if not self.fleet:
+            messagebox.showinfo("Drucker-Übersicht",
+                                "Keine weiteren Drucker konfiguriert.\n\n"
+                                "Drucker unter \"printers\" in widget_config.json eintragen.")
+            return
+        if self.fleet_window:
+            self.fleet_window.lift()
+            return
+
+        self.fleet_window = tk.Toplevel(self.root)
+        self.fleet_window.title("🖨️ Drucker-Übersicht")
+        self.fleet_window.configure(bg='#1a252f')
+        self.fleet_window.protocol("WM_DELETE_WINDOW", self.close_fleet_view)
+
+        columns = 3
+        for index, printer in enumerate(self.fleet.printers.values()):
+            tile = self.build_fleet_tile(self.fleet_window, printer)
+            tile["frame"].grid(row=index // columns, column=index % columns, padx=5, pady=5, sticky='n')
+            self.fleet_tiles[printer.key] = tile
+            self.render_fleet_tile(printer.key)
+            self.show_fleet_session(printer.key, printer.session.state)
+
+        self.apply_fleet_states(self.ha_states)
+        self.fleet.cameras_active = True
+
+    def build_fleet_tile(self, parent, printer):
+        """Widgets einer Drucker-Kachel anlegen"""
+        frame = tk.Frame(parent, bg='#2c3e50', relief='solid', bd=1)
+        header = tk.Frame(frame, bg='#2c3e50')
+        header.pack(fill='x', padx=5, pady=(5, 0))
+        tk.Label(header, text=printer.name, font=self.font_title,
+                 bg='#2c3e50', fg='white').pack(side='left')
+        power_label = tk.Label(header, text="", font=self.font_small, bg='#2c3e50', fg='#95a5a6')
+        power_label.pack(side='right')
+        mqtt_label = tk.Label(header, text="", font=self.font_small, bg='#2c3e50', fg='#95a5a6')
+        mqtt_label.pack(side='right', padx=5)
+
+        width, height = self.fleet.tile_size
+        camera_frame = tk.Frame(frame, bg='#1a252f', width=width, height=height)
+        camera_frame.pack(padx=5, pady=5)
+        camera_frame.pack_propagate(False)
+        camera_label = tk.Label(camera_frame, text="📹" if printer.camera_entity else "Keine Kamera",
+                                bg='#1a252f', fg='#95a5a6', font=self.font_normal)
+        camera_label.pack(fill='both', expand=True)
+
+        status_label = tk.Label(frame, text="", font=self.font_normal, bg='#2c3e50', fg='#95a5a6')
+        status_label.pack()
+        file_label = tk.Label(frame, text="", font=self.font_small, bg='#2c3e50', fg='#bdc3c7',
+                              wraplength=width)
+        file_label.pack()
+        progress_var = tk.DoubleVar()
+        ttk.Progressbar(frame, variable=progress_var, maximum=100,
+                        style="Custom.Horizontal.TProgressbar").pack(fill='x', padx=5, pady=2)
+        detail_label = tk.Label(frame, text="", font=self.font_small, bg='#2c3e50', fg='#bdc3c7')
+        detail_label.pack(pady=(0, 5))
+
+        return {
+            "frame": frame, "power": power_label, "mqtt": mqtt_label, "camera": camera_label,
+            "status": status_label, "file": file_label, "progress": progress_var,
+            "detail": detail_label, "surface": FrameSurface(camera_label)
+        }
+
+    def render_fleet_tile(self, key, changed=None):
+        """Kachel aus dem Druckermodell aktualisieren - nur geänderte Felder"""
+        tile = self.fleet_tiles.get(key)
+        if not tile:
+            return
+        state = self.fleet.printers[key].state
+
+        if changed is None or "gcode_state" in changed or "progress" in changed:
+            text, color = PRINT_STATUS_TEXT.get(state.gcode_state, ("Bereit", "#95a5a6"))
+            tile["status"].config(text=f"{text} {state.progress}%", fg=color)
+            tile["progress"].set(state.progress)
+        if changed is None or "filename" in changed:
+            tile["file"].config(text=state.filename)
+        if changed is None or changed & {"layer_num", "total_layers", "remaining_time",
+                                         "nozzle_temp", "bed_temp"}:
+            parts = [f"Schicht {state.layer_num}/{state.total_layers}"]
+            if state.remaining_time > 0:
+                parts.append(f"-{state.remaining_time // 60}h{state.remaining_time % 60}m")
+            if state.nozzle_temp is not None:
+                parts.append(f"🔥 {state.nozzle_temp:.0f}°")
+            if state.bed_temp is not None:
+                parts.append(f"▭ {state.bed_temp:.0f}°")
+            tile["detail"].config(text="  ".join(parts))
+
+    def handle_fleet_report(self, key, data, queued_at=None):
+        """Report eines Fleet-Druckers übernehmen (Tk-Thread)"""
+        printer = self.fleet.printers.get(key)
+        if not printer:
+            return
+        changed = printer.state.apply(data)
+        # Erster Report nach dem Verbinden ist kein Statuswechsel
+        if "gcode_state" in changed and printer.synced:
+            self.check_and_send_notification(printer.state.gcode_state,
+                                             f"{printer.name}: {printer.state.filename}")
+        printer.synced = True
+        if changed:
+            self.render_fleet_tile(key, changed)
+
+    def on_fleet_state(self, key, state, reason_code):
+        """Sitzungszustand eines Fleet-Druckers darstellen (Tk-Thread)"""
+        printer = self.fleet.printers[key]
+        if state == MqttSession.IDLE:
+            if printer.session.last_error is not None:
+                print(f"❌ {printer.name}: MQTT abgelehnt: {printer.session.last_error}")
+            printer.state.reset()
+            printer.synced = False
+            self.render_fleet_tile(key)
+        self.show_fleet_session(key, state)
+
+    def show_fleet_session(self, key, state):
+        tile = self.fleet_tiles.get(key)
+        if not tile:
+            return
+        color = {
+            MqttSession.CONNECTED: "#27ae60",
+            MqttSession.CONNECTING: "#f39c12",
+            MqttSession.BACKOFF: "#f39c12",
+        }.get(state, "#e74c3c")
+        tile["mqtt"].config(text="📡", fg=color)
+
+    def apply_fleet_states(self, states, stale=False):
+        """Schalter-States der Fleet-Drucker aus dem gemeinsamen Abruf übernehmen"""
+        for key, printer in self.fleet.printers.items():
+            tile = self.fleet_tiles.get(key)
+            state_data = states.get(printer.entity_id) if printer.entity_id else None
+            if tile and state_data:
+                is_on = state_data["state"] == "on"
+                tile["power"].config(text="AN" if is_on else "AUS",
+                                     fg='#95a5a6' if stale else ('#27ae60' if is_on else '#e74c3c'))
+        if not stale:
+            self.fleet.check_power(states)
+
+    def show_fleet_camera(self, key, image):
+        """Skaliertes Kamerabild in die Kachel setzen (Tk-Thread)"""
+        tile = self.fleet_tiles.get(key)
+        if not tile:
+            return
+        tile["surface"].show(image)
+
+    def close_fleet_view(self):
+        """Übersicht schließen - MQTT läuft weiter, Kamera-Abrufe ruhen"""
+        self.fleet.cameras_active = False
+        if self.fleet_window:
+            self.fleet_window.destroy()
+            self.fleet_window = None
+        self.fleet_tiles = {}
+
     def check_and_send_notification(self, new_state, filename):
             """Windows-Benachrichtigung bei wichtigen Statuswechseln senden"""
             try:
@@ -2508,69 +2860,9 @@ class HomeAssistantWidget:
             except Exception as e:
                 print(f"Benachrichtigungsfehler: {e}")
 
-    def retry_mqtt_after_power_on(self):
-        """MQTT mit Retry-Logik nach Drucker-Einschalten"""
-        # Prüfe erst ob Drucker wirklich an ist
-        state_data = self.get_state()
-        if not state_data or state_data["state"] != "on":
-            print("Drucker ist nicht an - MQTT-Verbindung übersprungen")
-            return
-
-        # Prüfe ob MQTT bereits verbunden ist
-        if self.mqtt_connected:
-            print("MQTT bereits verbunden")
-            return
-
-        # Prüfe ob MQTT-Konfiguration vorhanden ist
-        mqtt_ready = (self.bambu_ip != "DEINE_DRUCKER_IP" and
-                     self.bambu_serial != "DEINE_SERIENNUMMER" and
-                     self.bambu_access_code != "DEIN_ACCESS_CODE" and
-                     self.bambu_ip and self.bambu_serial and self.bambu_access_code)
-
-        if not mqtt_ready:
-            print("MQTT nicht konfiguriert - Verbindung übersprungen")
-            return
-
-        self.mqtt_retry_count += 1
-        print(f"🔄 MQTT-Verbindungsversuch {self.mqtt_retry_count}/5 nach Drucker-Einschalten...")
-
-        # Bestehende auto_connect_mqtt Methode verwenden
-        self.auto_connect_mqtt()
-
-        # Nach 5 Sekunden prüfen ob Verbindung erfolgreich war
-        self.root.after(5000, self.check_mqtt_retry_success)
-
-    def check_mqtt_retry_success(self):
-        """Prüfe ob MQTT-Retry erfolgreich war"""
-        if self.mqtt_connected:
-            print("✅ MQTT automatisch nach Drucker-Einschalten verbunden!")
-
-            # Optional: Benachrichtigung anzeigen
-            try:
-                from plyer import notification
-                notification.notify(
-                    title="🔗 MQTT verbunden",
-                    message="Drucker-Überwachung ist jetzt aktiv",
-                    app_name="3D Drucker Widget",
-                    timeout=5
-                )
-            except:
-                pass  # Falls plyer nicht installiert
-
-        else:
-            # Nicht verbunden - weiteren Versuch starten?
-            if self.mqtt_retry_count < 5:
-                retry_delay = self.mqtt_retry_count * 10000  # 10s, 20s, 30s, 40s
-                print(f"Versuch {self.mqtt_retry_count} fehlgeschlagen - nächster Versuch in {retry_delay//1000}s")
-                self.root.after(retry_delay, self.retry_mqtt_after_power_on)
-            else:
-                print("❌ MQTT-Verbindung nach 5 Versuchen fehlgeschlagen")
-
-
     def simple_auto_light_with_time(self):
         """Licht einschalten wenn es in der konfigurierten Zeitspanne ist"""
         try:
-            from datetime import datetime
             current_hour = datetime.now().hour
 
             dark_start = self.config["automation"]["dark_start_hour"]
@@ -2586,7 +2878,7 @@ class HomeAssistantWidget:
                 print(f"🌙 Dunkelzeit - verwende Button-Logik für Licht...")
 
                 # Verwende die GLEICHE Logik wie der funktionierende Button!
-                self.auto_toggle_light_on()
+                self.run_in_background(self.auto_toggle_light_on)
             else:
                 print(f"☀️ Hellzeit - Licht bleibt aus")
 
@@ -2594,22 +2886,18 @@ class HomeAssistantWidget:
             print(f"Auto-Licht Fehler: {e}")
 
     def auto_toggle_light_on(self):
-        """Licht automatisch einschalten mit Button-Logik"""
+        """Licht automatisch einschalten mit Button-Logik (Hintergrund-Thread)"""
         try:
             # EXAKT die gleiche Logik wie toggle_light() aber nur für "an"
-            response = requests.post(
-                f"{self.ha_url}/api/services/light/turn_on",
-                json={"entity_id": self.light_entity},
-                headers=self.headers,
-                timeout=5
-            )
+            response = self.ha_client.call_service("light", "turn_on",
+                                                   {"entity_id": self.light_entity})
 
             if response.status_code == 200:
                 print("✅ Licht automatisch eingeschaltet")
                 # Button sofort aktualisieren für besseres UX
-                self.update_light_button_state("on")
+                self.run_on_ui(self.update_light_button_state, "on")
                 # Nach kurzer Verzögerung echten Status abrufen
-                self.root.after(1000, self.update_light_from_server)
+                self.run_on_ui(self.root.after, 1000, self.update_light_from_server)
             else:
                 print(f"❌ Licht-Befehl fehlgeschlagen: {response.status_code}")
 
@@ -2747,110 +3035,2667 @@ class HomeAssistantWidget:
     def run(self):
         self.root.mainloop()
 
-import cv2
+def format_binary(state, unit):
+    return ("Ja" if state == "on" else "Nein"), "#27ae60"
+
+
+def format_binary_error(state, unit):
+    if state == "on":
+        return "Ja", "#e74c3c"
+    return "Nein", "#27ae60"
+
+
+def format_datetime(state, unit):
+    """2025-07-17 17:04:00 -> 17.07.2025 17:04:00 (None: kein Datum)"""
+    if "-" not in state or ":" not in state:
+        return None
+    try:
+        dt = datetime.strptime(state, "%Y-%m-%d %H:%M:%S")
+        return dt.strftime("%d.%m.%Y %H:%M:%S"), "#3498db"
+    except ValueError:
+        return state, "#3498db"
+
+
+def format_hours(state, unit):
+    """3.0666 h -> 3 Stunden und 4 Minuten (None: andere Einheit)"""
+    if unit != "h":
+        return None
+    try:
+        hours_float = float(state)
+    except ValueError:
+        return f"{state} {unit}", "#3498db"
+    hours = int(hours_float)
+    minutes = int((hours_float - hours) * 60)
+    if minutes == 0:
+        return f"{hours} Stunden", "#3498db"
+    return f"{hours} Stunden und {minutes} Minuten", "#3498db"
+
+
+def format_with_unit(state, unit):
+    if not unit:
+        return None
+    return f"{state} {unit}", "#3498db"
+
+
+def format_plain(state, unit):
+    return state, "#3498db"
+
+
+class StateStore:
+    """Zentraler, beobachtbarer UI-Zustand (nur im Tk-Thread benutzen)
+
+    Schlüssel sind HA-Entity-IDs (Wert: State-Dict), MQTT-Felder als
+    "print.<feld>" und Flags wie "ha_stale". Widgets abonnieren einen oder
+    mehrere Schlüssel mit einem Callback ohne Argumente, der seine Werte
+    selbst per get() liest. set() merkt nur echte Änderungen vor; alle
+    betroffenen Callbacks laufen gesammelt einmal im nächsten Idle-Zyklus -
+    auch wenn sich mehrere ihrer Schlüssel geändert haben.
+    """
+
+    def __init__(self, schedule):
+        self.schedule = schedule        # (Funktion) -> None, z.B. root.after_idle
+        self.values = {}
+        self.subscribers = {}           # Schlüssel -> [(Callback, Besitzer)]
+        self.pending = {}               # Callback -> Besitzer für den nächsten Flush (geordnet, ohne Duplikate)
+        self.flush_scheduled = False
+        self.stats = {"sets": 0, "changes": 0, "renders": 0, "flushes": 0}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def subscribe(self, keys, callback, owner=None):
+        """callback bei Änderung eines der keys aufrufen; vorhandene Werte gleich darstellen"""
+        for key in keys:
+            self.subscribers.setdefault(key, []).append((callback, owner))
+        if any(key in self.values for key in keys):
+            self.queue(callback, owner)
+
+    def unsubscribe(self, owner):
+        """Alle Abos eines Besitzers entfernen (z.B. vor dem Neuaufbau der Widgets)"""
+        for key, entries in list(self.subscribers.items()):
+            entries = [entry for entry in entries if entry[1] != owner]
+            if entries:
+                self.subscribers[key] = entries
+            else:
+                del self.subscribers[key]
+        self.pending = {callback: entry_owner for callback, entry_owner in self.pending.items()
+                        if entry_owner != owner}
+
+    def set(self, key, value):
+        self.stats["sets"] += 1
+        if key in self.values and self.values[key] == value:
+            return
+        self.values[key] = value
+        self.stats["changes"] += 1
+        for callback, owner in self.subscribers.get(key, ()):
+            self.queue(callback, owner)
+
+    def update(self, mapping):
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def queue(self, callback, owner=None):
+        self.pending[callback] = owner
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.schedule(self.flush)
+
+    def flush(self):
+        """Vorgemerkte Callbacks ausführen (Idle-Zyklus)"""
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, {}
+        self.stats["flushes"] += 1
+        for callback in pending:
+            self.stats["renders"] += 1
+            try:
+                callback()
+            except Exception as e:
+                print(f"UI-Update Fehler ({getattr(callback, '__name__', callback)}): {e}")
+
+
+class SensorFormatter:
+    """Vorkompilierte Darstellung einer Entity: Formatierer-Kette und Ziel-Label
+
+    Welche Formatierung eine Entity bekommt, wird einmal beim Aufbau der
+    Sensor-Zeilen aus Domain und Namen entschieden. Das Ergebnis hängt nur
+    von (state, unit) ab und wird dafür zwischengespeichert - ein
+    unveränderter Wert kostet beim Rendern nur einen Dict-Zugriff.
+    """
+
+    __slots__ = ("entity_id", "label", "chain", "cache")
+
+    # Verschiedene Werte pro Entity, bevor der Cache geleert wird
+    CACHE_SIZE = 64
+
+    def __init__(self, entity_id, label=None):
+        self.entity_id = entity_id
+        self.label = label
+        self.chain = self.compile(entity_id)
+        self.cache = {}
+
+    @staticmethod
+    def compile(entity_id):
+        """Formatierer in Prüfreihenfolge; der erste, der nicht None liefert, gewinnt"""
+        if entity_id.startswith("binary_sensor"):
+            return (format_binary_error if "fehler" in entity_id else format_binary,)
+        chain = []
+        if "zeit" in entity_id:
+            chain.append(format_datetime)
+        if "verbleibende_zeit" in entity_id:
+            chain.append(format_hours)
+        if entity_id.startswith("sensor"):
+            chain.append(format_with_unit)
+        chain.append(format_plain)
+        return tuple(chain)
+
+    def render(self, data):
+        """(Anzeigetext, Farbe) für einen HA-State"""
+        state = str(data["state"])
+        unit = data.get("attributes", {}).get("unit_of_measurement", "")
+        key = (state, unit)
+        result = self.cache.get(key)
+        if result is None:
+            for formatter in self.chain:
+                result = formatter(state, unit)
+                if result is not None:
+                    break
+            if len(self.cache) >= self.CACHE_SIZE:
+                self.cache.clear()
+            self.cache[key] = result
+        return result
+
+
+class CircuitOpenError(Exception):
+    """Home Assistant gilt als nicht erreichbar - Anfrage wurde nicht gesendet"""
+
+
+class CircuitBreaker:
+    """Circuit Breaker pro Host mit Half-Open-Probe und exponentiellem Backoff
+
+    closed: alle Anfragen erlaubt. Nach failure_threshold Fehlern in Folge
+    -> open: Anfragen schlagen sofort fehl. Nach Ablauf der Wartezeit
+    -> half_open: genau eine Probe-Anfrage darf raus. Erfolg schließt den
+    Breaker, ein Fehler öffnet ihn wieder mit verdoppelter Wartezeit.
+    """
+
+    def __init__(self, failure_threshold=3, base_delay=2.0, max_delay=60.0):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.delay = base_delay
+        self.open_until = 0.0
+        self.probe_in_flight = False
+
+    def allow_request(self):
+        """True wenn eine Anfrage gesendet werden darf"""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() >= self.open_until:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                print("✅ Home Assistant wieder erreichbar")
+            self.state = "closed"
+            self.failures = 0
+            self.delay = self.base_delay
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open":
+                # Probe fehlgeschlagen - länger warten
+                self.delay = min(self.delay * 2, self.max_delay)
+                self.open()
+            elif self.state == "closed" and self.failures >= self.failure_threshold:
+                print(f"⚠️ Home Assistant nicht erreichbar - Anfragen pausiert für {self.delay:.0f}s")
+                self.open()
+
+    def open(self):
+        self.state = "open"
+        self.open_until = time.monotonic() + self.delay
+        self.probe_in_flight = False
+
+    def is_open(self):
+        """True solange keine Anfragen durchgelassen werden"""
+        with self.lock:
+            return self.state != "closed"
+
+    def retry_in(self):
+        """Sekunden bis zur nächsten Probe-Anfrage"""
+        with self.lock:
+            return max(0.0, self.open_until - time.monotonic())
+
+
+class HAClient:
+    """Gemeinsamer HTTP-Client für alle Home Assistant Aufrufe
+
+    Eine requests.Session mit Connection-Pool und Keep-Alive, damit z.B. der
+    10 Hz camera_proxy-Abruf nicht bei jedem Frame eine neue TCP/TLS-Verbindung
+    aufbaut. Führt pro Endpoint Zähler für Anfragen, Fehler, Latenz und Bytes.
+    Ein Circuit Breaker für den HA-Host lässt Anfragen bei Ausfall sofort
+    scheitern, statt jedes Mal den Timeout abzuwarten.
+    """
+
+    # Timeouts (Sekunden) pro Endpoint-Art
+    TIMEOUTS = {
+        "state": 2,
+        "states": 5,
+        "service": 5,
+        "camera": 10,
+        "image": 10
+    }
+
+    def __init__(self, ha_url, headers, pool_size=8):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=pool_size,
+                                                max_retries=0, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats_lock = threading.Lock()
+        self.stats = {}
+        # Anfragen, die wegen offenem Breaker gar nicht gesendet wurden
+        self.short_circuited = 0
+        self.breaker = CircuitBreaker()
+        # Gemeinsamer Pool für parallele Einzelabrufe (Threads entstehen erst bei Bedarf)
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ha-state")
+        self.configure(ha_url, headers)
+
+    def configure(self, ha_url, headers):
+        """URL und Header (Token) übernehmen - der Pool bleibt erhalten"""
+        if ha_url.rstrip("/") != getattr(self, "ha_url", None):
+            # Neuer Host - eigener Breaker-Zustand
+            self.breaker = CircuitBreaker()
+        self.ha_url = ha_url.rstrip("/")
+        self.session.headers.clear()
+        self.session.headers.update(headers)
+        self.session.headers["Connection"] = "keep-alive"
+
+    def request(self, method, endpoint, path, **kwargs):
+        """Anfrage über die Session senden und Statistik führen
+
+        path ist relativ zur HA-URL (z.B. /api/states). Netzwerkfehler werden
+        gezählt und weitergereicht. Ist der Breaker offen, wird sofort
+        CircuitOpenError ausgelöst.
+        """
+        if not self.breaker.allow_request():
+            with self.stats_lock:
+                self.short_circuited += 1
+            raise CircuitOpenError(f"Home Assistant nicht erreichbar - nächster Versuch in "
+                                   f"{self.breaker.retry_in():.0f}s")
+
+        kwargs.setdefault("timeout", self.TIMEOUTS.get(endpoint, 5))
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.ha_url}{path}", **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            self.record(endpoint, time.perf_counter() - start, 0, error=True)
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self.record(endpoint, time.perf_counter() - start, len(response.content),
+                    error=response.status_code >= 400)
+        return response
+
+    def record(self, endpoint, elapsed, size, error=False):
+        with self.stats_lock:
+            entry = self.stats.setdefault(endpoint, {"requests": 0, "errors": 0,
+                                                     "seconds": 0.0, "bytes": 0})
+            entry["requests"] += 1
+            entry["seconds"] += elapsed
+            entry["bytes"] += size
+            if error:
+                entry["errors"] += 1
+
+    def get_stats(self):
+        """Kopie der Zähler pro Endpoint (inkl. mittlerer Latenz in ms)"""
+        with self.stats_lock:
+            result = {}
+            for endpoint, entry in self.stats.items():
+                result[endpoint] = dict(entry)
+                result[endpoint]["avg_ms"] = entry["seconds"] * 1000 / max(entry["requests"], 1)
+            return result
+
+    def fetch_state(self, entity_id):
+        """Einzelnen Entity-Zustand holen
+
+        None, wenn HA die Entity nicht kennt (404). Netzwerk- und HTTP-Fehler
+        werden weitergereicht, damit der Aufrufer sie von "gibt es nicht"
+        unterscheiden kann.
+        """
+        response = self.request("GET", "state", f"/api/states/{entity_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def get_state(self, entity_id):
+        """Einzelnen Entity-Zustand holen (None bei Fehler)"""
+        try:
+            return self.fetch_state(entity_id)
+        except Exception:
+            return None
+
+    def get_states(self):
+        """Alle Zustände mit einem Aufruf holen (Response, Fehler werden weitergereicht)"""
+        return self.request("GET", "states", "/api/states")
+
+    def call_service(self, domain, service, data):
+        """HA-Service aufrufen (Response, Fehler werden weitergereicht)"""
+        return self.request("POST", "service", f"/api/services/{domain}/{service}", json=data)
+
+    def get_camera_image(self, camera_entity):
+        """Snapshot über camera_proxy holen (Bytes oder None)"""
+        try:
+            response = self.request("GET", "camera", f"/api/camera_proxy/{camera_entity}")
+            if response.status_code == 200:
+                return response.content
+        except Exception:
+            pass
+        return None
+
+    def get_image(self, path):
+        """Bild (z.B. entity_picture) laden (Response, Fehler werden weitergereicht)"""
+        return self.request("GET", "image", path)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+class HAWebSocketClient:
+    """Home Assistant WebSocket-Client (/api/websocket) für Push-Updates
+
+    Abonniert die gegebenen Entities über subscribe_entities (Fallback:
+    state_changed Events) und ruft on_states(changed) aus dem eigenen Thread
+    mit einem Dict entity_id -> State im Format der REST-API auf. Von HA
+    entfernte Entities kommen als entity_id -> None.
+    """
+
+    def __init__(self, ha_url, token, entity_ids, on_states):
+        if ha_url.startswith("https://"):
+            self.url = "wss://" + ha_url[len("https://"):].rstrip("/") + "/api/websocket"
+        else:
+            self.url = "ws://" + ha_url.replace("http://", "", 1).rstrip("/") + "/api/websocket"
+        self.token = token
+        self.entity_ids = set(entity_ids)
+        self.on_states = on_states
+        self.ws = None
+        self.running = False
+        self.connected = False
+        self.message_id = 0
+        self.states = {}
+        self.thread = None
+
+    def start(self):
+        """Verbindungs-Thread starten"""
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Verbindung beenden"""
+        self.running = False
+        self.connected = False
+        if self.ws:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+
+    def run(self):
+        """Verbinden, abonnieren, Events lesen - mit Backoff bei Fehlern"""
+        backoff = 1
+        while self.running:
+            try:
+                self.connect()
+                backoff = 1
+                self.receive_loop()
+            except Exception as e:
+                if self.running:
+                    print(f"HA WebSocket Fehler: {e} - neuer Versuch in {backoff}s")
+            finally:
+                self.connected = False
+                if self.ws:
+                    try:
+                        self.ws.close()
+                    except Exception:
+                        pass
+                    self.ws = None
+
+            if self.running:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def next_id(self):
+        self.message_id += 1
+        return self.message_id
+
+    def send(self, message):
+        self.ws.send(json.dumps(message))
+
+    def receive(self):
+        data = self.ws.recv()
+        if not data:
+            raise ConnectionError("Verbindung vom Server geschlossen")
+        return json.loads(data)
+
+    def connect(self):
+        """Verbindung aufbauen, authentifizieren und Entities abonnieren"""
+        self.message_id = 0
+        self.ws = websocket.create_connection(self.url, timeout=10)
+
+        message = self.receive()
+        if message.get("type") == "auth_required":
+            self.send({"type": "auth", "access_token": self.token})
+            message = self.receive()
+        if message.get("type") != "auth_ok":
+            raise ConnectionError(f"Authentifizierung fehlgeschlagen: {message.get('message', message.get('type'))}")
+
+        # Bevorzugt: subscribe_entities (komprimierte Zustände, serverseitig gefiltert)
+        subscribe_id = self.next_id()
+        self.send({"id": subscribe_id, "type": "subscribe_entities",
+                   "entity_ids": sorted(self.entity_ids)})
+
+        if not self.wait_for_result(subscribe_id).get("success"):
+            # Ältere HA-Versionen: Startzustand holen, dann alle state_changed Events filtern
+            states_id = self.next_id()
+            self.send({"id": states_id, "type": "get_states"})
+            initial = self.wait_for_result(states_id)
+            self.publish({state["entity_id"]: state for state in initial.get("result") or []
+                          if state.get("entity_id") in self.entity_ids})
+
+            subscribe_id = self.next_id()
+            self.send({"id": subscribe_id, "type": "subscribe_events",
+                       "event_type": "state_changed"})
+            if not self.wait_for_result(subscribe_id).get("success"):
+                raise ConnectionError("Abonnement von state_changed fehlgeschlagen")
+
+        self.connected = True
+        print("✅ HA WebSocket verbunden - Push-Updates aktiv")
+
+    def wait_for_result(self, message_id):
+        """Auf die result-Antwort zu einer Anfrage warten (Events dazwischen verarbeiten)"""
+        while True:
+            message = self.receive()
+            if message.get("type") == "result" and message.get("id") == message_id:
+                return message
+            if message.get("type") == "event":
+                self.handle_event(message.get("event", {}))
+
+    def receive_loop(self):
+        """Events lesen bis die Verbindung endet; bei Stille Ping senden"""
+        self.ws.settimeout(30)
+        waiting_for_pong = False
+        while self.running:
+            try:
+                message = self.receive()
+            except websocket.WebSocketTimeoutException:
+                if waiting_for_pong:
+                    raise ConnectionError("Keine Antwort auf Ping")
+                self.send({"id": self.next_id(), "type": "ping"})
+                waiting_for_pong = True
+                continue
+
+            waiting_for_pong = False
+            if message.get("type") == "event":
+                self.handle_event(message.get("event", {}))
+
+    def handle_event(self, event):
+        """subscribe_entities- oder state_changed-Event in REST-Zustände umwandeln"""
+        if "a" in event or "c" in event or "r" in event:
+            changed = {}
+            for entity_id, compressed in event.get("a", {}).items():
+                changed[entity_id] = self.expand_state(entity_id, compressed)
+            for entity_id, diff in event.get("c", {}).items():
+                state = self.states.get(entity_id)
+                if state is None:
+                    continue
+                state = dict(state, attributes=dict(state.get("attributes", {})))
+                added = diff.get("+", {})
+                if "s" in added:
+                    state["state"] = added["s"]
+                if "a" in added:
+                    state["attributes"].update(added["a"])
+                if "lc" in added:
+                    state["last_changed"] = state["last_updated"] = added["lc"]
+                if "lu" in added:
+                    state["last_updated"] = added["lu"]
+                for key in diff.get("-", {}).get("a", []):
+                    state["attributes"].pop(key, None)
+                changed[entity_id] = state
+            for entity_id in event.get("r", []):
+                changed[entity_id] = None
+            self.publish(changed)
+            return
+
+        data = event.get("data", {})
+        entity_id = data.get("entity_id")
+        if entity_id in self.entity_ids and data.get("new_state"):
+            self.publish({entity_id: data["new_state"]})
+
+    def expand_state(self, entity_id, compressed):
+        """Komprimierten Zustand (s/a/lc/lu) in das REST-Format übersetzen"""
+        last_changed = compressed.get("lc")
+        return {
+            "entity_id": entity_id,
+            "state": compressed.get("s"),
+            "attributes": compressed.get("a", {}),
+            "last_changed": last_changed,
+            "last_updated": compressed.get("lu", last_changed)
+        }
+
+    def publish(self, changed):
+        """Geänderte Zustände merken und an den Callback geben (None = entfernt)"""
+        if not changed:
+            return
+        for entity_id, state in changed.items():
+            if state is None:
+                self.states.pop(entity_id, None)
+            else:
+                self.states[entity_id] = state
+        try:
+            self.on_states(changed)
+        except Exception as e:
+            print(f"HA WebSocket Callback Fehler: {e}")
+
+
+class PollScheduler:
+    """Abrufplan pro Entity für das REST-Polling
+
+    Jede Entity bekommt anhand von Domain und Namen eine Klasse: hot (ändert
+    sich beim Drucken ständig, z.B. Temperaturen, Lüfter, Fortschritt), alert
+    (Fehler-Sensoren wie HMS oder Druckfehler), warm (Status-Sensoren,
+    Licht) oder cold (Gesamtnutzung, Start- und Endzeit, Bilder). Das
+    Intervall hängt außerdem vom Druckerzustand ab (aus: alles cold, an aber
+    kein Druck: hot und alert werden warm) und wächst, solange der Wert
+    unverändert bleibt - außer bei alert: Fehler sollen während des Drucks
+    nie später als im festen 5s-Takt erscheinen. Ändert sich der Druckerzustand, sind sofort
+    alle Entities fällig. Schalter in pinned (Drucker-Steckdosen) bleiben
+    immer beim kürzesten Intervall - daran hängt das MQTT-Auto-Connect.
+    """
+
+    # Klasse -> (Basisintervall, Höchstintervall) in Sekunden
+    INTERVALS = {
+        "hot": (5.0, 15.0),
+        "alert": (5.0, 5.0),
+        "warm": (10.0, 30.0),
+        "cold": (60.0, 300.0)
+    }
+    # Wachstum des Intervalls pro unveränderter Abfrage
+    BACKOFF = 1.5
+    HOT_WORDS = ("temp", "duse", "nozzle", "bett", "bed", "luft", "fan", "drehzahl", "progress",
+                 "fortschritt", "layer", "schicht", "verbleibend", "remaining", "power", "leistung")
+    COLD_WORDS = ("gesamt", "total", "usage", "nutzung", "start", "end", "titelbild")
+    ALERT_WORDS = ("error", "fehler", "hms", "fault", "stoerung", "störung")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}               # entity_id -> {"class", "pinned", "unchanged", "due", "value"}
+        self.power_on = None            # None: unbekannt
+        self.printing = None            # None: unbekannt (kein MQTT)
+        self.started = time.monotonic()
+        self.stats = {"requests": 0, "entities": 0}
+
+    @classmethod
+    def classify(cls, entity_id):
+        """Abrufklasse aus Domain und Namen ableiten"""
+        domain, _, name = entity_id.partition(".")
+        if domain in ("image", "camera"):
+            return "cold"
+        if domain in ("sensor", "binary_sensor") and any(word in name for word in cls.ALERT_WORDS):
+            return "alert"
+        if domain == "sensor":
+            # "verbleibende_zeit" vor "endzeit"/"startzeit" prüfen
+            if any(word in name for word in cls.HOT_WORDS):
+                return "hot"
+            if any(word in name for word in cls.COLD_WORDS):
+                return "cold"
+        return "warm"
+
+    def configure(self, entity_ids, pinned=()):
+        """Entity-Liste übernehmen - bekannte Entities behalten ihren Plan"""
+        now = time.monotonic()
+        with self.lock:
+            entries = {}
+            for entity_id in entity_ids:
+                entry = self.entries.get(entity_id)
+                if entry is None:
+                    entry = {"class": self.classify(entity_id), "unchanged": 0, "due": now, "value": None}
+                entry["pinned"] = entity_id in pinned
+                entries[entity_id] = entry
+            self.entries = entries
+
+    def set_context(self, power_on, printing):
+        """Druckerzustand setzen - bei Wechsel sind sofort alle Entities fällig"""
+        with self.lock:
+            if (power_on, printing) == (self.power_on, self.printing):
+                return
+            self.power_on = power_on
+            self.printing = printing
+            now = time.monotonic()
+            for entry in self.entries.values():
+                entry["unchanged"] = 0
+                entry["due"] = min(entry["due"], now)
+
+    def force(self):
+        """Alles sofort fällig (z.B. nach Schalten)"""
+        now = time.monotonic()
+        with self.lock:
+            for entry in self.entries.values():
+                entry["due"] = now
+
+    def interval(self, entry):
+        if entry["pinned"]:
+            return self.INTERVALS["hot"][0]
+        poll_class = entry["class"]
+        if self.power_on is False:
+            poll_class = "cold"
+        elif poll_class in ("hot", "alert") and self.printing is False:
+            poll_class = "warm"
+        base, limit = self.INTERVALS[poll_class]
+        return min(base * self.BACKOFF ** entry["unchanged"], limit)
+
+    def due(self, window=2.0):
+        """Fällige Entities - ist eine fällig, kommen die in den nächsten window Sekunden fälligen mit"""
+        now = time.monotonic()
+        with self.lock:
+            if not any(entry["due"] <= now for entry in self.entries.values()):
+                return []
+            return [entity_id for entity_id, entry in self.entries.items() if entry["due"] <= now + window]
+
+    def next_due_in(self):
+        """Sekunden bis zur nächsten fälligen Entity"""
+        with self.lock:
+            if not self.entries:
+                return self.INTERVALS["hot"][0]
+            return max(0.0, min(entry["due"] for entry in self.entries.values()) - time.monotonic())
+
+    def observe(self, entity_ids, states):
+        """Abrufergebnis auswerten und die nächste Abfrage planen"""
+        now = time.monotonic()
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["entities"] += len(entity_ids)
+            for entity_id in entity_ids:
+                entry = self.entries.get(entity_id)
+                if entry is None:
+                    continue
+                data = states.get(entity_id)
+                value = data.get("state") if data else None
+                if value == entry["value"]:
+                    entry["unchanged"] += 1
+                else:
+                    entry["unchanged"] = 0
+                    entry["value"] = value
+                entry["due"] = now + self.interval(entry)
+
+    def expedite(self, entity_ids, delay=0.0):
+        """Entities spätestens in delay Sekunden abfragen (z.B. nach Ereignis per MQTT)"""
+        due = time.monotonic() + delay
+        with self.lock:
+            for entity_id in entity_ids:
+                entry = self.entries.get(entity_id)
+                if entry:
+                    entry["unchanged"] = 0
+                    entry["due"] = min(entry["due"], due)
+
+    def retry_later(self, entity_ids, seconds=5.0):
+        """HA nicht erreichbar - fällige Entities später erneut versuchen"""
+        due = time.monotonic() + seconds
+        with self.lock:
+            for entity_id in entity_ids:
+                if entity_id in self.entries:
+                    self.entries[entity_id]["due"] = due
+
+    def get_stats(self):
+        """Zähler plus Vergleich mit festem 5-Sekunden-Polling aller Entities"""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            classes = {}
+            for entry in self.entries.values():
+                poll_class = "pinned" if entry["pinned"] else entry["class"]
+                classes[poll_class] = classes.get(poll_class, 0) + 1
+            stats = dict(self.stats)
+            stats["classes"] = classes
+            stats["baseline"] = int(elapsed / self.INTERVALS["hot"][0]) * len(self.entries)
+            return stats
+
+
+class MqttSession:
+    """Eine MQTT-Sitzung zum Bambu-Drucker - genau ein paho-Client
+
+    Zustände: idle -> connecting -> connected <-> backoff, stop() führt über
+    draining zurück nach idle. Neue Verbindungsversuche übernimmt paho
+    selbst (loop_start + reconnect_delay_set), der TLS-Kontext wird einmal
+    erstellt und wiederverwendet. start() ist außerhalb von idle wirkungslos -
+    so können nie zwei Clients gleichzeitig laufen.
+    """
+
+    IDLE = "idle"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    BACKOFF = "backoff"
+    DRAINING = "draining"
+
+    def __init__(self, on_state, on_message, min_delay=1, max_delay=8):
+        self.on_state = on_state        # (Zustand, reason_code) -> None, aus paho-/Drain-Thread
+        self.on_message = on_message    # paho on_message
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+        # TLS: Drucker nutzt ein selbstsigniertes Zertifikat
+        self.tls_context = ssl.create_default_context()
+        self.tls_context.check_hostname = False
+        self.tls_context.verify_mode = ssl.CERT_NONE
+
+        self.lock = threading.Lock()
+        self.client = None
+        self.credentials = None         # (IP, Seriennummer, Access Code) des aktuellen Clients
+        self.target = None              # Zugangsdaten für den nächsten start()
+        self.last_error = None          # Ablehnung durch den Drucker (z.B. falscher Access Code)
+        self.state = self.IDLE
+        self.restart_pending = False
+        self.disconnected_at = None
+        self.stats = {"connects": 0, "disconnects": 0, "reconnect_seconds": None}
+
+    def is_active(self):
+        return self.state != self.IDLE
+
+    def configure(self, host, serial, access_code):
+        """Zugangsdaten setzen - wirksam beim nächsten start()"""
+        self.target = (host, serial, access_code)
+
+    def start(self, host=None, serial=None, access_code=None):
+        """Sitzung starten; gibt False zurück, wenn bereits eine läuft"""
+        if host:
+            self.configure(host, serial, access_code)
+        with self.lock:
+            if self.state != self.IDLE or not self.target:
+                return False
+            credentials = self.target
+            if self.client is None or credentials != self.credentials:
+                self.client = self.create_client(credentials)
+                self.credentials = credentials
+            self.state = self.CONNECTING
+            self.last_error = None
+            self.disconnected_at = time.monotonic()
+            client = self.client
+
+        self.notify(None)
+        try:
+            # connect_async: DNS und Verbindungsaufbau erst im paho-Thread
+            client.connect_async(credentials[0], 8883, 60)
+            client.loop_start()
+        except Exception as e:
+            print(f"MQTT Start Fehler: {e}")
+            with self.lock:
+                self.state = self.IDLE
+            self.notify(None)
+            return False
+        return True
+
+    def create_client(self, credentials):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        client.username_pw_set("bblp", credentials[2])
+        client.tls_set_context(self.tls_context)
+        client.reconnect_delay_set(self.min_delay, self.max_delay)
+        client.on_connect = self.handle_connect
+        client.on_connect_fail = self.handle_connect_fail
+        client.on_disconnect = self.handle_disconnect
+        client.on_message = self.on_message
+        return client
+
+    def stop(self, restart=False):
+        """Verbindung trennen (im Hintergrund); restart=True baut sie danach neu auf"""
+        with self.lock:
+            if self.state == self.DRAINING:
+                self.restart_pending = self.restart_pending or restart
+                return
+            if self.state == self.IDLE:
+                if restart:
+                    threading.Thread(target=self.start, daemon=True).start()
+                return
+            self.state = self.DRAINING
+            self.restart_pending = restart
+        self.notify(None)
+        threading.Thread(target=self.drain, daemon=True).start()
+
+    def drain(self):
+        client = self.client
+        try:
+            client.disconnect()
+            client.loop_stop()
+        except Exception as e:
+            print(f"MQTT Disconnect Fehler: {e}")
+        with self.lock:
+            self.state = self.IDLE
+            restart = self.restart_pending
+            self.restart_pending = False
+        self.notify(None)
+        if restart:
+            self.start()
+
+    def publish(self, topic, payload):
+        if self.state == self.CONNECTED:
+            self.client.publish(topic, payload)
+
+    def notify(self, reason_code):
+        self.on_state(self.state, reason_code)
+
+    def handle_connect(self, client, userdata, flags, reason_code, properties):
+        with self.lock:
+            if self.state == self.DRAINING:
+                return
+            if reason_code.is_failure:
+                # Drucker lehnt ab (Access Code) - neue Versuche sind zwecklos
+                self.last_error = reason_code
+                self.state = self.DRAINING
+                self.restart_pending = False
+                threading.Thread(target=self.drain, daemon=True).start()
+            else:
+                self.state = self.CONNECTED
+                self.stats["connects"] += 1
+                if self.disconnected_at is not None:
+                    self.stats["reconnect_seconds"] = time.monotonic() - self.disconnected_at
+                    self.disconnected_at = None
+                client.subscribe(f"device/{self.credentials[1]}/report")
+        self.notify(reason_code)
+
+    def handle_connect_fail(self, client, userdata):
+        with self.lock:
+            if self.state == self.DRAINING:
+                return
+            self.state = self.BACKOFF
+        self.notify(None)
+
+    def handle_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
+        with self.lock:
+            if self.state in (self.DRAINING, self.IDLE):
+                return
+            if self.state == self.CONNECTED:
+                self.stats["disconnects"] += 1
+                self.disconnected_at = time.monotonic()
+            self.state = self.BACKOFF
+        self.notify(reason_code)
+
+
+class PrinterState:
+    """Vollständiges Druckermodell, aus Bambu-Reports fortgeschrieben
+
+    P1-Drucker senden meist nur Delta-Reports mit den geänderten Feldern.
+    apply() übernimmt ein Delta in das Modell (AMS-Einheiten und Spulen
+    werden per id gemischt) und liefert die Menge der geänderten Felder,
+    damit die UI nur das neu zeichnet, was sich wirklich geändert hat.
+    """
+
+    # Schlüssel unter "print" -> (Attribut, Konverter)
+    FIELDS = {
+        "gcode_state": ("gcode_state", str),
+        "mc_percent": ("progress", int),
+        "layer_num": ("layer_num", int),
+        "total_layer_num": ("total_layers", int),
+        "mc_remaining_time": ("remaining_time", int),
+        "subtask_name": ("filename", str),
+        "nozzle_temper": ("nozzle_temp", float),
+        "nozzle_target_temper": ("nozzle_target", float),
+        "bed_temper": ("bed_temp", float),
+        "bed_target_temper": ("bed_target", float),
+        "chamber_temper": ("chamber_temp", float),
+        "cooling_fan_speed": ("fan_cooling", int),
+        "heatbreak_fan_speed": ("fan_heatbreak", int),
+        "big_fan1_speed": ("fan_aux", int),
+        "big_fan2_speed": ("fan_chamber", int),
+        "sequence_id": ("sequence_id", int)
+    }
+
+    __slots__ = (
+        "gcode_state", "progress", "layer_num", "total_layers", "remaining_time", "filename",
+        "nozzle_temp", "nozzle_target", "bed_temp", "bed_target", "chamber_temp",
+        "fan_cooling", "fan_heatbreak", "fan_aux", "fan_chamber",
+        "sequence_id", "ams", "ams_status", "hms", "extra"
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Zustand wie ohne Drucker-Verbindung"""
+        self.gcode_state = 'IDLE'
+        self.progress = 0
+        self.layer_num = 0
+        self.total_layers = 0
+        self.remaining_time = 0
+        self.filename = 'Kein Druck aktiv'
+        self.nozzle_temp = None
+        self.nozzle_target = None
+        self.bed_temp = None
+        self.bed_target = None
+        self.chamber_temp = None
+        self.fan_cooling = None
+        self.fan_heatbreak = None
+        self.fan_aux = None
+        self.fan_chamber = None
+        self.sequence_id = None
+        self.ams = {}           # Einheit-id -> {Feld: Wert, "tray": {Spulen-id -> {...}}}
+        self.ams_status = {}    # tray_now, tray_tar, ... aus dem "ams"-Block
+        self.hms = []           # aktive HMS-Fehlermeldungen (kommen immer komplett)
+        self.extra = {}         # alle übrigen "print"-Felder
+
+    def apply(self, report):
+        """Report (Delta oder pushall) übernehmen, geänderte Felder zurückgeben"""
+        changed = set()
+        info = report.get("print")
+        if not isinstance(info, dict):
+            return changed
+
+        for key, value in info.items():
+            field = self.FIELDS.get(key)
+            if field:
+                attr, convert = field
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    continue
+                if attr == "remaining_time" and value <= 0:
+                    continue  # Letzte bekannte Restzeit behalten
+                if getattr(self, attr) != value:
+                    setattr(self, attr, value)
+                    changed.add(attr)
+            elif key == "ams":
+                if isinstance(value, dict) and self.merge_ams(value):
+                    changed.add("ams")
+            elif key == "hms":
+                if value != self.hms:
+                    self.hms = list(value)
+                    changed.add("hms")
+            elif isinstance(value, dict) and isinstance(self.extra.get(key), dict):
+                current = self.extra[key]
+                if any(current.get(k) != v for k, v in value.items()):
+                    merge_report(current, value)
+                    changed.add(key)
+            elif self.extra.get(key) != value:
+                self.extra[key] = value
+                changed.add(key)
+        return changed
+
+    def merge_ams(self, info):
+        """AMS-Block einmischen - Einheiten und Spulen werden per id zugeordnet"""
+        changed = False
+        for unit in info.get("ams") or []:
+            target = self.ams.setdefault(unit.get("id"), {"tray": {}})
+            for key, value in unit.items():
+                if key == "tray":
+                    for tray in value or []:
+                        tray_target = target["tray"].setdefault(tray.get("id"), {})
+                        for tray_key, tray_value in tray.items():
+                            if tray_target.get(tray_key) != tray_value:
+                                tray_target[tray_key] = tray_value
+                                changed = True
+                elif target.get(key) != value:
+                    target[key] = value
+                    changed = True
+        for key, value in info.items():
+            if key != "ams" and self.ams_status.get(key) != value:
+                self.ams_status[key] = value
+                changed = True
+        return changed
+
+
+def pushall_command():
+    """pushall-Request (vollständiger Status) als JSON"""
+    command = {
+        "pushing": {
+            "sequence_id": "1",
+            "command": "pushall"
+        },
+        "user_id": "1234567890"
+    }
+    return json.dumps(command)
+
+
+def select_report_decoder(name="auto"):
+    """Decoder für MQTT-Reports wählen: "auto", "json" oder "orjson"
+
+    orjson parst direkt aus den Payload-Bytes. Die Standardbibliothek
+    dekodiert Bytes intern ohnehin zu str (mit Encoding-Erkennung) - ein
+    explizites UTF-8-decode() ist dort schneller. "auto" nimmt orjson,
+    wenn installiert. Liefert (Name, Funktion).
+    """
+    if name == "auto":
+        name = "orjson" if orjson else "json"
+    if name == "orjson" and orjson:
+        return "orjson", orjson.loads
+    return "json", decode_json_report
+
+
+def decode_json_report(payload):
+    """Report mit der Standardbibliothek dekodieren"""
+    return json.loads(payload.decode("utf-8"))
+
+
+class ReportSync:
+    """Entscheidet, wann ein vollständiger Report (pushall) nötig ist
+
+    Im Normalbetrieb reichen die Delta-Reports des Druckers. Ein pushall
+    wird nur angefordert nach dem Verbinden, nach einer Lücke in den
+    sequence_ids (oder verworfenen Nachrichten), wenn zu lange nichts kam
+    oder auf Wunsch des Benutzers. observe()/mark_gap() laufen im
+    Ingest-Thread, due()/sent() im Tk-Thread.
+    """
+
+    def __init__(self, stale_after=60.0, min_interval=5.0):
+        self.stale_after = stale_after      # Sekunden ohne Report -> Daten veraltet
+        self.min_interval = min_interval    # Mindestabstand automatischer pushalls
+        self.lock = threading.Lock()
+        self.last_sequence = None
+        self.last_report = 0.0
+        self.last_pushall = 0.0
+        self.reason = None                  # ausstehender pushall-Grund
+        self.stats = {"reports": 0, "gaps": 0, "pushall": {}}
+
+    def reset(self):
+        """Neue Verbindung - Sequenz neu beginnen"""
+        with self.lock:
+            self.last_sequence = None
+            self.last_report = time.monotonic()
+            self.reason = None
+
+    def observe(self, report):
+        """Einzelnen Report verbuchen und Sequenzlücken erkennen"""
+        info = report.get("print") if isinstance(report, dict) else None
+        with self.lock:
+            self.last_report = time.monotonic()
+            self.stats["reports"] += 1
+            # Nur Status-Pushes zählen - Command-Acks (pushall, Licht, ...) tragen
+            # die sequence_id des Befehls und würden falsche Lücken melden
+            if not isinstance(info, dict) or info.get("command") != "push_status":
+                return
+            if "sequence_id" not in info:
+                return
+            try:
+                sequence = int(info["sequence_id"])
+            except (TypeError, ValueError):
+                return
+            last = self.last_sequence
+            self.last_sequence = sequence
+            # Übersprungen oder zurückgesetzt (Drucker-Neustart) -> neu synchronisieren
+            if last is not None and sequence != last and sequence != last + 1:
+                self.stats["gaps"] += 1
+                self.reason = self.reason or "gap"
+
+    def mark_gap(self):
+        """Nachricht ging verloren (z.B. Inbox-Überlauf)"""
+        with self.lock:
+            self.stats["gaps"] += 1
+            self.reason = self.reason or "gap"
+
+    def due(self):
+        """Grund für ein automatisches pushall oder None"""
+        now = time.monotonic()
+        with self.lock:
+            if self.reason is None and now - max(self.last_report, self.last_pushall) > self.stale_after:
+                self.reason = "stale"
+            if self.reason and now - self.last_pushall >= self.min_interval:
+                return self.reason
+        return None
+
+    def sent(self, reason):
+        """pushall wurde gesendet"""
+        with self.lock:
+            self.last_pushall = time.monotonic()
+            self.reason = None
+            self.stats["pushall"][reason] = self.stats["pushall"].get(reason, 0) + 1
+
+
+class MqttIngest:
+    """Eingangsstufe für Drucker-Reports zwischen paho-Thread und Tk-Thread
+
+    Der paho-Netzwerk-Thread legt die Rohdaten nur in eine begrenzte Inbox
+    (bei Überlauf fliegt die älteste Nachricht raus). Ein eigener Thread
+    parst die Reports, fasst Bursts per Deep-Merge zu einem Report zusammen
+    und reicht höchstens max_refresh_rate Mal pro Sekunde die gesammelten
+    Reports an on_report weiter - die UI wird also nie öfter als nötig neu
+    gezeichnet. Mehrere Drucker teilen sich Inbox und Thread; jeder Report
+    trägt dazu den Schlüssel seines Druckers (None = Hauptdrucker).
+    """
+
+    def __init__(self, on_report, sync=None, decoder="auto", max_queue=100, max_refresh_rate=5.0):
+        self.on_report = on_report      # (Schlüssel, dict) -> None, aus dem Ingest-Thread
+        self.syncs = {}                 # Schlüssel -> ReportSync, sieht jeden Report einzeln
+        if sync:
+            self.syncs[None] = sync
+        self.decoder_name, self.decode = select_report_decoder(decoder)
+        self.max_queue = max_queue
+        self.min_interval = 1.0 / max_refresh_rate
+
+        self.condition = threading.Condition()
+        self.inbox = deque()            # (Schlüssel, Payload, Empfangszeitpunkt)
+        self.running = False
+        self.thread = None
+        self.pending = {}               # Schlüssel -> [zusammengefasster Report, Empfang des ältesten]
+        self.latency = StageStats()
+        self.last_done = None           # Ende der letzten Verarbeitung (Batch oder Weitergabe)
+
+        self.stats = {
+            "received": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "errors": 0,
+            "processed": 0,             # dekodiert und zusammengeführt
+            "max_depth": 0,
+            "process_seconds": 0.0
+        }
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.consume_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def add_source(self, key, sync):
+        """Weiteren Drucker anmelden (Fleet-Modus)"""
+        self.syncs[key] = sync
+
+    def remove_source(self, key):
+        self.syncs.pop(key, None)
+
+    def put(self, payload, block=False, key=None):
+        """Rohdaten übernehmen (paho-Thread) - kein Parsen, kein Tk, kein HTTP
+
+        block=True wartet bei voller Inbox statt die älteste Nachricht zu
+        verwerfen (Replay mit maximaler Geschwindigkeit).
+        """
+        with self.condition:
+            while block and self.running and len(self.inbox) >= self.max_queue:
+                self.condition.wait(0.1)
+            if len(self.inbox) >= self.max_queue:
+                dropped_key = self.inbox.popleft()[0]
+                self.stats["dropped"] += 1
+                sync = self.syncs.get(dropped_key)
+                if sync:
+                    sync.mark_gap()
+            self.inbox.append((key, payload, time.monotonic()))
+            self.stats["received"] += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self.inbox))
+            self.condition.notify_all()
+
+    def get_stats(self):
+        """Statistik inkl. aktueller Queue-Tiefe und Ø Verarbeitungszeit"""
+        with self.condition:
+            stats = dict(self.stats)
+            stats["depth"] = len(self.inbox)
+        processed = stats["received"] - stats["dropped"] - stats["depth"]
+        stats["avg_ms"] = stats["process_seconds"] * 1000 / processed if processed > 0 else 0.0
+        return stats
+
+    def throughput(self, since, processed_before=0):
+        """Verarbeitete Nachrichten/s von since bis zum Ende der letzten Verarbeitung"""
+        with self.condition:
+            processed = self.stats["processed"] - processed_before
+            end = self.last_done
+        return processed / (end - since) if end and end > since else 0.0
+
+    def is_idle(self):
+        """Inbox leer und kein zurückgehaltener Report mehr"""
+        with self.condition:
+            return not self.inbox and not self.pending
+
+    def consume_loop(self):
+        last_refresh = 0.0
+        while self.running:
+            with self.condition:
+                # Auf Nachrichten warten; liegen schon Reports bereit, nur bis zum nächsten Refresh
+                timeout = None
+                if self.pending:
+                    timeout = max(0.0, last_refresh + self.min_interval - time.monotonic())
+                if not self.inbox and (timeout is None or timeout > 0):
+                    self.condition.wait(1.0 if timeout is None else timeout)
+                if not self.running:
+                    return
+                batch = list(self.inbox)
+                self.inbox.clear()
+                self.condition.notify_all()
+
+            for key, payload, received_at in batch:
+                started = time.monotonic()
+                self.latency.add("Inbox", started - received_at)
+                try:
+                    data = self.decode(payload)
+                    sync = self.syncs.get(key)
+                    if sync:
+                        sync.observe(data)
+                    with self.condition:
+                        entry = self.pending.get(key)
+                        if entry is None:
+                            self.pending[key] = [data, received_at]
+                        else:
+                            merge_report(entry[0], data)
+                            self.stats["coalesced"] += 1
+                        self.stats["processed"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"MQTT Nachricht Fehler: {e}")
+                seconds = time.monotonic() - started
+                self.stats["process_seconds"] += seconds
+                self.latency.add("Dekodieren", seconds)
+            if batch:
+                self.last_done = time.monotonic()
+
+            now = time.monotonic()
+            if self.pending and now - last_refresh >= self.min_interval:
+                with self.condition:
+                    pending, self.pending = self.pending, {}
+                last_refresh = now
+                self.stats["refreshes"] += 1
+                for key, (report, pending_since) in pending.items():
+                    # Ältester Report im Bündel: Empfang -> Weitergabe
+                    self.latency.add("Zusammenfassen", now - pending_since)
+                    self.on_report(key, report)
+                self.last_done = time.monotonic()
+
+
+def merge_report(target, delta):
+    """Report delta rekursiv in target übernehmen (neuere Werte gewinnen)
+
+    Listen aus Objekten mit "id" (AMS-Einheiten, Spulen) werden wie in
+    PrinterState.merge_ams per id zusammengeführt - sonst ginge bei zwei
+    Teil-Reports im selben Flush-Fenster das Delta der ersten Spule verloren.
+    """
+    for key, value in delta.items():
+        current = target.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merge_report(current, value)
+        elif is_id_list(value) and is_id_list(current):
+            merge_id_list(current, value)
+        else:
+            target[key] = value
+    return target
+
+
+def is_id_list(value):
+    """True für Listen, deren Elemente alle Dicts mit "id" sind"""
+    return isinstance(value, list) and all(isinstance(item, dict) and "id" in item for item in value)
+
+
+def merge_id_list(target, delta):
+    """Elemente von delta per id in target einmischen, neue ids anhängen"""
+    by_id = {item["id"]: item for item in target}
+    for item in delta:
+        current = by_id.get(item["id"])
+        if current is None:
+            target.append(item)
+            by_id[item["id"]] = item
+        else:
+            merge_report(current, item)
+
+
+class StageStats:
+    """Latenz pro Verarbeitungsstufe (Anzahl, Summe, Maximum)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def add(self, name, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def lines(self):
+        """Zeilen "Stufe: Ø x ms, max y ms (n)" für Konsole und Status-Dialog"""
+        with self.lock:
+            return [f"{name}: Ø {total * 1000 / count:.2f} ms, max {peak * 1000:.1f} ms ({count})"
+                    for name, (count, total, peak) in self.stages.items()]
+
+
+class MqttRecorder:
+    """Rohe Drucker-Reports mit Zeitstempel gzip-komprimiert aufzeichnen
+
+    Eine Zeile pro Report: "<Unix-Zeit> <Payload>". Ist eine Datei
+    max_bytes (unkomprimiert) groß, wird sie nach .1, .2, ... rotiert und
+    höchstens backups alte Dateien behalten.
+    """
+
+    def __init__(self, path, max_bytes=20 * 1048576, backups=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, "ab")
+        self.written = 0
+        self.messages = 0
+
+    def write(self, payload):
+        # JSON enthält Zeilenumbrüche nur als Leerraum - eine Zeile pro Report
+        line = b"%.3f " % time.time() + payload.replace(b"\n", b" ") + b"\n"
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            self.written += len(line)
+            self.messages += 1
+            if self.written >= self.max_bytes:
+                self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self.file = gzip.open(self.path, "ab")
+        self.written = 0
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+def read_capture(path):
+    """Aufzeichnung lesen -> Liste von (Unix-Zeit, Payload)"""
+    records = []
+    with gzip.open(path, "rb") as capture:
+        for line in capture:
+            timestamp, _, payload = line.rstrip(b"\n").partition(b" ")
+            if payload:
+                records.append((float(timestamp), payload))
+    return records
+
+
+class MqttReplayer:
+    """Aufzeichnung in den MQTT-Eingangspfad einspeisen (ohne Drucker)
+
+    speed 1 oder 10 hält die aufgezeichneten Abstände (geteilt durch speed)
+    ein, speed 0 spielt so schnell wie möglich ab. Mit ingest wird neben der
+    Einspeiserate auch gemessen, wie viele Nachrichten/s tatsächlich
+    verarbeitet wurden.
+    """
+
+    def __init__(self, records, sink, speed=1.0, on_done=None, ingest=None):
+        self.records = records
+        self.sink = sink                # (Payload-Bytes) -> None, z.B. MqttIngest.put
+        self.speed = speed
+        self.on_done = on_done
+        self.ingest = ingest
+        self.processed_before = 0
+        self.running = False
+        self.sent = 0
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        if self.ingest:
+            self.processed_before = self.ingest.get_stats()["processed"]
+        self.started = time.monotonic()
+        first = self.records[0][0] if self.records else 0.0
+        for timestamp, payload in self.records:
+            if not self.running:
+                break
+            if self.speed:
+                delay = (timestamp - first) / self.speed - (time.monotonic() - self.started)
+                if delay > 0:
+                    time.sleep(delay)
+            self.sink(payload)
+            self.sent += 1
+        self.finished = time.monotonic()
+        self.running = False
+        if self.on_done:
+            self.on_done()
+
+    def rate(self):
+        """Eingespeiste Nachrichten pro Sekunde"""
+        end = self.finished or time.monotonic()
+        return self.sent / (end - self.started) if self.started and end > self.started else 0.0
+
+    def processed_rate(self):
+        """Verarbeitete Nachrichten pro Sekunde - vom ersten Einspeisen bis der Ingest fertig ist"""
+        if not self.ingest or not self.started:
+            return 0.0
+        return self.ingest.throughput(self.started, self.processed_before)
+
+
+class FleetPrinter:
+    """Ein Drucker im Fleet-Modus - nur Zustand, keine eigenen Threads"""
+
+    def __init__(self, config):
+        self.serial = config.get("bambu_serial", "")
+        self.key = self.serial or config.get("name", "")
+        self.name = config.get("name") or self.key
+        self.host = config.get("bambu_ip", "")
+        self.access_code = config.get("bambu_access_code", "")
+        self.entity_id = config.get("entity_id")          # Schalter (Steckdose) des Druckers
+        self.camera_entity = config.get("camera_entity")
+        self.state = PrinterState()
+        self.sync = ReportSync()
+        self.session = None
+        self.synced = False     # erster Report seit Verbindungsaufbau übernommen
+
+    def ready(self):
+        return bool(self.host and self.serial and self.access_code)
+
+
+class FleetBackend:
+    """Gemeinsames Backend für mehrere Drucker in einem Prozess
+
+    Pro Drucker läuft nur der paho-Netzwerk-Thread seiner MqttSession. Alles
+    andere wird geteilt: die Reports aller Drucker laufen (mit Schlüssel)
+    durch denselben MqttIngest-Thread, die Schalter-States kommen aus dem
+    gemeinsamen /api/states-Abruf des Widgets, ein Thread prüft die
+    Report-Sequenzen aller Drucker und ein Kamera-Thread holt die Bilder
+    reihum über den HA-Connection-Pool - bereits auf Kachelgröße skaliert.
+    """
+
+    def __init__(self, printers, ingest, ha_client, on_state, on_camera,
+                 tile_size=(320, 180), camera_interval=2.0):
+        self.ingest = ingest
+        self.ha_client = ha_client
+        self.on_state = on_state        # (Schlüssel, Zustand, reason_code) -> None
+        self.on_camera = on_camera      # (Schlüssel, PIL-Image) -> None, aus dem Kamera-Thread
+        self.tile_size = tile_size
+        self.camera_interval = camera_interval
+        self.cameras_active = False
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.stats = {"camera_frames": 0, "camera_errors": 0, "pushall": 0}
+
+        self.printers = {}
+        for config in printers:
+            printer = FleetPrinter(config)
+            if not printer.key or printer.key in self.printers:
+                print(f"Fleet: Drucker '{printer.name}' übersprungen (Seriennummer fehlt oder doppelt)")
+                continue
+            printer.session = MqttSession(
+                on_state=lambda state, reason_code, key=printer.key: self.handle_state(key, state, reason_code),
+                on_message=lambda client, userdata, msg, key=printer.key: self.ingest.put(msg.payload, key=key)
+            )
+            self.printers[printer.key] = printer
+
+    def start(self):
+        for printer in self.printers.values():
+            self.ingest.add_source(printer.key, printer.sync)
+            # Ohne Schalter-Entity gleich verbinden, sonst entscheidet check_power()
+            if printer.ready() and not printer.entity_id:
+                printer.session.start(printer.host, printer.serial, printer.access_code)
+        for target in (self.sync_loop, self.camera_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        for printer in self.printers.values():
+            printer.session.stop()
+            self.ingest.remove_source(printer.key)
+
+    def entity_ids(self):
+        """Schalter-Entities aller Drucker (für den gemeinsamen Status-Abruf)"""
+        return [printer.entity_id for printer in self.printers.values() if printer.entity_id]
+
+    def check_power(self, states):
+        """Sitzungen nach dem Schalter-Zustand starten bzw. Versuche stoppen"""
+        for printer in self.printers.values():
+            state_data = states.get(printer.entity_id) if printer.entity_id else None
+            if not state_data or not printer.ready():
+                continue
+            if state_data["state"] == "on" and not printer.session.is_active():
+                print(f"🔄 {printer.name} ist an - starte MQTT-Verbindung...")
+                printer.session.start(printer.host, printer.serial, printer.access_code)
+            elif state_data["state"] == "off" and printer.session.state == MqttSession.BACKOFF:
+                print(f"⏸️ {printer.name} ist aus - MQTT-Verbindungsversuche gestoppt")
+                printer.session.stop()
+
+    def send_pushall(self, printer, reason):
+        printer.session.publish(f"device/{printer.serial}/request", pushall_command())
+        printer.sync.sent(reason)
+        self.stats["pushall"] += 1
+
+    def handle_state(self, key, state, reason_code):
+        """Zustandswechsel einer Sitzung (paho- oder Drain-Thread)"""
+        printer = self.printers[key]
+        if state == MqttSession.CONNECTED:
+            printer.sync.reset()
+            self.send_pushall(printer, "connect")
+        self.on_state(key, state, reason_code)
+
+    def sync_loop(self):
+        """pushall für alle Drucker nur bei Lücke oder veralteten Daten"""
+        while not self.stop_event.wait(2.0):
+            for printer in list(self.printers.values()):
+                if printer.session.state != MqttSession.CONNECTED:
+                    continue
+                reason = printer.sync.due()
+                if reason:
+                    print(f"🔄 {printer.name}: Status unvollständig ({reason}) - fordere pushall an")
+                    self.send_pushall(printer, reason)
+
+    def camera_loop(self):
+        """Kameras aller Drucker reihum abrufen - ein Thread für die ganze Flotte"""
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            # HA nicht erreichbar - keine Abrufe, bis der Breaker wieder durchlässt
+            if self.cameras_active and self.ha_client.breaker.retry_in() == 0:
+                for printer in list(self.printers.values()):
+                    if self.stop_event.is_set() or not self.cameras_active:
+                        break
+                    if not printer.camera_entity:
+                        continue
+                    raw = self.ha_client.get_camera_image(printer.camera_entity)
+                    if raw is None:
+                        self.stats["camera_errors"] += 1
+                        continue
+                    try:
+                        image = open_frame(raw)
+                        image = scale_frame(image, fit_size(image.size, self.tile_size))
+                    except Exception as e:
+                        self.stats["camera_errors"] += 1
+                        print(f"Fleet-Kamera Fehler ({printer.name}): {e}")
+                        continue
+                    self.stats["camera_frames"] += 1
+                    self.on_camera(printer.key, image)
+            self.stop_event.wait(max(0.2, self.camera_interval - (time.monotonic() - started)))
+
+
+class MjpegParser:
+    """Parser für multipart/x-mixed-replace (MJPEG) Streams
+
+    feed() nimmt beliebige Byte-Blöcke entgegen und gibt alle darin
+    vollständig enthaltenen JPEG-Frames zurück. Nutzt Content-Length der
+    Teile (µStreamer sendet sie), sonst die nächste Boundary.
+    """
+
+    def __init__(self, boundary):
+        boundary = boundary.strip().strip('"')
+        if boundary.startswith("--"):
+            boundary = boundary[2:]
+        self.marker = b"--" + boundary.encode("latin-1")
+        self.buffer = bytearray()
+        self.last_timestamp = None  # X-Timestamp des zuletzt gelieferten Frames (µStreamer)
+
+    @staticmethod
+    def boundary_from_content_type(content_type):
+        """Boundary aus dem Content-Type-Header lesen"""
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "boundary":
+                return value
+        return None
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                break
+            frames.append(frame)
+        return frames
+
+    def next_frame(self):
+        buffer = self.buffer
+        start = buffer.find(self.marker)
+        if start < 0:
+            # Nur das Ende behalten, falls die Boundary gerade angeschnitten ist
+            del buffer[:max(0, len(buffer) - len(self.marker))]
+            return None
+
+        header_end = buffer.find(b"\r\n\r\n", start)
+        if header_end < 0:
+            return None
+        body_start = header_end + 4
+
+        length = None
+        timestamp = None
+        for line in bytes(buffer[start + len(self.marker):header_end]).split(b"\r\n"):
+            key, _, value = line.partition(b":")
+            key = key.strip().lower()
+            try:
+                if key == b"content-length":
+                    length = int(value.strip())
+                elif key == b"x-timestamp":
+                    timestamp = float(value.strip())
+            except ValueError:
+                pass
+
+        if length is not None:
+            if len(buffer) < body_start + length:
+                return None
+            frame = bytes(buffer[body_start:body_start + length])
+            del buffer[:body_start + length]
+            # Erst jetzt übernehmen - ein angeschnittener Folge-Frame darf den Wert nicht überschreiben
+            self.last_timestamp = timestamp
+            return frame
+
+        next_marker = buffer.find(self.marker, body_start)
+        if next_marker < 0:
+            return None
+        frame = bytes(buffer[body_start:next_marker]).rstrip(b"\r\n")
+        del buffer[:next_marker]
+        self.last_timestamp = timestamp
+        return frame
+
 
 class SimpleStreamReader:
+    """µStreamer MJPEG-Client ohne OpenCV
+
+    Liest /stream über eine einzelne Streaming-HTTP-Verbindung (Basic Auth
+    direkt über requests). Ein eigener Grabber-Thread leert den Stream
+    ständig und veröffentlicht nur das neueste JPEG samt Empfangszeitpunkt,
+    damit nie gepufferte, sekundenalte Frames angezeigt werden.
+    """
+
     def __init__(self, url, auth=None):
         self.url = url
         self.auth = auth
-        self.cap = None
+        self.response = None
+        self.chunks = None
+        self.parser = None
         self.running = False
         self.last_frame_time = None
         self.frame_timeout = 5  # 10 Sekunden Timeout
         self.retry_count = 0
         self.max_retries = 3
+        self.grabber = None
+
+        # Neuester Frame (vom Grabber-Thread gesetzt)
+        self.condition = threading.Condition()
+        self.latest_frame = None
+        self.latest_frame_monotonic = None   # Empfangszeitpunkt (time.monotonic)
+        self.latest_source_timestamp = None  # X-Timestamp von µStreamer (Unix-Zeit), falls gesendet
+        self.frame_seq = 0
+        self.delivered_seq = 0
+        self.delivered_frame_monotonic = None
+
+        # Statistik
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.frames_skipped = 0
+        self.fps = 0.0
+        self.fps_window_start = time.monotonic()
+        self.fps_window_frames = 0
 
     def start_stream(self):
-        """Stream mit OpenCV starten"""
-        try:
-            # URL mit Auth falls nötig
-            if self.auth:
-                # Requests Session für Auth
-                import requests
-                session = requests.Session()
-                session.auth = self.auth
-                # OpenCV kann direkt mit authentifizierten URLs arbeiten
-                auth_url = self.url.replace('http://', f'http://{self.auth.username}:{self.auth.password}@')
-                self.cap = cv2.VideoCapture(auth_url)
-            else:
-                self.cap = cv2.VideoCapture(self.url)
-
-            self.running = self.cap.isOpened()
-            return self.running
-        except:
+        """Streaming-Verbindung öffnen und Grabber-Thread starten"""
+        if not self.open_connection():
+            self.running = False
             return False
+        self.running = True
+        self.grabber = threading.Thread(target=self.grab_loop, daemon=True)
+        self.grabber.start()
+        return True
 
-    def get_latest_frame(self):
-        """Frame mit OpenCV lesen und Timeout-Erkennung"""
-        if not self.running or not self.cap:
-            return None
-
+    def open_connection(self):
+        """HTTP-Verbindung zum Stream öffnen"""
         try:
-            ret, frame = self.cap.read()
-        except cv2.error:
-            # OpenCV Fehler - VideoCapture ist korrupt, komplett neu erstellen
-            print("OpenCV Fehler - erstelle VideoCapture neu")
-            if self.cap:  # Prüfe ob cap existiert
-                self.cap.release()
-            self.cap = None
-            self.running = False
-            return None
+            self.response = requests.get(self.url, auth=self.auth, stream=True,
+                                         timeout=(5, self.frame_timeout))
+            if self.response.status_code != 200:
+                print(f"µStreamer: HTTP {self.response.status_code}")
+                self.close_response()
+                return False
+
+            boundary = MjpegParser.boundary_from_content_type(
+                self.response.headers.get("Content-Type", ""))
+            if not boundary:
+                print("µStreamer: Keine multipart-Boundary im Content-Type")
+                self.close_response()
+                return False
+
+            self.parser = MjpegParser(boundary)
+            self.chunks = self.iter_available(self.response)
+            return True
         except Exception:
-            # Andere Fehler auch abfangen
-            if self.cap:  # Prüfe ob cap existiert
-                self.cap.release()
-            self.cap = None
-            self.running = False
-            return None
+            self.close_response()
+            return False
+
+    @staticmethod
+    def iter_available(response, chunk_size=65536):
+        """Bytes liefern sobald sie ankommen (nicht erst bei vollem chunk_size-Block)"""
+        raw = response.raw
+        if hasattr(raw, "read1"):
+            while True:
+                chunk = raw.read1(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            # Ältere urllib3-Versionen: kleine Blöcke, damit kein Frame-Ende hängen bleibt
+            yield from response.iter_content(chunk_size=1024)
+
+    def grab_loop(self):
+        """Grabber-Thread: Stream dauerhaft lesen, nur den neuesten Frame behalten"""
+        while self.running:
+            try:
+                chunk = next(self.chunks)
+            except Exception:
+                # Lesefehler/Timeout (frame_timeout ohne Daten) - neu verbinden
+                if self.running and not self.reconnect():
+                    break
+                continue
+
+            self.bytes_received += len(chunk)
+            frames = self.parser.feed(chunk)
+            if not frames:
+                continue
+
+            now = time.monotonic()
+            with self.condition:
+                if self.frame_seq != self.delivered_seq:
+                    # Vorheriger Frame wurde nie abgeholt
+                    self.frames_skipped += 1
+                self.frames_skipped += len(frames) - 1
+                self.latest_frame = frames[-1]
+                self.latest_frame_monotonic = now
+                self.latest_source_timestamp = self.parser.last_timestamp
+                self.frame_seq += 1
+                self.condition.notify_all()
 
-        if ret:
-            # Erfolgreicher Frame - Timestamp aktualisieren
-            import time
             self.last_frame_time = time.time()
             self.retry_count = 0  # Reset bei erfolgreichem Frame
+            for _ in frames:
+                self.count_frame()
+
+        with self.condition:
+            self.condition.notify_all()
+
+    def reconnect(self):
+        """Neu verbinden mit Versuchszähler - False wenn aufgegeben"""
+        self.close_response()
+        print(f"µStreamer Timeout erkannt - versuche Neustart (Versuch {self.retry_count + 1})")
+        while self.running and self.retry_count < self.max_retries:
+            self.retry_count += 1
+            time.sleep(1)  # Kurze Pause
+            if self.open_connection():
+                print("µStreamer: Stream erfolgreich neu gestartet")
+                self.last_frame_time = time.time()
+                return True
+            print("µStreamer: Neustart fehlgeschlagen")
 
-            # OpenCV BGR zu RGB konvertieren
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            # Zu JPEG encodieren
-            _, buffer = cv2.imencode('.jpg', frame_rgb)
-            return buffer.tobytes()
-        else:
-            # Kein Frame erhalten - prüfe Timeout
-            import time
-            current_time = time.time()
+        if self.running:
+            print("µStreamer: Max. Versuche erreicht - Stream deaktiviert")
+        self.running = False
+        return False
+
+    def get_latest_frame(self, wait=1.0):
+        """Neuesten, noch nicht abgeholten Frame liefern (wartet max. wait Sekunden)"""
+        with self.condition:
+            if self.frame_seq == self.delivered_seq and self.running:
+                self.condition.wait(wait)
+            if self.frame_seq == self.delivered_seq:
+                return None
+            self.delivered_seq = self.frame_seq
+            self.delivered_frame_monotonic = self.latest_frame_monotonic
+            return self.latest_frame
 
-            if self.last_frame_time and (current_time - self.last_frame_time) > self.frame_timeout:
-                print(f"µStreamer Timeout erkannt - versuche Neustart (Versuch {self.retry_count + 1})")
-                if self.retry_count < self.max_retries:
-                    self.retry_count += 1
-                    self.restart_stream()
-                else:
-                    print("µStreamer: Max. Versuche erreicht - Stream deaktiviert")
-                    self.running = False
+    def frame_age(self):
+        """Alter des neuesten Frames in Sekunden (seit Empfang)"""
+        if self.latest_frame_monotonic is None:
+            return None
+        return time.monotonic() - self.latest_frame_monotonic
 
-        return None
+    def source_latency(self):
+        """Kamera->Empfang-Latenz laut X-Timestamp (nur bei synchronen Uhren aussagekräftig)"""
+        if self.latest_source_timestamp is None or self.latest_frame_monotonic is None:
+            return None
+        received_at = time.time() - (time.monotonic() - self.latest_frame_monotonic)
+        return max(0.0, received_at - self.latest_source_timestamp)
+
+    def count_frame(self):
+        """Frame-Zähler und FPS (gleitendes Fenster von ~2 s) aktualisieren"""
+        self.frames_received += 1
+        self.fps_window_frames += 1
+        now = time.monotonic()
+        elapsed = now - self.fps_window_start
+        if elapsed >= 2.0:
+            self.fps = self.fps_window_frames / elapsed
+            self.fps_window_start = now
+            self.fps_window_frames = 0
+
+    def close_response(self):
+        if self.response:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+        self.response = None
+        self.chunks = None
 
     def stop_stream(self):
         """Stream stoppen"""
         self.running = False
-        if self.cap:  # Prüfe ob cap existiert bevor release()
-            self.cap.release()
-            self.cap = None
-
-    def restart_stream(self):
-        """Stream neu starten"""
-        print("µStreamer: Neustart des Streams...")
-        self.stop_stream()
-        import time
-        time.sleep(1)  # Kurze Pause
-        success = self.start_stream()
-        if success:
-            print("µStreamer: Stream erfolgreich neu gestartet")
-            self.last_frame_time = time.time()
-        else:
-            print("µStreamer: Neustart fehlgeschlagen")
-        return success
+        self.close_response()
+        with self.condition:
+            self.condition.notify_all()
+
+class CameraPipeline:
+    """Begrenzte Kamera-Pipeline: Capture-Thread -> Decode/Resize-Thread -> Ansichten
+
+    Statt alle 100 ms einen neuen Thread zu starten, laufen genau zwei
+    Threads. Zwischen Capture und Decode liegt ein Ein-Platz-Puffer
+    ("neuestes Bild gewinnt"); ein überschriebenes Rohbild zählt als
+    verworfen. Jedes Bild wird genau einmal geholt und dekodiert und dann
+    an alle aktiven Ansichten (Hauptfenster, PiP) in deren eigener Größe
+    verteilt. Solange eine Ansicht ihr letztes Bild noch nicht angezeigt
+    hat, bekommt sie kein neues (Back-Pressure pro Ansicht) - so bleiben
+    Thread-Anzahl und Speicher auch bei langsamer Kamera konstant.
+
+    Unveränderte Bilder (z.B. zwischen zwei Schichten) werden übersprungen:
+    identische Bytes schon vor dem Dekodieren, neu kodierte, aber sichtbar
+    gleiche Bilder nach einem Vergleich winziger Vorschaubilder - dann
+    entfallen Skalieren und PhotoImage. Eine Ansicht bekommt trotzdem ein
+    Bild, wenn sie neu aktiv ist oder ihre Größe sich geändert hat.
+    """
+
+    def __init__(self, source, interval=0.1, idle_interval=0.5, change_threshold=8):
+        self.source = source            # () -> JPEG-Bytes oder None (blockierend)
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.change_threshold = change_threshold  # max. Grauwert-Abweichung im Vorschaubild
+
+        self.condition = threading.Condition()
+        self.slot = None                # neuestes Rohbild
+        self.last_digest = None         # Byte-Prüfsumme des letzten Rohbilds
+        self.last_fingerprint = None    # Vorschaubild des letzten sichtbar neuen Bilds
+        self.content_version = 0        # zählt sichtbar neue Bilder
+        self.views = {}                 # Name -> Ansicht (siehe add_view)
+        self.running = False
+        self.wakeup = threading.Event()
+        self.threads = []
+
+        self.stats = {
+            "captured": 0,
+            "decoded": 0,
+            "displayed": 0,
+            "dropped_capture": 0,
+            "errors": 0,
+            "skipped_identical": 0,
+            "skipped_similar": 0,
+            "frame_age_ms": 0.0
+        }
+
+    def add_view(self, name, size_getter, on_frame, fit=False, active=True):
+        """Ansicht anmelden
+
+        size_getter liefert (Breite, Höhe) oder None (Ansicht noch nicht
+        bereit) und wird im Decode-Thread aufgerufen - darf also keine
+        Tk-Aufrufe machen. Mit fit=True ist die Größe nur der Rahmen, in den
+        das Bild seitenverhältnistreu eingepasst wird. on_frame(PIL.Image)
+        wird aus dem Decode-Thread aufgerufen; danach muss die Ansicht
+        frame_displayed(name) melden.
+        """
+        with self.condition:
+            self.views[name] = {
+                "size_getter": size_getter,
+                "on_frame": on_frame,
+                "fit": fit,
+                "active": active,
+                "ui_pending": False,      # Ansicht hat letztes Bild noch nicht angezeigt
+                "captured_at": 0.0,
+                "content": None,          # (content_version, Größe) des zuletzt gelieferten Bilds
+            }
+            self.condition.notify_all()
+
+    def set_view_active(self, name, active):
+        """Ansicht ein-/ausschalten; ohne aktive Ansicht ruht der Capture-Thread"""
+        with self.condition:
+            view = self.views[name]
+            view["active"] = active
+            if not active:
+                view["ui_pending"] = False
+                view["content"] = None
+            self.condition.notify_all()
+        if active:
+            self.wakeup.set()
+
+    def has_active_view(self):
+        return any(view["active"] for view in self.views.values())
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self.capture_loop, daemon=True),
+            threading.Thread(target=self.decode_loop, daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def request_frame(self):
+        """Sofort ein neues Bild holen (z.B. nach Größenwechsel)"""
+        self.wakeup.set()
+
+    def frame_displayed(self, name):
+        """Von der UI aufrufen, sobald das gelieferte Bild angezeigt wurde"""
+        with self.condition:
+            view = self.views[name]
+            view["ui_pending"] = False
+            self.stats["displayed"] += 1
+            # Ende-zu-Ende-Bildalter (Empfang -> Anzeige), geglättet
+            age_ms = (time.monotonic() - view["captured_at"]) * 1000
+            self.stats["frame_age_ms"] = age_ms if not self.stats["frame_age_ms"] else \
+                0.9 * self.stats["frame_age_ms"] + 0.1 * age_ms
+            self.condition.notify_all()
+
+    def ready_views(self):
+        """Aktive Ansichten, die ein neues Bild annehmen können (Lock gehalten)"""
+        return [(name, view) for name, view in self.views.items()
+                if view["active"] and not view["ui_pending"]]
+
+    def capture_loop(self):
+        while self.running:
+            if not self.has_active_view():
+                self.wakeup.wait(self.idle_interval)
+                self.wakeup.clear()
+                continue
+
+            started = time.monotonic()
+            try:
+                raw = self.source()
+            except Exception:
+                raw = None
+                self.stats["errors"] += 1
+
+            # Quelle darf (Bild, Aufnahmezeitpunkt) liefern, sonst zählt "jetzt"
+            captured_at = started
+            if isinstance(raw, tuple):
+                raw, captured_at = raw
+
+            if raw is not None:
+                with self.condition:
+                    if self.slot is not None:
+                        self.stats["dropped_capture"] += 1
+                    self.slot = (raw, captured_at)
+                    self.stats["captured"] += 1
+                    self.condition.notify_all()
+                delay = self.interval - (time.monotonic() - started)
+            else:
+                # Keine Quelle / Fehler - nicht im 100 ms Takt weiterfragen
+                delay = self.idle_interval
+
+            if delay > 0:
+                self.wakeup.wait(delay)
+            self.wakeup.clear()
+
+    def decode_loop(self):
+        while self.running:
+            with self.condition:
+                # Warten bis ein Bild da ist und mindestens eine Ansicht frei ist
+                while self.running and (self.slot is None or not self.ready_views()):
+                    self.condition.wait(1.0)
+                if not self.running:
+                    return
+                raw, captured_at = self.slot
+                self.slot = None
+                targets = self.ready_views()
+
+            try:
+                sizes = [view["size_getter"]() for name, view in targets]
+                targets = [(name, view, size) for (name, view), size in zip(targets, sizes) if size]
+                if not targets:
+                    continue
+                self.detect_change(raw)
+                # Nur Ansichten, die dieses Bild in dieser Größe noch nicht haben
+                targets = [(name, view, size) for name, view, size in targets
+                           if view["content"] != (self.content_version, size)]
+                if not targets:
+                    continue
+                images = self.decode(raw, targets)
+            except Exception:
+                self.stats["errors"] += 1  # Fehler ignorieren für flüssigere Darstellung
+                continue
+
+            with self.condition:
+                for name, view, size in targets:
+                    view["ui_pending"] = True
+                    view["captured_at"] = captured_at
+                    view["content"] = (self.content_version, size)
+                self.stats["decoded"] += 1
+            for (name, view, size), image in zip(targets, images):
+                view["on_frame"](image)
+
+    def detect_change(self, raw):
+        """content_version erhöhen, wenn raw sichtbar neu ist (Decode-Thread)"""
+        digest = frame_digest(raw)
+        if digest is not None and digest == self.last_digest:
+            self.stats["skipped_identical"] += 1
+            return
+        self.last_digest = digest
+        fingerprint = frame_fingerprint(raw)
+        if (self.last_fingerprint is not None and
+                fingerprint_distance(fingerprint, self.last_fingerprint) <= self.change_threshold):
+            # Mit dem letzten angezeigten Bild vergleichen, nicht mit dem Vorgänger -
+            # so summieren sich langsame Änderungen und werden doch sichtbar
+            self.stats["skipped_similar"] += 1
+            return
+        self.last_fingerprint = fingerprint
+        self.content_version += 1
+
+    def decode(self, raw, targets):
+        """Rohbild einmal dekodieren und für jede Ansicht skalieren"""
+        image = open_frame(raw)
+        sizes = [fit_size(image.size, size) if view["fit"] else size
+                 for name, view, size in targets]
+        if len(sizes) > 1 and image.format == "JPEG":
+            # Reduziert nur so weit dekodieren, wie die größte Ansicht braucht
+            image.draft("RGB", (max(w for w, h in sizes), max(h for w, h in sizes)))
+        return [scale_frame(image, size) for size in sizes]
+
+
+class FrameSurface:
+    """Wiederverwendeter Bildpuffer einer Ansicht (nur im Tk-Thread benutzen)
+
+    Hält genau ein PhotoImage in der aktuellen Bildgröße und kopiert neue
+    Pixel per paste() hinein, statt pro Frame ein neues Tk-Image anzulegen.
+    Neu angelegt wird nur, wenn sich die Größe ändert (set_camera_size,
+    PiP-Fenster skaliert).
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.photo = None
+        self.size = None
+        self.stats = {"frames": 0, "allocations": 0}
+
+    def show(self, image):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if self.photo is None or image.size != self.size:
+            self.photo = ImageTk.PhotoImage("RGB", image.size)
+            self.size = image.size
+            self.stats["allocations"] += 1
+            self.label.config(image=self.photo, text="")
+        self.photo.paste(image)
+        self.stats["frames"] += 1
+
+
+class ImageCache:
+    """Bild-Cache nach Inhalts-Hash - Original und fertig skalierte Variante
+
+    Im Speicher liegen die zuletzt benutzten Bilder in einem LRU (begrenzt
+    auf max_memory Bytes), auf der Platte in directory je Hash das Original
+    und die auf size skalierte Variante als PNG (begrenzt auf max_disk
+    Bytes, die ältesten Dateien werden gelöscht). Ein Index ordnet eine
+    Signatur (z.B. Bild-URL + last_changed) dem Hash zu - ein bekanntes
+    Bild muss dann weder geladen noch skaliert werden, auch nach Neustart.
+    """
+
+    def __init__(self, directory, size=(300, 250), max_memory=8 * 1048576,
+                 max_disk=50 * 1048576, max_index=500):
+        self.directory = directory
+        self.size = size
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.max_index = max_index
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()     # Hash -> (Original-Bytes, skaliertes Bild)
+        self.memory_bytes = 0
+        self.index = {}                 # Signatur -> Hash
+        self.stats = {"hits": 0, "disk_hits": 0, "downloads": 0, "bytes": 0, "resized": 0}
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def path(self, digest, suffix):
+        return os.path.join(self.directory, f"{digest}{suffix}")
+
+    def rendition_suffix(self):
+        return f"-{self.size[0]}x{self.size[1]}.png"
+
+    def lookup(self, signature):
+        """Skaliertes Bild zur Signatur aus Speicher oder Platte (None: unbekannt)"""
+        with self.lock:
+            digest = self.index.get(signature)
+        return self.get(digest) if digest else None
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.memory.get(digest)
+            if entry:
+                self.memory.move_to_end(digest)
+                self.stats["hits"] += 1
+                return entry[1]
+        try:
+            with open(self.path(digest, ".img"), "rb") as f:
+                data = f.read()
+            image = Image.open(self.path(digest, self.rendition_suffix()))
+            image.load()
+        except OSError:
+            return None
+        self.stats["disk_hits"] += 1
+        self.remember(digest, data, image)
+        return image
+
+    def store(self, signature, data):
+        """Geladene Bytes übernehmen; gleicher Inhalt wird nicht neu skaliert"""
+        digest = hashlib.sha1(data).hexdigest()
+        self.stats["downloads"] += 1
+        self.stats["bytes"] += len(data)
+        image = self.get(digest)
+        if image is None:
+            image = Image.open(io.BytesIO(data))
+            image = image.resize(fit_size(image.size, self.size), Image.Resampling.LANCZOS)
+            self.stats["resized"] += 1
+            self.remember(digest, data, image)
+            self.write(digest, data, image)
+        with self.lock:
+            self.index[signature] = digest
+            while len(self.index) > self.max_index:
+                del self.index[next(iter(self.index))]
+            index = dict(self.index)
+        self.write_index(index)
+        return image
+
+    def remember(self, digest, data, image):
+        size = len(data) + image.width * image.height * len(image.getbands())
+        with self.lock:
+            if digest in self.memory:
+                self.memory.move_to_end(digest)
+                return
+            self.memory[digest] = (data, image)
+            self.memory_bytes += size
+            while self.memory_bytes > self.max_memory and len(self.memory) > 1:
+                _, (old_data, old_image) = self.memory.popitem(last=False)
+                self.memory_bytes -= len(old_data) + old_image.width * old_image.height * len(old_image.getbands())
+
+    def write(self, digest, data, image):
+        try:
+            with open(self.path(digest, ".img"), "wb") as f:
+                f.write(data)
+            image.save(self.path(digest, self.rendition_suffix()), "PNG")
+            self.prune()
+        except OSError as e:
+            print(f"Bild-Cache Schreibfehler: {e}")
+
+    def write_index(self, index):
+        try:
+            with open(os.path.join(self.directory, "index.json"), "w", encoding="utf-8") as f:
+                json.dump(index, f)
+        except OSError as e:
+            print(f"Bild-Cache Schreibfehler: {e}")
+
+    def prune(self):
+        """Älteste Dateien löschen, bis der Cache wieder unter max_disk liegt"""
+        files = []
+        for name in os.listdir(self.directory):
+            if name == "index.json":
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk:
+                break
+            os.remove(path)
+            total -= size
+
+
+def fit_size(image_size, box):
+    """Größe, mit der image_size seitenverhältnistreu in box passt"""
+    img_ratio = image_size[0] / image_size[1]
+    if img_ratio > box[0] / box[1]:
+        return box[0], max(1, int(box[0] / img_ratio))
+    return max(1, int(box[1] * img_ratio)), box[1]
+
+
+def open_frame(raw):
+    """Kamerabild (JPEG-Bytes von HA camera_proxy oder µStreamer) als PIL-Image öffnen
+
+    Image.open liest nur den Header - dekodiert wird erst beim ersten Zugriff,
+    so können draft() und scale_frame() noch reduziert dekodieren.
+    """
+    return Image.open(io.BytesIO(raw))
+
+
+def frame_digest(raw):
+    """Billige Prüfsumme über die JPEG-Bytes"""
+    return len(raw), zlib.crc32(raw)
+
+
+def frame_fingerprint(raw, size=(64, 36)):
+    """Winziges Graustufen-Vorschaubild für den Bildvergleich
+
+    JPEGs werden per draft() direkt in Graustufen und 1/8 Größe dekodiert -
+    ein Bruchteil der Kosten eines vollen Decodes.
+    """
+    image = open_frame(raw)
+    if image.format == "JPEG":
+        image.draft("L", (size[0] * 2, size[1] * 2))
+    return image.convert("L").resize(size, Image.Resampling.BOX)
+
+
+def fingerprint_distance(first, second):
+    """Größte Grauwert-Abweichung zwischen zwei Vorschaubildern (0-255)"""
+    if first.size != second.size:
+        return 255
+    return ImageChops.difference(first, second).getextrema()[1]
+
+
+def scale_frame(image, size):
+    """Bild auf size skalieren - bei JPEG bereits reduziert dekodieren
+
+    draft() lässt den JPEG-Decoder im DCT-Bereich um 1/2, 1/4 oder 1/8
+    verkleinern (kleinste Stufe, die noch >= size ist). Der Rest-Faktor ist
+    dann klein, und der Filter wird danach gewählt.
+    """
+    if image.format == "JPEG":
+        image.draft("RGB", size)
+
+    ratio = image.width / size[0]
+    if ratio >= 2:
+        resample = Image.Resampling.LANCZOS   # starke Verkleinerung (kein draft möglich)
+    elif ratio > 1:
+        resample = Image.Resampling.BICUBIC   # Rest-Verkleinerung nach draft
+    else:
+        resample = Image.Resampling.BILINEAR  # Vergrößerung
+    return image.resize(size, resample)
+
+
+# ===== BENCHMARKS (python ha-widget.py --benchmark <name>) =====
+
+def synthetic_camera_frame(width=1920, height=1080):
+    """Künstliches RGB-Kamerabild (Verlauf + Rauschen) für Benchmarks - nur PIL"""
+    gradient = Image.linear_gradient("L").rotate(90).resize((width, height))
+    return add_noise(Image.merge("RGB", (gradient, gradient, gradient)), 12)
+
+
+def add_noise(image, sigma):
+    """Gaußsches Rauschen (pro Kanal) auf ein RGB-Bild addieren"""
+    noise = Image.merge("RGB", [Image.effect_noise(image.size, sigma) for _ in range(3)])
+    # effect_noise streut um 128 - per offset wieder auf 0 zentrieren
+    return ImageChops.add(image, noise, offset=-128)
+
+
+def benchmark_camera_decode(frames=30):
+    """HA-Snapshot (1080p JPEG): volles Dekodieren + LANCZOS gegen draft() + scale_frame"""
+    frames = int(frames)
+    buffer = io.BytesIO()
+    synthetic_camera_frame().save(buffer, "JPEG", quality=85)
+    jpeg = buffer.getvalue()
+    print(f"Quelle: 1920x1080 JPEG ({len(jpeg) // 1024} KB), {frames} Frames pro Größe (CPU-Zeit)")
+
+    for width, height in CAMERA_SIZES:
+        start = time.process_time()
+        for _ in range(frames):
+            Image.open(io.BytesIO(jpeg)).resize((width, height), Image.Resampling.LANCZOS)
+        old_ms = (time.process_time() - start) * 1000 / frames
+
+        start = time.process_time()
+        for _ in range(frames):
+            scale_frame(open_frame(jpeg), (width, height))
+        new_ms = (time.process_time() - start) * 1000 / frames
+
+        print(f"{width}x{height}: voll {old_ms:6.1f} ms, draft {new_ms:6.1f} ms, "
+              f"gespart {old_ms - new_ms:6.1f} ms/Frame ({(1 - new_ms / old_ms) * 100:.0f}%)")
+
+
+def benchmark_camera_skip(frames=60):
+    """Statische Kamera: jedes Bild decodieren gegen Änderungserkennung
+
+    Quelle: 1080p-Szene, jedes Bild neu kodiert (leichtes Rauschen) - so
+    wie eine Kamera zwischen zwei Schichten. Alle 10 Bilder bewegt sich ein
+    kleines Objekt (muss erkannt werden), jedes 3. Bild ist byte-identisch.
+    """
+    frames = int(frames)
+    base = synthetic_camera_frame()
+    jpegs = []
+    for index in range(frames):
+        if index % 3 and jpegs:
+            jpegs.append(jpegs[-1])
+            continue
+        frame = base.copy()
+        x = 400 + (index // 10) * 40
+        frame.paste((250, 250, 250), (x, 500, x + 30, 530))  # Druckkopf
+        buffer = io.BytesIO()
+        add_noise(frame, 1.2).save(buffer, "JPEG", quality=85)
+        jpegs.append(buffer.getvalue())
+    size = CAMERA_SIZES[2]
+
+    start = time.process_time()
+    for jpeg in jpegs:
+        scale_frame(open_frame(jpeg), size)
+    old_ms = (time.process_time() - start) * 1000 / frames
+
+    pipeline = CameraPipeline(source=None)
+    pipeline.add_view("main", size_getter=lambda: size, on_frame=None)
+    view = pipeline.views["main"]
+    decoded = 0
+    start = time.process_time()
+    for jpeg in jpegs:
+        pipeline.detect_change(jpeg)
+        if view["content"] != (pipeline.content_version, size):
+            scale_frame(open_frame(jpeg), size)
+            view["content"] = (pipeline.content_version, size)
+            decoded += 1
+    new_ms = (time.process_time() - start) * 1000 / frames
+
+    stats = pipeline.stats
+    print(f"{frames} Frames 1920x1080 -> {size[0]}x{size[1]} (CPU-Zeit pro Frame)")
+    print(f"Immer dekodieren:   {old_ms:6.2f} ms")
+    print(f"Änderungserkennung: {new_ms:6.2f} ms - {decoded} dekodiert, "
+          f"{stats['skipped_identical']} identisch, {stats['skipped_similar']} ähnlich übersprungen")
+
+
+def benchmark_frame_soak(hours=0.25, fps=10):
+    """Dauerlauf Kamera-Anzeige: neues PhotoImage pro Frame gegen FrameSurface
+
+    Spielt hours Stunden Kamerabetrieb mit fps Bildern/s ohne Wartezeit ab;
+    alle 5 (simulierten) Minuten wechselt die Größe wie bei set_camera_size.
+    Protokolliert zehnmal den Python-Speicher (tracemalloc, relativ zum
+    Start), die Zahl der Tk-Images und die Zeit pro Frame. Benötigt ein
+    Display.
+    """
+    import tracemalloc
+    hours, fps = float(hours), int(fps)
+    frames = max(1, int(hours * 3600 * fps))
+    root = tk.Tk()
+    root.withdraw()
+    label = tk.Label(root)
+    label.pack()
+    # Zwei Varianten pro Größe, damit sich die Pixel von Frame zu Frame ändern
+    images = [[Image.new("RGB", size, (shade, 80, 120)) for shade in (60, 180)] for size in CAMERA_SIZES]
+
+    def show_new_photo(image):
+        photo = ImageTk.PhotoImage(image)
+        label.config(image=photo, text="")
+        label.image = photo
+
+    surface = FrameSurface(label)
+    print(f"{hours:g} h bei {fps} FPS = {frames} Frames pro Variante")
+    for name, show in (("PhotoImage pro Frame", show_new_photo), ("FrameSurface", surface.show)):
+        label.config(image="")
+        label.image = None
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        step = max(1, frames // 10)
+        print(name)
+        for index in range(frames):
+            size_index = (index // (300 * fps)) % len(CAMERA_SIZES)
+            show(images[size_index][index % 2])
+            if index % 100 == 0:
+                root.update()
+            if (index + 1) % step == 0:
+                current, peak = tracemalloc.get_traced_memory()
+                print(f"  {(index + 1) / fps / 60:6.0f} min: Python {(current - baseline) / 1024:7.0f} KB "
+                      f"(Spitze {(peak - baseline) / 1024:7.0f} KB), "
+                      f"Tk-Images {len(root.tk.call('image', 'names'))}")
+        elapsed = time.perf_counter() - started
+        tracemalloc.stop()
+        print(f"  {elapsed * 1000 / frames:.2f} ms/Frame")
+    print(f"FrameSurface: {surface.stats['allocations']} PhotoImages für {surface.stats['frames']} Frames")
+    root.destroy()
+
+
+def synthetic_report_corpus(count=600):
+    """P1S-Reports im Originalformat: ein pushall, danach Delta-Reports
+
+    Ersatz, solange kein aufgezeichneter Korpus angegeben ist.
+    """
+    trays = [{"id": str(i), "remain": 80 - i * 10, "k": 0.02, "n": 1, "tag_uid": "0000000000000000",
+              "tray_id_name": "A00-K0", "tray_info_idx": "GFA00", "tray_type": "PLA",
+              "tray_sub_brands": "PLA Basic", "tray_color": "FFFFFFFF", "tray_weight": "1000",
+              "tray_diameter": "1.75", "tray_temp": "55", "tray_time": "8", "bed_temp_type": "1",
+              "bed_temp": "35", "nozzle_temp_max": "230", "nozzle_temp_min": "190",
+              "xcam_info": "000000000000000000000000", "tray_uuid": "0" * 32, "cols": ["FFFFFFFF"]}
+             for i in range(4)]
+    full = {"print": {
+        "command": "push_status", "msg": 0, "sequence_id": "1000",
+        "gcode_state": "RUNNING", "mc_percent": 12, "layer_num": 30, "total_layer_num": 250,
+        "mc_remaining_time": 95, "subtask_name": "Benchy_0.2mm_PLA", "gcode_file": "/data/Metadata/plate_1.gcode",
+        "nozzle_temper": 219.8, "nozzle_target_temper": 220, "bed_temper": 55.1, "bed_target_temper": 55,
+        "chamber_temper": 31, "cooling_fan_speed": "15", "heatbreak_fan_speed": "15",
+        "big_fan1_speed": "0", "big_fan2_speed": "0", "spd_lvl": 2, "spd_mag": 100,
+        "wifi_signal": "-52dBm", "print_error": 0, "hms": [],
+        "lights_report": [{"node": "chamber_light", "mode": "on"}],
+        "ipcam": {"ipcam_dev": "1", "ipcam_record": "enable", "timelapse": "disable", "resolution": "1080p"},
+        "upgrade_state": {"sequence_id": 0, "progress": "", "status": "", "module": "null",
+                          "new_version_state": 2, "new_ver_list": []},
+        "upload": {"status": "idle", "progress": 0, "message": ""},
+        "ams": {"ams": [{"id": "0", "humidity": "4", "temp": "0.0", "tray": trays}],
+                "ams_exist_bits": "1", "tray_exist_bits": "f", "tray_is_bbl_bits": "f",
+                "tray_now": "0", "tray_pre": "0", "tray_tar": "0", "version": 12,
+                "insert_flag": True, "power_on_flag": False}
+    }}
+    reports = [json.dumps(full).encode()]
+    for i in range(1, count):
+        delta = {"print": {"command": "push_status", "msg": 1, "sequence_id": str(1000 + i),
+                           "nozzle_temper": 219.5 + (i % 5) * 0.1, "bed_temper": 55.0 + (i % 3) * 0.1}}
+        if i % 10 == 0:
+            delta["print"].update({"mc_percent": 12 + i // 10, "layer_num": 30 + i // 10,
+                                   "mc_remaining_time": max(1, 95 - i // 10)})
+        reports.append(json.dumps(delta).encode())
+    return reports
+
+
+def load_report_corpus(path):
+    """Aufgezeichneter Korpus: --record-Datei (.gz) oder ein Report (Roh-JSON) pro Zeile"""
+    if path.endswith(".gz"):
+        return [payload for timestamp, payload in read_capture(path)]
+    with open(path, "rb") as corpus:
+        return [line.strip() for line in corpus if line.strip()]
+
+
+def benchmark_mqtt_decode(corpus=None, rounds=20):
+    """MQTT-Reports dekodieren und ins Druckermodell übernehmen, je Decoder
+
+    Optional mit einem aufgezeichneten Korpus (Pfad als Argument).
+    """
+    reports = load_report_corpus(corpus) if corpus else synthetic_report_corpus()
+    total = len(reports) * rounds
+    size_mb = sum(len(report) for report in reports) * rounds / 1048576
+    print(f"Korpus: {len(reports)} Reports ({'aufgezeichnet' if corpus else 'synthetisch'}), "
+          f"{rounds} Durchläufe (CPU-Zeit)")
+
+    variants = [("json.loads(Bytes)", json.loads), ("json", select_report_decoder("json")[1])]
+    if orjson:
+        variants.append(("orjson", select_report_decoder("orjson")[1]))
+    else:
+        print("orjson nicht installiert (pip install orjson)")
+
+    baseline = None
+    for name, decode in variants:
+        start = time.process_time()
+        for _ in range(rounds):
+            for payload in reports:
+                decode(payload)
+        decode_seconds = time.process_time() - start
+
+        start = time.process_time()
+        for _ in range(rounds):
+            state = PrinterState()
+            for payload in reports:
+                state.apply(decode(payload))
+        total_seconds = time.process_time() - start
+
+        baseline = baseline or total_seconds
+        print(f"{name:17s}: Dekodieren {decode_seconds * 1e6 / total:5.1f} µs/Report "
+              f"({size_mb / decode_seconds:5.1f} MB/s), mit Modell {total_seconds * 1e6 / total:5.1f} µs, "
+              f"{baseline / total_seconds:4.1f}x")
+
+
+def benchmark_mqtt_replay(capture=None, speed="max"):
+    """Aufzeichnung ohne GUI durch Ingest und Druckermodell abspielen
+
+    Der Tk-Thread wird durch eine Queue im Hauptthread ersetzt; gemessen
+    werden Nachrichten/s, UI-Updates und die Latenz pro Stufe.
+    """
+    if capture:
+        records = read_capture(capture)
+    else:
+        # Synthetisch: ein Report alle 100 ms
+        records = [(index * 0.1, payload) for index, payload in enumerate(synthetic_report_corpus())]
+    speed = 0.0 if speed == "max" else float(speed)
+
+    reports = queue.Queue()
+    ingest = MqttIngest(on_report=lambda key, data: reports.put((data, time.monotonic())))
+    state = PrinterState()
+    # Maximale Geschwindigkeit: bei voller Inbox warten statt verwerfen
+    replayer = MqttReplayer(records, ingest.put if speed else lambda payload: ingest.put(payload, block=True), speed,
+                            ingest=ingest)
+    print(f"Replay: {len(records)} Reports ({capture or 'synthetisch'}), "
+          f"Geschwindigkeit {f'{speed:g}x' if speed else 'max'}, Decoder {ingest.decoder_name}")
+
+    ingest.start()
+    replayer.start()
+    while replayer.running or not ingest.is_idle() or not reports.empty():
+        try:
+            data, queued_at = reports.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        started = time.monotonic()
+        ingest.latency.add("Tk-Queue", started - queued_at)
+        state.apply(data)
+        ingest.latency.add("UI-Update", time.monotonic() - started)
+    ingest.stop()
+
+    stats = ingest.get_stats()
+    print(f"{replayer.sent} Reports, {replayer.processed_rate():.0f} Nachrichten/s verarbeitet "
+          f"({replayer.rate():.0f}/s eingespeist), {stats['refreshes']} UI-Updates, "
+          f"{stats['coalesced']} zusammengefasst, {stats['dropped']} verworfen")
+    for line in ingest.latency.lines():
+        print(f"    {line}")
+
+
+def benchmark_sensor_format(entities=300, rounds=200):
+    """Sensor-Zeilen formatieren: alte Inline-Prüfungen gegen SensorFormatter
+
+    Alt: Substring-Prüfungen, Import und strptime bei jedem Zyklus
+    Neu: pro Entity vorkompilierte Kette, memoisiert auf (state, unit)
+    Pro Runde ändert sich jeder zehnte Wert (Temperaturen, Lüfter).
+    """
+    entities, rounds = int(entities), int(rounds)
+
+    def legacy_format(entity, data):
+        state = data["state"]
+        unit = data.get("attributes", {}).get("unit_of_measurement", "")
+        if entity.startswith("binary_sensor"):
+            return ("Ja" if state == "on" else "Nein"), ("#e74c3c" if state == "on" and "fehler" in entity else "#27ae60")
+        elif "zeit" in entity and "-" in str(state) and ":" in str(state):
+            try:
+                from datetime import datetime
+                dt = datetime.strptime(str(state), "%Y-%m-%d %H:%M:%S")
+                return dt.strftime("%d.%m.%Y %H:%M:%S"), "#3498db"
+            except:
+                return str(state), "#3498db"
+        elif "verbleibende_zeit" in entity and unit == "h":
+            try:
+                hours_float = float(state)
+                hours = int(hours_float)
+                minutes = int((hours_float - hours) * 60)
+                if minutes == 0:
+                    return f"{hours} Stunden", "#3498db"
+                return f"{hours} Stunden und {minutes} Minuten", "#3498db"
+            except:
+                return f"{state} {unit}", "#3498db"
+        elif entity.startswith("sensor") and unit:
+            return f"{state} {unit}", "#3498db"
+        return str(state), "#3498db"
+
+    templates = [
+        ("sensor.p1s_{}_temperatur_der_duse", "219.5", "°C"),
+        ("sensor.p1s_{}_druckbetttemperatur", "55.0", "°C"),
+        ("sensor.p1s_{}_bauteillufterdrehzahl", "60", "%"),
+        ("sensor.p1s_{}_gesamtnutzung", "412.3", "h"),
+        ("sensor.p1s_{}_startzeit", "2025-07-17 17:04:00", ""),
+        ("sensor.p1s_{}_verbleibende_zeit", "3.0666", "h"),
+        ("sensor.p1s_{}_endzeit", "2025-07-17 20:08:00", ""),
+        ("binary_sensor.p1s_{}_hms_fehler", "off", ""),
+        ("binary_sensor.p1s_{}_externalspool_aktiv", "on", ""),
+    ]
+    states = {}
+    for i in range(entities):
+        template, state, unit = templates[i % len(templates)]
+        entity = template.format(f"{i:04d}")
+        states[entity] = {"state": state, "attributes": {"unit_of_measurement": unit}}
+    registry = {entity: SensorFormatter(entity) for entity in states}
+    changing = list(states)[::10]
+
+    def run(render):
+        start = time.process_time()
+        for round_index in range(rounds):
+            for entity in changing:
+                states[entity]["state"] = str(round_index % 7 * 0.5 + 200)
+            for entity, data in states.items():
+                render(entity, data)
+        return (time.process_time() - start) * 1e6 / rounds
+
+    old_us = run(legacy_format)
+    new_us = run(lambda entity, data: registry[entity].render(data))
+    print(f"{entities} Entities, {rounds} Zyklen (CPU-Zeit pro Zyklus)")
+    print(f"Inline:   {old_us:8.0f} µs")
+    print(f"Registry: {new_us:8.0f} µs ({old_us / new_us:.1f}x)")
+
+
+BENCHMARKS = {
+    "camera-decode": benchmark_camera_decode,
+    "camera-skip": benchmark_camera_skip,
+    "frame-soak": benchmark_frame_soak,
+    "mqtt-decode": benchmark_mqtt_decode,
+    "mqtt-replay": benchmark_mqtt_replay,
+    "sensor-format": benchmark_sensor_format
+}
 
 if __name__ == "__main__":
-    widget = HomeAssistantWidget()
-    widget.run()
+    parser = argparse.ArgumentParser(description="Home Assistant 3D Printer Widget")
+    parser.add_argument("--benchmark", nargs="+", metavar="NAME",
+                        help=f"Benchmark ohne GUI: {', '.join(BENCHMARKS)} (plus Argumente)")
+    parser.add_argument("--record", metavar="DATEI", help="MQTT-Reports aufzeichnen (gzip, rotierend)")
+    parser.add_argument("--replay", metavar="DATEI", help="Aufzeichnung statt Drucker abspielen")
+    parser.add_argument("--speed", default="1", help="Replay-Geschwindigkeit: 1, 10 oder max")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        name = args.benchmark[0]
+        if name not in BENCHMARKS:
+            parser.error(f"unbekannter Benchmark '{name}' - verfügbar: {', '.join(BENCHMARKS)}")
+        BENCHMARKS[name](*args.benchmark[1:])
+    else:
+        widget = HomeAssistantWidget()
+        if args.record:
+            widget.start_recording(args.record)
+        if args.replay:
+            widget.start_replay(args.replay, 0.0 if args.speed == "max" else float(args.speed))
+        widget.run()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Home Assistant WebSocket-Simulator für das Home Assistant 3D Printer Widget
+
+Minimaler HTTP/WebSocket-Server (RFC 6455, nur Textframes), der sich wie
+/api/websocket eines HA-Servers verhält: auth_required -> auth -> auth_ok
+(bzw. auth_invalid bei falschem Token), subscribe_entities mit den
+komprimierten Events a (hinzugefügt), c (geändert, +/-) und r (entfernt),
+ping/pong sowie - mit --legacy - der Fallback älterer HA-Versionen über
+get_states und state_changed Events. Zusätzlich beantwortet er GET
+/api/states und /api/states/<entity_id>, damit das Widget komplett
+dagegen laufen kann.
+
+Nur Standardbibliothek.
+
+    python ha-ws-simulator.py --token test --rate 5
+    python ha-ws-simulator.py --check          # HAWebSocketClient aus ha-widget.py gegen den Simulator prüfen
+"""
+
+import argparse
+import base64
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# WebSocket-Opcodes
+TEXT, CLOSE, PING, PONG = 0x1, 0x8, 0x9, 0xA
+
+DEFAULT_ENTITIES = {
+    "switch.your_switch_entity": ("on", {"friendly_name": "Drucker Steckdose"}),
+    "light.your_printer_chamber_light": ("off", {"friendly_name": "Druckraumlicht"}),
+    "sensor.your_printer_progress": ("0", {"unit_of_measurement": "%", "friendly_name": "Fortschritt"}),
+    "sensor.your_printer_current_layer": ("0", {"friendly_name": "Aktuelle Schicht"}),
+    "sensor.your_printer_total_layers": ("50", {"friendly_name": "Schichten gesamt"}),
+    "sensor.your_printer_nozzle_temp": ("25.0", {"unit_of_measurement": "°C", "friendly_name": "Düse"}),
+    "sensor.your_printer_bed_temp": ("25.0", {"unit_of_measurement": "°C", "friendly_name": "Bett"}),
+    "sensor.your_smart_plug_power": ("3.1", {"unit_of_measurement": "W", "friendly_name": "Leistung"}),
+    "binary_sensor.your_printer_hms_error": ("off", {"friendly_name": "HMS Fehler"}),
+}
+
+
+def read_frame(stream):
+    """Einen (maskierten) Client-Frame lesen -> (Opcode, Payload)"""
+    header = stream.read(2)
+    if len(header) < 2:
+        raise ConnectionError("Verbindung geschlossen")
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if length == 126:
+        length = int.from_bytes(stream.read(2), "big")
+    elif length == 127:
+        length = int.from_bytes(stream.read(8), "big")
+    mask = stream.read(4) if header[1] & 0x80 else b""
+    payload = stream.read(length)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return opcode, payload
+
+
+def encode_frame(opcode, payload):
+    """Server-Frame (unmaskiert, FIN gesetzt)"""
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 65536:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+    return header + payload
+
+
+def compress_state(state):
+    """REST-Zustand in das subscribe_entities-Format (s/a/lc/lu) bringen"""
+    compressed = {"s": state["state"], "a": state["attributes"], "lc": state["last_changed"]}
+    if state["last_updated"] != state["last_changed"]:
+        compressed["lu"] = state["last_updated"]
+    return compressed
+
+
+class SimulatedHA:
+    """Zustände der simulierten Entities und die verbundenen Abonnenten"""
+
+    def __init__(self, token="test", entities=None, legacy=False, seed=None):
+        self.token = token
+        self.legacy = legacy                 # subscribe_entities ablehnen (alte HA-Version)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.states = {}
+        self.removed = {}                    # entity_id -> Zustand, bis zur Rückkehr
+        self.subscribers = []                # Verbindungen mit aktivem Abo
+        self.stats = {"connections": 0, "auth_failed": 0, "events": 0}
+        now = time.time()
+        for entity_id, (value, attributes) in (entities or DEFAULT_ENTITIES).items():
+            self.states[entity_id] = {"entity_id": entity_id, "state": value,
+                                      "attributes": dict(attributes),
+                                      "last_changed": now, "last_updated": now}
+
+    def snapshot(self, entity_ids=None):
+        """Kopie der aktuellen Zustände (optional gefiltert)"""
+        with self.lock:
+            return {entity_id: json.loads(json.dumps(state)) for entity_id, state in self.states.items()
+                    if entity_ids is None or entity_id in entity_ids}
+
+    def step(self):
+        """Eine zufällige Änderung erzeugen und an alle Abonnenten verteilen"""
+        with self.lock:
+            now = time.time()
+            action = self.random.random()
+            if self.removed and action < 0.1:
+                entity_id, state = self.removed.popitem()
+                state["last_changed"] = state["last_updated"] = now
+                self.states[entity_id] = state
+                event = ("a", entity_id, state, None)
+            elif len(self.states) > 2 and action < 0.15:
+                entity_id = self.random.choice(sorted(self.states))
+                self.removed[entity_id] = self.states.pop(entity_id)
+                event = ("r", entity_id, None, self.removed[entity_id])
+            else:
+                entity_id = self.random.choice(sorted(self.states))
+                old_state = json.loads(json.dumps(self.states[entity_id]))
+                state = self.states[entity_id]
+                if action < 0.3:
+                    # Nur Attribute: eines setzen, ein zuvor gesetztes wieder entfernen
+                    if "simulated" in state["attributes"]:
+                        del state["attributes"]["simulated"]
+                    else:
+                        state["attributes"]["simulated"] = round(now, 3)
+                    state["last_updated"] = now
+                else:
+                    value = self.next_value(state["state"])
+                    # Wie HA: last_changed nur bei neuem Zustand, sonst nur last_updated
+                    if value != state["state"]:
+                        state["state"] = value
+                        state["last_changed"] = now
+                    state["last_updated"] = now
+                event = ("c", entity_id, state, old_state)
+            payload = json.loads(json.dumps(event[2])) if event[2] else None
+            subscribers = list(self.subscribers)
+            self.stats["events"] += 1
+
+        for connection in subscribers:
+            connection.send_change(event[0], entity_id, payload, event[3])
+
+    def next_value(self, value):
+        if value in ("on", "off"):
+            return "off" if value == "on" else "on"
+        try:
+            return str(round(float(value) + self.random.uniform(-2, 3), 1))
+        except ValueError:
+            return value
+
+    def run(self, rate, stop_event):
+        """Änderungen mit rate pro Sekunde erzeugen, bis stop_event gesetzt ist"""
+        while not stop_event.wait(1.0 / rate):
+            self.step()
+
+
+class HAHandler(BaseHTTPRequestHandler):
+    """REST (/api/states) und WebSocket (/api/websocket) auf einem Port"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        ha = self.server.ha
+        if self.path == "/api/websocket" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self.handle_websocket()
+            return
+
+        if self.headers.get("Authorization") != f"Bearer {ha.token}":
+            self.send_json(401, {"message": "Unauthorized"})
+        elif self.path == "/api/states":
+            self.send_json(200, list(ha.snapshot().values()))
+        elif self.path.startswith("/api/states/"):
+            state = ha.snapshot().get(self.path[len("/api/states/"):])
+            if state:
+                self.send_json(200, state)
+            else:
+                self.send_json(404, {"message": "Entity not found."})
+        else:
+            self.send_json(404, {"message": "Not found"})
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_websocket(self):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+        WebSocketSession(self.server.ha, self.rfile, self.wfile).run()
+
+
+class WebSocketSession:
+    """Eine WebSocket-Verbindung: Authentifizierung, Befehle, Events"""
+
+    def __init__(self, ha, rfile, wfile):
+        self.ha = ha
+        self.rfile = rfile
+        self.wfile = wfile
+        self.send_lock = threading.Lock()
+        self.subscription = None             # (id, "entities" | "events", entity_ids)
+
+    def send(self, message, opcode=TEXT):
+        data = message if opcode != TEXT else json.dumps(message).encode()
+        with self.send_lock:
+            self.wfile.write(encode_frame(opcode, data))
+            self.wfile.flush()
+
+    def receive(self):
+        """Nächste Textnachricht (Pings werden direkt beantwortet)"""
+        while True:
+            opcode, payload = read_frame(self.rfile)
+            if opcode == CLOSE:
+                raise ConnectionError("Client hat geschlossen")
+            if opcode == PING:
+                self.send(payload, PONG)
+            elif opcode == TEXT:
+                return json.loads(payload)
+
+    def run(self):
+        ha = self.ha
+        with ha.lock:
+            ha.stats["connections"] += 1
+        try:
+            self.send({"type": "auth_required", "ha_version": "2024.1.0"})
+            message = self.receive()
+            if message.get("type") != "auth" or message.get("access_token") != ha.token:
+                with ha.lock:
+                    ha.stats["auth_failed"] += 1
+                self.send({"type": "auth_invalid", "message": "Invalid access token or password"})
+                return
+            self.send({"type": "auth_ok", "ha_version": "2024.1.0"})
+            while True:
+                self.handle_command(self.receive())
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            with ha.lock:
+                if self in ha.subscribers:
+                    ha.subscribers.remove(self)
+
+    def handle_command(self, message):
+        ha = self.ha
+        message_id = message.get("id")
+        command = message.get("type")
+        if command == "ping":
+            self.send({"id": message_id, "type": "pong"})
+        elif command == "subscribe_entities" and not ha.legacy:
+            entity_ids = set(message.get("entity_ids") or [])
+            self.send({"id": message_id, "type": "result", "success": True, "result": None})
+            with ha.lock:
+                # Startzustand als a-Event, danach laufend c/r/a
+                initial = {entity_id: compress_state(state) for entity_id, state in ha.states.items()
+                           if entity_id in entity_ids}
+                self.subscription = (message_id, "entities", entity_ids)
+                ha.subscribers.append(self)
+                self.send({"id": message_id, "type": "event", "event": {"a": initial}})
+        elif command == "get_states":
+            self.send({"id": message_id, "type": "result", "success": True,
+                       "result": list(ha.snapshot().values())})
+        elif command == "subscribe_events" and message.get("event_type") == "state_changed":
+            self.send({"id": message_id, "type": "result", "success": True, "result": None})
+            with ha.lock:
+                self.subscription = (message_id, "events", None)
+                ha.subscribers.append(self)
+        else:
+            self.send({"id": message_id, "type": "result", "success": False,
+                       "error": {"code": "unknown_command", "message": "Unknown command."}})
+
+    def send_change(self, kind, entity_id, state, old_state):
+        """Änderung im Format des jeweiligen Abos senden"""
+        if not self.subscription:
+            return
+        subscription_id, mode, entity_ids = self.subscription
+        try:
+            if mode == "events":
+                self.send({"id": subscription_id, "type": "event", "event": {
+                    "event_type": "state_changed",
+                    "data": {"entity_id": entity_id, "old_state": old_state, "new_state": state}}})
+                return
+            if entity_id not in entity_ids:
+                return
+            if kind == "a":
+                event = {"a": {entity_id: compress_state(state)}}
+            elif kind == "r":
+                event = {"r": [entity_id]}
+            else:
+                added, removed = {}, {}
+                if state["state"] != old_state["state"]:
+                    added["s"] = state["state"]
+                    added["lc"] = state["last_changed"]
+                elif state["last_updated"] != old_state["last_updated"]:
+                    added["lu"] = state["last_updated"]
+                changed_attributes = {key: value for key, value in state["attributes"].items()
+                                      if old_state["attributes"].get(key) != value}
+                if changed_attributes:
+                    added["a"] = changed_attributes
+                gone = [key for key in old_state["attributes"] if key not in state["attributes"]]
+                if gone:
+                    removed["a"] = gone
+                diff = {"+": added}
+                if removed:
+                    diff["-"] = removed
+                event = {"c": {entity_id: diff}}
+            self.send({"id": subscription_id, "type": "event", "event": event})
+        except OSError:
+            pass
+
+
+def start_server(ha, host="127.0.0.1", port=8123):
+    server = ThreadingHTTPServer((host, port), HAHandler)
+    server.daemon_threads = True
+    server.ha = ha
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_widget_module():
+    """ha-widget.py als Modul laden (Bindestrich im Dateinamen)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ha-widget.py")
+    spec = importlib.util.spec_from_file_location("ha_widget", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def check_client(steps=200):
+    """HAWebSocketClient gegen den Simulator laufen lassen und den Zustand vergleichen
+
+    Geprüft wird sowohl client.states als auch das, was über den Callback
+    beim Widget ankommt (entfernte Entities als None, wie apply_ws_states).
+    """
+    widget = load_widget_module()
+    if widget.websocket is None:
+        print("❌ websocket-client ist nicht installiert")
+        return False
+
+    ok = True
+    for legacy in (False, True):
+        label = "state_changed (Fallback)" if legacy else "subscribe_entities"
+        ha = SimulatedHA(token="test", legacy=legacy, seed=7)
+        server = start_server(ha, port=0)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        # Eine Entity bleibt unabonniert - sie darf beim Client nie auftauchen
+        watched = sorted(ha.states)[:-1]
+        received = []
+        shown = {}                           # Sicht des Widgets, nur aus den Callbacks
+
+        def on_states(changed):
+            received.append(changed)
+            for entity_id, state in changed.items():
+                if state is None:
+                    shown.pop(entity_id, None)
+                else:
+                    shown[entity_id] = state
+
+        client = widget.HAWebSocketClient(url, "test", watched, on_states)
+        client.start()
+        connected = wait_until(lambda: client.connected)
+        for _ in range(steps):
+            ha.step()
+        expected = ha.snapshot(set(watched))
+        # Der Fallback kennt kein r - dort bleibt der letzte Zustand stehen
+        if legacy:
+            matches = lambda: all(client.states.get(entity_id) == shown.get(entity_id) == state
+                                  for entity_id, state in expected.items())
+        else:
+            matches = lambda: client.states == shown == expected
+        synced = wait_until(matches)
+        leaked = sorted((set(client.states) | set(shown)) - set(watched))
+        removals = sum(1 for changed in received for state in changed.values() if state is None)
+        client.stop()
+        server.shutdown()
+        server.server_close()
+
+        # Ohne Fallback müssen Entfernungen beim Widget ankommen
+        passed = connected and synced and not leaked and (legacy or removals > 0)
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {label}: {ha.stats['events']} Änderungen, "
+              f"{len(received)} Callbacks ({removals} entfernt), {len(client.states)}/{len(watched)} "
+              f"Entities im Client, {len(shown)} im Widget")
+        if not synced:
+            for entity_id in sorted(set(expected) | set(client.states) | set(shown)):
+                if not client.states.get(entity_id) == shown.get(entity_id) == expected.get(entity_id):
+                    print(f"   {entity_id}: Client {client.states.get(entity_id)}, "
+                          f"Widget {shown.get(entity_id)} != HA {expected.get(entity_id)}")
+        if leaked:
+            print(f"   Nicht abonniert, aber empfangen: {leaked}")
+
+    ha = SimulatedHA(token="richtig")
+    server = start_server(ha, port=0)
+    client = widget.HAWebSocketClient(f"http://127.0.0.1:{server.server_address[1]}", "falsch",
+                                      watched, lambda changed: None)
+    try:
+        client.connect()
+        passed = False
+    except ConnectionError as e:
+        passed = "Authentifizierung fehlgeschlagen" in str(e)
+    finally:
+        if client.ws:
+            client.ws.close()
+        server.shutdown()
+        server.server_close()
+    ok = ok and passed
+    print(f"{'✅' if passed else '❌'} Falsches Token wird abgelehnt ({ha.stats['auth_failed']} auth_invalid)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Home Assistant WebSocket-Simulator (/api/websocket und /api/states)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--token", default="test", help="Erwarteter Long-Lived Token")
+    parser.add_argument("--rate", type=float, default=2.0, help="Zustandsänderungen pro Sekunde")
+    parser.add_argument("--legacy", action="store_true", help="Kein subscribe_entities (ältere HA-Version)")
+    parser.add_argument("--seed", type=int, help="Zufallsfolge reproduzierbar machen")
+    parser.add_argument("--check", action="store_true", help="HAWebSocketClient prüfen und beenden")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check_client() else 1)
+
+    ha = SimulatedHA(token=args.token, legacy=args.legacy, seed=args.seed)
+    server = start_server(ha, args.host, args.port)
+    print(f"🏠 HA-Simulator auf {args.host}:{args.port} - {len(ha.states)} Entities, {args.rate}/s Änderungen")
+    stop_event = threading.Event()
+    threading.Thread(target=ha.run, args=(args.rate, stop_event), daemon=True).start()
+    try:
+        while True:
+            time.sleep(10)
+            with ha.lock:
+                print(f"📊 {ha.stats['connections']} Verbindungen, {len(ha.subscribers)} Abos, "
+                      f"{ha.stats['events']} Änderungen, {ha.stats['auth_failed']} abgelehnt")
+    except KeyboardInterrupt:
+        stop_event.set()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
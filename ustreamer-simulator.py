@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+µStreamer-Simulator für das Home Assistant 3D Printer Widget
+
+Minimaler HTTP-Server, der /stream wie µStreamer als
+multipart/x-mixed-replace (MJPEG) ausliefert: Boundary
+"boundarydonotcross", pro Teil Content-Type, Content-Length und
+X-Timestamp, einstellbare Bildrate und optional Basic Auth (401 mit
+WWW-Authenticate bei falschen Zugangsdaten). /snapshot liefert ein
+einzelnes JPEG. Mit --split werden die Teile in zufällig große Blöcke
+zerlegt, mit --no-length fehlt Content-Length (Parser muss die Boundary
+suchen).
+
+Benötigt nur Pillow (wie das Widget selbst) für die Testbilder.
+
+    python ustreamer-simulator.py --port 8080 --fps 15 --username pi --password raspberry
+    python ustreamer-simulator.py --check      # SimpleStreamReader aus ha-widget.py gegen den Simulator prüfen
+"""
+
+import argparse
+import base64
+import importlib.util
+import io
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image, ImageDraw
+
+BOUNDARY = "boundarydonotcross"
+
+
+def render_frames(count=10, size=(640, 360)):
+    """Testbilder (wandernder Druckkopf über einem Verlauf) als JPEG-Bytes"""
+    frames = []
+    for index in range(count):
+        image = Image.linear_gradient("L").resize(size).convert("RGB")
+        draw = ImageDraw.Draw(image)
+        x = 40 + index * (size[0] - 120) // max(count - 1, 1)
+        draw.rectangle((x, size[1] // 2 - 20, x + 40, size[1] // 2 + 20), fill=(230, 120, 20))
+        draw.text((10, 10), f"Frame {index}", fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=80)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """/stream (MJPEG) und /snapshot, optional mit Basic Auth"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if not self.authorized():
+            with server.lock:
+                server.stats["unauthorized"] += 1
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", 'Basic realm="Restricted area"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path.split("?")[0] == "/snapshot":
+            frame = server.frames[0]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(frame)))
+            self.end_headers()
+            self.wfile.write(frame)
+        elif self.path.split("?")[0] == "/stream":
+            self.stream()
+        else:
+            self.send_error(404)
+
+    def authorized(self):
+        server = self.server
+        if not server.username:
+            return True
+        expected = base64.b64encode(f"{server.username}:{server.password}".encode()).decode()
+        return self.headers.get("Authorization") == f"Basic {expected}"
+
+    def stream(self):
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace;boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-store, no-cache, must-revalidate")
+        self.end_headers()
+        with server.lock:
+            server.stats["clients"] += 1
+
+        interval = 1.0 / server.fps
+        next_frame = time.monotonic()
+        index = 0
+        try:
+            while not server.stopping.is_set():
+                frame = server.frames[index % len(server.frames)]
+                header = f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                if server.send_length:
+                    header += f"Content-Length: {len(frame)}\r\n"
+                header += f"X-Timestamp: {time.time():.06f}\r\n\r\n"
+                self.write_part(header.encode() + frame + b"\r\n")
+                with server.lock:
+                    server.stats["frames"] += 1
+                index += 1
+                next_frame += interval
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame = time.monotonic()
+        except OSError:
+            pass  # Client hat die Verbindung geschlossen
+        finally:
+            with server.lock:
+                server.stats["clients"] -= 1
+
+    def write_part(self, data):
+        """Teil senden - mit --split in zufälligen Blöcken, wie über ein langsames Netz"""
+        if not self.server.split:
+            self.wfile.write(data)
+            self.wfile.flush()
+            return
+        offset = 0
+        while offset < len(data):
+            size = self.server.random.randint(1, 4096)
+            self.wfile.write(data[offset:offset + size])
+            self.wfile.flush()
+            offset += size
+
+
+def start_server(host="127.0.0.1", port=8080, fps=15.0, username="", password="",
+                 split=False, send_length=True):
+    server = ThreadingHTTPServer((host, port), StreamHandler)
+    server.daemon_threads = True
+    server.frames = render_frames()
+    server.fps = fps
+    server.username = username
+    server.password = password
+    server.split = split
+    server.send_length = send_length
+    server.random = random.Random(3)
+    server.lock = threading.Lock()
+    server.stopping = threading.Event()
+    server.stats = {"clients": 0, "frames": 0, "unauthorized": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop_server(server):
+    server.stopping.set()
+    server.shutdown()
+    server.server_close()
+
+
+def load_widget_module():
+    """ha-widget.py als Modul laden (Bindestrich im Dateinamen)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ha-widget.py")
+    spec = importlib.util.spec_from_file_location("ha_widget", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check_reader(seconds=3.0, fps=20.0):
+    """SimpleStreamReader gegen den Simulator laufen lassen: Frames, FPS, 401"""
+    from requests.auth import HTTPBasicAuth
+    widget = load_widget_module()
+    ok = True
+
+    variants = [("Content-Length", {}), ("ohne Content-Length, zerstückelt", {"split": True, "send_length": False})]
+    for label, options in variants:
+        server = start_server(port=0, fps=fps, username="pi", password="raspberry", **options)
+        url = f"http://127.0.0.1:{server.server_address[1]}/stream"
+        reader = widget.SimpleStreamReader(url, HTTPBasicAuth("pi", "raspberry"))
+        started = reader.start_stream()
+        delivered, valid = 0, 0
+        deadline = time.monotonic() + seconds
+        while started and time.monotonic() < deadline:
+            frame = reader.get_latest_frame(wait=0.5)
+            if frame is None:
+                continue
+            delivered += 1
+            try:
+                widget.open_frame(frame).load()
+                valid += 1
+            except Exception as e:
+                print(f"   Ungültiges JPEG: {e}")
+        sent = server.stats["frames"]
+        reader.stop_stream()
+        stop_server(server)
+
+        # Bis auf den gerade unterwegs befindlichen Frame muss alles ankommen
+        expected = fps * seconds
+        passed = (started and valid == delivered > 0 and sent - reader.frames_received <= 2 and
+                  abs(reader.frames_received - expected) <= expected * 0.2 and
+                  abs(reader.fps - fps) <= fps * 0.2)
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {label}: {sent} gesendet, {reader.frames_received} empfangen, "
+              f"{delivered} abgeholt ({valid} gültig), {reader.fps:.1f} fps (Soll {fps:.0f})")
+
+    server = start_server(port=0, fps=fps, username="pi", password="raspberry")
+    url = f"http://127.0.0.1:{server.server_address[1]}/stream"
+    for label, auth in (("Falsches Passwort", HTTPBasicAuth("pi", "falsch")), ("Ohne Zugangsdaten", None)):
+        reader = widget.SimpleStreamReader(url, auth)
+        started = reader.start_stream()
+        passed = not started and not reader.running and reader.response is None
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {label}: Stream {'gestartet' if started else 'abgelehnt'}")
+    passed = server.stats["unauthorized"] == 2 and server.stats["frames"] == 0
+    ok = ok and passed
+    print(f"{'✅' if passed else '❌'} 401 vom Server: {server.stats['unauthorized']}x, "
+          f"{server.stats['frames']} Frames ohne Anmeldung ausgeliefert")
+    stop_server(server)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="µStreamer-Simulator (MJPEG über HTTP)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--username", default="", help="Basic Auth aktivieren (mit --password)")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--split", action="store_true", help="Teile in zufällig große Blöcke zerlegen")
+    parser.add_argument("--no-length", action="store_true", help="Kein Content-Length pro Teil senden")
+    parser.add_argument("--check", action="store_true", help="SimpleStreamReader prüfen und beenden")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check_reader() else 1)
+
+    server = start_server(args.host, args.port, args.fps, args.username, args.password,
+                          args.split, not args.no_length)
+    print(f"📷 µStreamer-Simulator auf http://{args.host}:{args.port}/stream - {args.fps:.0f} fps"
+          f"{' mit Basic Auth' if args.username else ''}")
+    try:
+        while True:
+            time.sleep(10)
+            with server.lock:
+                print(f"📊 {server.stats['clients']} Clients, {server.stats['frames']} Frames, "
+                      f"{server.stats['unauthorized']}x 401")
+    except KeyboardInterrupt:
+        stop_server(server)
+
+
+if __name__ == "__main__":
+    main()